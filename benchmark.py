@@ -0,0 +1,733 @@
+"""
+解析性能基准测试
+用固定随机种子生成指定行数的合成团队副本日志（多名玩家、全部技能、暴击、多场战斗），
+测量 LogParser.parse_file 的吞吐量、峰值内存（RSS）和各阶段用时，结果保存为 JSON，
+可以与之前保存的结果比较，发现性能退化。
+--startup 测量图形界面的启动用时（导入 main.py 和创建主窗口），超过预算或启动时加载了应延迟导入的模块时报告退化。
+--event-memory 比较逐条技能事件的三种保存方式的内存占用：每条事件一个字典、每条事件一个 __slots__ 对象、
+事件表构建器的 array 列（名称驻留为符号 ID），并按每条事件的字节数估算目标事件数（默认 1000 万条）的总占用。
+
+每次测量在独立的子进程中进行，峰值内存不受生成日志和其他测量的影响。
+生成的日志保存在数据目录中，相同参数再次运行时直接复用。
+
+示例:
+    python benchmark.py --sizes 10k,100k,1M --repeat 3 --output bench.json
+    python benchmark.py --sizes 1M --format combat_log --workers 4 --compare bench.json
+    python benchmark.py --startup
+    python benchmark.py --event-memory --sizes 1M
+"""
+import os
+import sys
+import json
+import gc
+import time
+import random
+import platform
+import argparse
+import tempfile
+import itertools
+import subprocess
+import tracemalloc
+import multiprocessing
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，不测量峰值内存
+    resource = None
+
+from log_parser import LogParser, EncounterSegmenter, LOG_FORMAT_TEXT, LOG_FORMAT_COMBAT_LOG
+
+# 结果文件的格式版本
+RESULT_VERSION = 1
+# 合成日志生成器的版本，生成的内容变化时递增，使缓存的旧日志不再被复用
+GENERATOR_VERSION = 2
+
+# 退出码
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+
+# 默认测量的日志行数
+DEFAULT_SIZES = "10k,100k,1M"
+# 默认的退化阈值：吞吐量下降或峰值内存增加超过该比例时报告退化
+DEFAULT_THRESHOLD = 0.10
+
+# --event-memory 估算总占用的目标事件数
+EVENT_MEMORY_TARGET = "10M"
+# 字典和 __slots__ 对象只对前若干条事件实际测量，再按每条事件的字节数外推（1000 万个字典需要数 GB 内存）
+EVENT_MEMORY_SAMPLE = 500000
+# 逐条保存技能事件时的字段
+EVENT_FIELDS = ("time", "actor", "ability", "target", "damage", "crit", "cast")
+
+# 启动用时预算（秒）：导入 main.py 并显示主窗口的用时，在较慢的笔记本上也应在此之内
+STARTUP_BUDGET = 0.5
+# 启动时不应加载的模块：解析器、numpy、网络客户端、缓存数据库等在第一次用到时才导入
+DEFERRED_MODULES = [
+    "numpy", "log_parser", "event_store", "combat_log", "compressed_input", "parse_cache", "sqlite_cache",
+    "warcraftlogs", "response_cache", "result_stream", "virtual_table", "warehouse", "sqlite3", "http.client",
+    "urllib.request", "json"
+]
+
+# 在新的解释器中测量启动用时，结果以 JSON 输出到标准输出；
+# json 在检查已加载的模块之后才导入，不影响检查结果
+STARTUP_SCRIPT = """
+import sys
+import time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+result = {"import_seconds": imported - started, "window_seconds": None, "error": None}
+try:
+    root = main.tk.Tk()
+    app = main.RetributionPaladinAnalyzer(root)
+    root.update()
+    result["window_seconds"] = time.perf_counter() - imported
+    root.destroy()
+except main.tk.TclError as e:
+    result["error"] = str(e)
+result["loaded"] = [name for name in sys.argv[1:] if name in sys.modules]
+import json
+sys.stdout.write(json.dumps(result))
+"""
+
+# 合成日志中的玩家和首领
+PALADIN_NAMES = ["光明使者", "圣光之锤", "正义之手", "白银之剑", "黎明守卫", "审判之刃"]
+OTHER_NAMES = [
+    "暗影之刃", "自然之力", "火焰之心", "神圣守护", "暗影愈合", "元素掌控", "死亡阴影",
+    "致命毒刃", "野性守护", "寒冰之握", "狂暴之怒", "星辰之语", "烈焰风暴", "大地之盾"
+]
+BOSS_NAMES = [
+    "奥妮克希亚", "熔岩守卫", "勒什雷尔", "费尔默", "埃博诺克", "弗莱格尔", "克洛玛古斯", "奈法利安"
+]
+# 其他职业的技能（不属于惩戒骑士技能表，解析时查找不到）
+OTHER_ABILITIES = ["致死打击", "寒冰箭", "暗影箭", "治疗术", "闪电箭", "瞄准射击", "邪恶攻击", "愤怒"]
+
+# 惩戒骑士技能: (名称, 客户端战斗日志中的法术 ID, 伤害范围, 相对权重)，伤害范围为 None 表示非伤害技能
+PALADIN_ROTATION = [
+    ("白色攻击", None, (400, 700), 40),
+    ("审判", 20271, (1300, 1800), 8),
+    ("十字军打击", 35395, (1900, 2400), 10),
+    ("奉献", 27173, (2500, 3200), 6),
+    ("神圣风暴", 53385, (5200, 6400), 5),
+    ("圣光术", 27136, None, 1),
+    ("圣疗术", 27154, None, 0.2),
+    ("圣盾术", 642, None, 0.2)
+]
+CRIT_CHANCE = 0.25
+
+def parse_size(text):
+    """将 "10k"、"1M"、"50M" 之类的行数解析为整数"""
+    text = text.strip().lower()
+    multiplier = 1
+    if text.endswith("k"):
+        multiplier, text = 1000, text[:-1]
+    elif text.endswith("m"):
+        multiplier, text = 1000000, text[:-1]
+    return int(float(text) * multiplier)
+
+def format_size(lines):
+    """将行数格式化为 "10k"、"1M" 的形式"""
+    if lines >= 1000000 and lines % 1000000 == 0:
+        return f"{lines // 1000000}M"
+    if lines >= 1000 and lines % 1000 == 0:
+        return f"{lines // 1000}k"
+    return str(lines)
+
+class SyntheticLogWriter:
+    """
+    合成日志生成器
+    按固定随机种子生成多场战斗，每场战斗由开始标记、玩家和首领信息、
+    多名玩家交错的技能事件和结束标记组成，战斗之间留有超过切分空闲时间的间隔。
+    相同的种子和参数总是生成完全相同的日志。
+    """
+    
+    def __init__(self, seed=0, paladins=4, others=14, events_per_second=8, log_format=LOG_FORMAT_TEXT):
+        """
+        Args:
+            seed: 随机种子
+            paladins: 惩戒骑士人数
+            others: 其他职业的玩家人数
+            events_per_second: 战斗中平均每秒的事件数
+            log_format: LOG_FORMAT_TEXT 或 LOG_FORMAT_COMBAT_LOG
+        """
+        self.random = random.Random(seed)
+        self.paladins = [PALADIN_NAMES[i % len(PALADIN_NAMES)] + ("" if i < len(PALADIN_NAMES) else str(i))
+                         for i in range(paladins)]
+        self.others = [OTHER_NAMES[i % len(OTHER_NAMES)] + ("" if i < len(OTHER_NAMES) else str(i))
+                       for i in range(others)]
+        self.events_per_second = events_per_second
+        self.log_format = log_format
+        # 从 20:00:00 开始，长日志会跨越午夜
+        self.clock = 20 * 3600
+        
+        self.guids = {}
+        for index, name in enumerate(self.paladins + self.others):
+            self.guids[name] = f"Player-4395-{index:08X}"
+        
+        self.rotation = PALADIN_ROTATION
+        self.rotation_weights = [entry[3] for entry in PALADIN_ROTATION]
+    
+    def write(self, path, lines):
+        """
+        生成至少 lines 行的日志写入 path（最后一场战斗完整结束）
+        
+        Returns:
+            实际写入的行数
+        """
+        written = 0
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            if self.log_format == LOG_FORMAT_COMBAT_LOG:
+                f.write(self.combat_log_header())
+                written += 1
+            
+            while written < lines:
+                block = self.encounter(lines - written)
+                f.write("".join(block))
+                written += len(block)
+        return written
+    
+    def encounter(self, remaining):
+        """生成一场战斗的全部行，事件行数不超过 remaining 太多"""
+        rng = self.random
+        boss = rng.choice(BOSS_NAMES)
+        # 战斗时长 2～8 分钟，日志剩余行数不足时缩短
+        duration = rng.randint(120, 480)
+        duration = max(10, min(duration, remaining // self.events_per_second + 1))
+        
+        block = self.markers_start(boss)
+        actors = self.paladins + self.others
+        paladin_count = len(self.paladins)
+        
+        for second in range(duration):
+            count = rng.randint(self.events_per_second // 2, self.events_per_second * 3 // 2)
+            # 同一秒内的毫秒部分递增，与真实日志一样按时间顺序排列
+            fractions = sorted(rng.randint(0, 999) for _ in range(count))
+            for index, fraction in zip(rng.choices(range(len(actors)), k=count), fractions):
+                actor = actors[index]
+                if index < paladin_count:
+                    name, spell_id, damage_range, _ = rng.choices(self.rotation, self.rotation_weights)[0]
+                    if damage_range is None:
+                        block.append(self.cast_line(fraction, actor, name, spell_id, actor))
+                        continue
+                    amount = rng.randint(*damage_range)
+                    is_crit = rng.random() < CRIT_CHANCE
+                    if is_crit:
+                        amount = amount * 2
+                    block.extend(self.damage_lines(fraction, actor, name, spell_id, boss, amount, is_crit))
+                else:
+                    block.append(self.other_line(fraction, actor, rng.choice(OTHER_ABILITIES), boss,
+                                                 rng.randint(300, 3000)))
+            self.clock += 1
+        
+        block.extend(self.markers_end(boss))
+        # 战斗之间的间隔超过默认的切分空闲时间
+        self.clock += rng.randint(60, 300)
+        return block
+    
+    def time_text(self, fraction=None):
+        """当前时钟的时间文本"""
+        seconds = self.clock % 86400
+        text = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+        if fraction is not None:
+            text += f".{fraction:03d}"
+        return text
+    
+    def markers_start(self, boss):
+        if self.log_format == LOG_FORMAT_COMBAT_LOG:
+            return [f"{self.combat_time(0)}  ENCOUNTER_START,1084,\"{boss}\",9,40,249\n"]
+        stamp = f"[{self.time_text()}]"
+        return [
+            f"{stamp} 战斗开始\n",
+            f"{stamp} 玩家：{self.paladins[0]} 进入战斗\n",
+            f"{stamp} 目标：{boss} 进入战斗\n"
+        ]
+    
+    def markers_end(self, boss):
+        if self.log_format == LOG_FORMAT_COMBAT_LOG:
+            return [f"{self.combat_time(0)}  ENCOUNTER_END,1084,\"{boss}\",9,40,1\n"]
+        return [f"[{self.time_text()}] 战斗结束\n"]
+    
+    def combat_time(self, fraction):
+        """客户端战斗日志的时间戳（日期固定，跨越午夜由解析器按时间倒退判断）"""
+        return f"10/18 {self.time_text(fraction)}"
+    
+    def cast_line(self, fraction, actor, name, spell_id, target):
+        """非伤害技能的施放"""
+        if self.log_format == LOG_FORMAT_COMBAT_LOG:
+            guid = self.guids[actor]
+            return (f"{self.combat_time(fraction)}  SPELL_CAST_SUCCESS,{guid},\"{actor}\",0x511,0x0,"
+                    f"{guid},\"{target}\",0x511,0x0,{spell_id},\"{name}\",0x2\n")
+        return f"[{self.time_text()}] {actor} 使用了 {name} 对 {target}\n"
+    
+    def damage_lines(self, fraction, actor, name, spell_id, boss, amount, is_crit):
+        """伤害技能：文本日志一行；客户端战斗日志中法术为施放加伤害两行，近战为一行挥砍"""
+        if self.log_format != LOG_FORMAT_COMBAT_LOG:
+            crit = " (暴击)" if is_crit else ""
+            return [f"[{self.time_text()}] {actor} 使用了 {name} 对 {boss} 造成了 {amount} 点伤害{crit}\n"]
+        
+        stamp = self.combat_time(fraction)
+        guid = self.guids[actor]
+        source = f"{guid},\"{actor}\",0x511,0x0"
+        target = f"Creature-0-4395-249-1234-10184-00001A2B3C,\"{boss}\",0x10a48,0x0"
+        suffix = f"{amount},0,1,0,0,0,{1 if is_crit else 'nil'},nil,nil,nil"
+        if spell_id is None:
+            return [f"{stamp}  SWING_DAMAGE,{source},{target},{suffix}\n"]
+        return [
+            f"{stamp}  SPELL_CAST_SUCCESS,{source},{target},{spell_id},\"{name}\",0x2\n",
+            f"{stamp}  SPELL_DAMAGE,{source},{target},{spell_id},\"{name}\",0x2,{suffix}\n"
+        ]
+    
+    def other_line(self, fraction, actor, name, boss, amount):
+        """其他职业的技能（解析时不统计）"""
+        if self.log_format == LOG_FORMAT_COMBAT_LOG:
+            return (f"{self.combat_time(fraction)}  SPELL_DAMAGE,{self.guids[actor]},\"{actor}\",0x511,0x0,"
+                    f"Creature-0-4395-249-1234-10184-00001A2B3C,\"{boss}\",0x10a48,0x0,"
+                    f"12294,\"{name}\",0x1,{amount},0,1,0,0,0,nil,nil,nil,nil\n")
+        return f"[{self.time_text()}] {actor} 使用了 {name} 对 {boss} 造成了 {amount} 点伤害\n"
+    
+    def combat_log_header(self):
+        return (f"{self.combat_time(0)}  COMBAT_LOG_VERSION,9,ADVANCED_LOG_ENABLED,0,"
+                f"BUILD_VERSION,1.14.4,PROJECT_ID,2\n")
+
+def ensure_log(data_dir, lines, seed, log_format):
+    """
+    返回指定参数的合成日志路径，不存在时生成
+    
+    Returns:
+        (日志路径, 生成用时秒数；复用已有文件时为 0)
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"bench_{log_format}_{format_size(lines)}_seed{seed}_v{GENERATOR_VERSION}.txt")
+    if os.path.exists(path):
+        return path, 0
+    
+    started = time.perf_counter()
+    partial = path + ".partial"
+    SyntheticLogWriter(seed, log_format=log_format).write(partial, lines)
+    os.replace(partial, path)
+    return path, time.perf_counter() - started
+
+def peak_rss_bytes(children=False):
+    """
+    当前进程的峰值 RSS（字节）；不支持的平台返回 None
+    
+    Args:
+        children: 为 True 时返回已结束的子进程中最大的峰值 RSS
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def measure_parse(path, workers, keep_events):
+    """
+    在子进程中执行：完整调用一次 parse_file，测量用时和峰值内存
+    
+    Returns:
+        {"seconds", "encounters", "baseline_rss", "peak_rss", "worker_peak_rss"}
+    """
+    baseline = peak_rss_bytes()
+    parser = LogParser(keep_events=keep_events)
+    
+    started = time.perf_counter()
+    parser.parse_file(path, workers)
+    seconds = time.perf_counter() - started
+    
+    return {
+        "seconds": seconds,
+        "encounters": len(parser.encounters),
+        "baseline_rss": baseline,
+        "peak_rss": peak_rss_bytes(),
+        "worker_peak_rss": peak_rss_bytes(children=True) if workers > 1 else None
+    }
+
+def measure_stages(path, repeat=1):
+    """
+    在子进程中执行：逐级加长流水线，测量 读取 -> 分词 -> 分段聚合 -> 生成结果 各阶段的用时
+    
+    每一遍都从头读取文件，后一遍减去前一遍的用时即为新增阶段的用时；
+    每一遍重复 repeat 次取最快的一次，减小相减带来的噪声。
+    
+    Returns:
+        阶段名 -> 秒数
+    """
+    parser = LogParser()
+    parser.detect_format(path)
+    
+    def read():
+        for _ in parser.iter_lines(path):
+            pass
+    
+    def tokenize():
+        for _ in parser.iter_events(parser.iter_lines(path)):
+            pass
+    
+    def segment():
+        segmenter = EncounterSegmenter(parser.idle_gap)
+        segmenter.feed(parser.iter_events(parser.iter_lines(path)))
+        parser.encounters = segmenter.finish()
+    
+    def build():
+        parser.results = [parser.build_result(encounter) for encounter in parser.encounters]
+    
+    def best(function):
+        seconds = []
+        for _ in range(repeat):
+            parser.timestamp_decoder.reset()
+            started = time.perf_counter()
+            function()
+            seconds.append(time.perf_counter() - started)
+        return min(seconds)
+    
+    read_seconds = best(read)
+    tokenize_seconds = best(tokenize)
+    segment_seconds = best(segment)
+    return {
+        "read": read_seconds,
+        "tokenize": max(tokenize_seconds - read_seconds, 0),
+        "segment": max(segment_seconds - tokenize_seconds, 0),
+        "build": best(build)
+    }
+
+class SlotsEvent:
+    """用于比较的逐条事件对象（__slots__，不驻留名称）"""
+    
+    __slots__ = EVENT_FIELDS
+    
+    def __init__(self, time, actor, ability, target, damage, crit, cast):
+        self.time = time
+        self.actor = actor
+        self.ability = ability
+        self.target = target
+        self.damage = damage
+        self.crit = crit
+        self.cast = cast
+
+def iter_ability_events(path):
+    """逐条生成日志中的技能事件 (时间, 施放者, 技能, 目标, 伤害, 是否暴击, 是否计为施放)"""
+    parser = LogParser()
+    parser.detect_format(path)
+    for event in parser.iter_events(parser.iter_lines(path)):
+        kind = event[0]
+        if (kind == "line" or kind == "hit") and event[3] is not None:
+            yield event[1:] + (kind == "line",)
+
+def traced_bytes(build):
+    """调用 build()，返回 (结果, 结果仍然占用的字节数)；需要已启动 tracemalloc"""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    return result, tracemalloc.get_traced_memory()[0] - before
+
+def measure_event_memory(path, sample):
+    """
+    在子进程中执行：用 tracemalloc 测量同一日志中的技能事件按三种方式保存时的内存占用
+    
+    Returns:
+        {"events", "sample", "dict_bytes", "slots_bytes", "column_bytes", "column_nbytes"}，
+        *_bytes 为每条事件的字节数（列式包括符号表和 array 预留的空间），column_nbytes 为各列的实际大小
+    """
+    from event_store import EventTableBuilder
+    
+    def build_columns():
+        builder = EventTableBuilder()
+        for event in iter_ability_events(path):
+            builder.append(*event)
+        return builder
+    
+    tracemalloc.start()
+    try:
+        dicts, dict_bytes = traced_bytes(
+            lambda: [dict(zip(EVENT_FIELDS, event)) for event in itertools.islice(iter_ability_events(path), sample)]
+        )
+        sampled = len(dicts)
+        del dicts
+        records, slots_bytes = traced_bytes(
+            lambda: [SlotsEvent(*event) for event in itertools.islice(iter_ability_events(path), sample)]
+        )
+        del records
+        builder, column_bytes = traced_bytes(build_columns)
+    finally:
+        tracemalloc.stop()
+    
+    events = len(builder)
+    return {
+        "events": events,
+        "sample": sampled,
+        "dict_bytes": dict_bytes / max(sampled, 1),
+        "slots_bytes": slots_bytes / max(sampled, 1),
+        "column_bytes": column_bytes / max(events, 1),
+        "column_nbytes": builder.nbytes()
+    }
+
+def print_event_memory(runs, target, stream=sys.stdout):
+    """打印每条事件的字节数和按目标事件数估算的总占用"""
+    stream.write(
+        f"{'行数':>8}  {'事件数':>10}  {'字典 B/条':>10}  {'__slots__ B/条':>14}  {'列式 B/条':>10}  "
+        f"{format_size(target) + ' 条估算(MB) 字典/__slots__/列式':>36}\n"
+    )
+    for run in runs:
+        estimate = "/".join(f"{run[key] * target / 1048576:.0f}" for key in ("dict_bytes", "slots_bytes", "column_bytes"))
+        stream.write(
+            f"{format_size(run['target_lines']):>8}  {run['events']:>10}  {run['dict_bytes']:>10.1f}  "
+            f"{run['slots_bytes']:>14.1f}  {run['column_bytes']:>10.1f}  {estimate:>36}\n"
+        )
+
+def child_main(conn, function, args):
+    """子进程入口：执行测量函数并通过管道返回结果或错误"""
+    try:
+        conn.send(("ok", function(*args)))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+def run_isolated(function, *args):
+    """
+    在新启动（spawn）的子进程中执行测量函数，使每次测量的峰值内存互不影响
+    
+    Raises:
+        RuntimeError: 测量函数出错或子进程异常退出
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=child_main, args=(sender, function, args))
+    process.start()
+    sender.close()
+    try:
+        status, payload = receiver.recv()
+    except EOFError:
+        status, payload = "error", "子进程异常退出"
+    process.join()
+    if status != "ok":
+        raise RuntimeError(payload)
+    return payload
+
+def measure_startup(repeat=1):
+    """
+    在新的解释器中导入 main.py 并创建主窗口，测量启动用时
+    
+    没有图形环境（如服务器上没有 DISPLAY）时只测量导入用时，window_seconds 为 None。
+    
+    Returns:
+        {"seconds", "import_seconds", "window_seconds", "process_seconds", "loaded", "error"}，
+        取 repeat 次中最快的一次；loaded 为启动时已加载的 DEFERRED_MODULES
+    
+    Raises:
+        RuntimeError: 子进程出错
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT] + DEFERRED_MODULES,
+            cwd=directory, capture_output=True, text=True
+        )
+        process_seconds = time.perf_counter() - started
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "子进程异常退出")
+        run = json.loads(completed.stdout)
+        run["process_seconds"] = process_seconds
+        run["seconds"] = run["import_seconds"] + (run["window_seconds"] or 0)
+        runs.append(run)
+    return min(runs, key=lambda run: run["seconds"])
+
+def check_startup(startup, budget, stream=sys.stdout):
+    """
+    打印启动用时并与预算比较
+    
+    Returns:
+        问题列表：超出预算，或启动时加载了应延迟导入的模块
+    """
+    window = f"{startup['window_seconds']:.3f} 秒" if startup["window_seconds"] is not None else f"未测量（{startup['error']}）"
+    stream.write(
+        f"启动用时: {startup['seconds']:.3f} 秒（预算 {budget:.3f} 秒）  "
+        f"导入 {startup['import_seconds']:.3f} 秒，创建窗口 {window}，进程总用时 {startup['process_seconds']:.3f} 秒\n"
+    )
+    problems = []
+    if startup["seconds"] > budget:
+        problems.append(f"启动用时超出预算 {startup['seconds'] - budget:.3f} 秒")
+    if startup["loaded"]:
+        problems.append("启动时加载了应延迟导入的模块: " + ", ".join(startup["loaded"]))
+    for problem in problems:
+        stream.write(f"  {problem}\n")
+    return problems
+
+def benchmark_size(lines, args, stream=sys.stderr):
+    """测量一种日志大小，返回结果字典"""
+    path, generate_seconds = ensure_log(args.data_dir, lines, args.seed, args.format)
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        actual_lines = sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b""))
+    if generate_seconds:
+        stream.write(f"  已生成 {path}（{size / 1048576:.1f} MB，用时 {generate_seconds:.1f} 秒）\n")
+    
+    runs = []
+    for attempt in range(args.repeat):
+        runs.append(run_isolated(measure_parse, path, args.workers, args.keep_events))
+        stream.write(f"  第 {attempt + 1}/{args.repeat} 次: {runs[-1]['seconds']:.3f} 秒\n")
+    # 取最快的一次作为吞吐量，峰值内存取各次的最大值
+    best = min(runs, key=lambda run: run["seconds"])
+    peaks = [run["peak_rss"] for run in runs if run["peak_rss"] is not None]
+    baselines = [run["baseline_rss"] for run in runs if run["baseline_rss"] is not None]
+    worker_peaks = [run["worker_peak_rss"] for run in runs if run["worker_peak_rss"] is not None]
+    
+    result = {
+        "lines": actual_lines,
+        "target_lines": lines,
+        "bytes": size,
+        "format": args.format,
+        "workers": args.workers,
+        "keep_events": args.keep_events,
+        "encounters": best["encounters"],
+        "seconds": best["seconds"],
+        "seconds_all": [run["seconds"] for run in runs],
+        "lines_per_second": actual_lines / best["seconds"] if best["seconds"] > 0 else 0,
+        "mb_per_second": size / 1048576 / best["seconds"] if best["seconds"] > 0 else 0,
+        "peak_rss_mb": max(peaks) / 1048576 if peaks else None,
+        "baseline_rss_mb": min(baselines) / 1048576 if baselines else None,
+        "worker_peak_rss_mb": max(worker_peaks) / 1048576 if worker_peaks else None,
+        "stages": None
+    }
+    if args.stages:
+        result["stages"] = run_isolated(measure_stages, path, args.repeat)
+    return result
+
+def run_key(run):
+    """比较两次结果时用于配对的键"""
+    return (run["target_lines"], run["format"], run["workers"], run["keep_events"])
+
+def compare_results(current, baseline, threshold, stream=sys.stdout):
+    """
+    与之前保存的结果比较并打印对比表
+    
+    吞吐量下降或峰值内存增加超过 threshold（比例）时视为退化。
+    
+    Returns:
+        退化的项目列表
+    """
+    previous = {run_key(run): run for run in baseline.get("runs", [])}
+    regressions = []
+    stream.write(f"\n与 {baseline.get('created', '之前的结果')} 的结果比较（阈值 {threshold:.0%}）:\n")
+    stream.write(f"{'行数':>8}  {'行/秒':>12}  {'之前':>12}  {'变化':>8}  {'峰值MB':>8}  {'之前':>8}  {'变化':>8}\n")
+    
+    for run in current["runs"]:
+        old = previous.get(run_key(run))
+        if old is None:
+            stream.write(f"{format_size(run['target_lines']):>8}  {run['lines_per_second']:>12.0f}  {'-':>12}\n")
+            continue
+        
+        speed = run["lines_per_second"] / old["lines_per_second"] - 1 if old["lines_per_second"] else 0
+        memory = None
+        if run["peak_rss_mb"] is not None and old.get("peak_rss_mb"):
+            memory = run["peak_rss_mb"] / old["peak_rss_mb"] - 1
+        
+        flags = []
+        if speed < -threshold:
+            flags.append("吞吐量退化")
+            regressions.append((run_key(run), "lines_per_second", speed))
+        if memory is not None and memory > threshold:
+            flags.append("内存退化")
+            regressions.append((run_key(run), "peak_rss_mb", memory))
+        
+        stream.write(
+            f"{format_size(run['target_lines']):>8}  {run['lines_per_second']:>12.0f}  "
+            f"{old['lines_per_second']:>12.0f}  {speed:>+8.1%}  "
+            f"{run['peak_rss_mb'] or 0:>8.1f}  {old.get('peak_rss_mb') or 0:>8.1f}  "
+            f"{(memory or 0):>+8.1%}  {' '.join(flags)}\n"
+        )
+    return regressions
+
+def print_results(results, stream=sys.stdout):
+    """打印本次测量的结果表"""
+    stream.write(f"{'行数':>8}  {'大小(MB)':>9}  {'战斗':>5}  {'用时(s)':>8}  {'行/秒':>12}  {'MB/s':>7}  {'峰值MB':>8}\n")
+    for run in results["runs"]:
+        peak = f"{run['peak_rss_mb']:.1f}" if run["peak_rss_mb"] is not None else "-"
+        stream.write(
+            f"{format_size(run['target_lines']):>8}  {run['bytes'] / 1048576:>9.1f}  {run['encounters']:>5}  "
+            f"{run['seconds']:>8.3f}  {run['lines_per_second']:>12.0f}  {run['mb_per_second']:>7.1f}  {peak:>8}\n"
+        )
+        if run["stages"]:
+            stages = "，".join(f"{name} {seconds:.3f}s" for name, seconds in run["stages"].items())
+            stream.write(f"{'':>8}  阶段: {stages}\n")
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="怀旧服惩戒骑士分析工具 - 解析性能基准测试")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"日志行数，逗号分隔，支持 k/M 后缀（默认 {DEFAULT_SIZES}，最大可到 50M）")
+    parser.add_argument("--seed", type=int, default=0, help="合成日志的随机种子（默认 0）")
+    parser.add_argument("--format", choices=[LOG_FORMAT_TEXT, LOG_FORMAT_COMBAT_LOG], default=LOG_FORMAT_TEXT, help="合成日志的格式（默认 text）")
+    parser.add_argument("--repeat", type=int, default=3, help="每种大小重复测量的次数，取最快的一次（默认 3）")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="parse_file 的并行进程数（默认 1）")
+    parser.add_argument("--keep-events", action="store_true", help="同时生成列式事件表（需要 numpy）")
+    parser.add_argument("--no-stages", dest="stages", action="store_false", help="不测量各阶段用时")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "retribution_benchmark"), help="合成日志的保存目录")
+    parser.add_argument("-o", "--output", help="将结果保存为 JSON 文件")
+    parser.add_argument("--compare", metavar="PATH", help="与之前保存的 JSON 结果比较")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="判定退化的变化比例（默认 0.10）")
+    parser.add_argument("--startup", action="store_true", help="只测量图形界面的启动用时，并与预算比较")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET, help=f"启动用时预算（秒，默认 {STARTUP_BUDGET}）")
+    parser.add_argument("--event-memory", action="store_true", help="只比较逐条技能事件的几种保存方式的内存占用（需要 numpy）")
+    parser.add_argument("--event-sample", type=int, default=EVENT_MEMORY_SAMPLE,
+                        help=f"字典和 __slots__ 对象实际测量的事件数（默认 {EVENT_MEMORY_SAMPLE}）")
+    parser.add_argument("--event-target", default=EVENT_MEMORY_TARGET,
+                        help=f"估算总占用的事件数，支持 k/M 后缀（默认 {EVENT_MEMORY_TARGET}）")
+    return parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    
+    results = {
+        "version": RESULT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": args.seed,
+        "runs": []
+    }
+    if args.startup:
+        sys.stderr.write("测量启动用时 ...\n")
+        results["startup"] = measure_startup(args.repeat)
+        results["startup"]["budget"] = args.startup_budget
+        problems = check_startup(results["startup"], args.startup_budget)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        return EXIT_REGRESSION if problems else EXIT_OK
+    
+    if args.event_memory:
+        results["event_memory"] = []
+        for lines in sizes:
+            sys.stderr.write(f"测量 {format_size(lines)} 行 ({args.format}) 中技能事件的内存占用 ...\n")
+            path, _ = ensure_log(args.data_dir, lines, args.seed, args.format)
+            run = run_isolated(measure_event_memory, path, args.event_sample)
+            run["target_lines"] = lines
+            results["event_memory"].append(run)
+        print_event_memory(results["event_memory"], parse_size(args.event_target))
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        return EXIT_OK
+    
+    for lines in sizes:
+        sys.stderr.write(f"测量 {format_size(lines)} 行 ({args.format}) ...\n")
+        results["runs"].append(benchmark_size(lines, args))
+    
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare_results(results, baseline, args.threshold):
+            return EXIT_REGRESSION
+    return EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
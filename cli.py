@@ -0,0 +1,341 @@
+"""
+命令行批量分析工具
+不依赖 tkinter，可以在无图形界面的服务器或定时任务中批量分析战斗日志。
+
+示例:
+    python cli.py logs/ "archive/**/*.txt" --jobs 8 --output results --format both
+    python cli.py "archive/**/*.txt.gz" --jobs 8
+    python cli.py logs/ --warehouse
+"""
+import os
+import csv
+import sys
+import json
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from log_parser import LogParser
+from parse_cache import ParseCache
+from result_stream import ResultStreamReader, ResultStreamWriter, is_result_stream, export_result
+from warehouse import FightWarehouse, file_fight_records
+
+# 扫描目录时识别为战斗日志的扩展名
+LOG_EXTENSIONS = (".txt", ".log")
+# 压缩日志的扩展名（如 raid.txt.gz），压缩格式由 LogParser 按文件内容识别；.zip 压缩包不要求内层扩展名
+COMPRESSED_EXTENSIONS = (".gz", ".bgz", ".bz2", ".xz", ".zip")
+
+# 退出码
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_NO_INPUT = 2
+
+# CSV 汇总中每场战斗一行的字段
+CSV_FIELDS = [
+    "file", "encounter", "player", "boss", "duration", "dps", "totalDamage",
+    "critRate", "efficiency", "checksPassed", "checksTotal"
+]
+
+def strip_compressed(name):
+    """去掉压缩扩展名，例如 raid.txt.gz -> raid.txt"""
+    root, ext = os.path.splitext(name)
+    return root if ext.lower() in COMPRESSED_EXTENSIONS else name
+
+def is_log_name(name):
+    """扫描目录时是否把该文件名识别为战斗日志（包括压缩的日志）"""
+    name = name.lower()
+    return name.endswith(".zip") or strip_compressed(name).endswith(LOG_EXTENSIONS)
+
+def collect_inputs(inputs):
+    """
+    将命令行中的文件、通配符和目录展开为日志文件列表（去重并保持顺序）
+    
+    Args:
+        inputs: 命令行参数列表
+        
+    Returns:
+        文件路径列表
+    """
+    files = []
+    seen = set()
+    
+    def add(path):
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            files.append(path)
+    
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, names in os.walk(item):
+                dirs.sort()
+                for name in sorted(names):
+                    if is_log_name(name):
+                        add(os.path.join(root, name))
+        elif os.path.isfile(item):
+            add(item)
+        else:
+            for path in sorted(glob.glob(item, recursive=True)):
+                if os.path.isfile(path):
+                    add(path)
+    return files
+
+def analyze_path(file_path, idle_gap, cache_path, players, diagnostics=False, profile=False, record=False):
+    """
+    分析单个日志文件（在工作进程中执行）
+    
+    Args:
+        file_path: 日志文件路径
+        idle_gap: 战斗切分空闲时间（秒）
+        cache_path: 解析缓存数据库路径，为 None 时不使用缓存
+        players: 要输出的玩家列表；None 表示每场战斗的默认玩家，"*" 表示全部玩家
+        diagnostics: 是否记录各阶段用时和计数器（保存在返回值的 diagnostics 中，不附加到结果）
+        profile: 是否同时记录 cProfile 结果
+        record: 是否生成写入历史数据仓库的战斗记录（由主进程统一写入）
+        
+    Returns:
+        包含 path、ok、error、results、seconds、bytes、diagnostics、fights 的字典
+    """
+    started = time.perf_counter()
+    outcome = {
+        "path": file_path,
+        "ok": False,
+        "error": None,
+        "results": [],
+        "seconds": 0,
+        "bytes": 0,
+        "diagnostics": None,
+        "fights": []
+    }
+    
+    parser = None
+    try:
+        outcome["bytes"] = os.path.getsize(file_path)
+        
+        if file_path.lower().endswith(".json"):
+            # 已保存的分析结果
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if "player" not in data or "abilities" not in data:
+                raise ValueError("不是分析结果文件")
+            outcome["results"] = [(1, data)]
+        elif is_result_stream(file_path):
+            # 保存的结果流：只读取需要的记录
+            reader = ResultStreamReader(file_path)
+            results = []
+            for index in range(reader.encounter_count()):
+                actors = reader.players(index)
+                if players is None:
+                    selected = [None]
+                else:
+                    selected = [player for player in (actors if players == "*" else players) if player in actors]
+                for player in selected:
+                    results.append((index + 1, reader.get(index, player)))
+            outcome["results"] = results
+        else:
+            cache = ParseCache(cache_path) if cache_path else None
+            parser = LogParser(idle_gap, cache=cache, diagnostics=diagnostics or profile)
+            parser.diagnostics.profile = profile
+            default_results = parser.parse_encounters(file_path)
+            if not parser.format_recognized:
+                raise ValueError("不是战斗日志：文件开头不是时间戳行或客户端战斗日志记录")
+            if not any(encounter.casts for encounter in parser.encounters):
+                # 没有技能事件时分段结果只有一场空战斗
+                raise ValueError("日志中没有识别到任何技能事件")
+            
+            results = []
+            for index, result in enumerate(default_results):
+                if players is None:
+                    results.append((index + 1, result))
+                    continue
+                actors = parser.get_actors(index)
+                for player in (actors if players == "*" else players):
+                    if player in actors:
+                        results.append((index + 1, parser.get_player_report(player, index)))
+            
+            outcome["results"] = results
+            if record:
+                outcome["fights"] = file_fight_records(parser, file_path)
+        
+        # 只为输出的结果模拟输出循环、生成检查列表（已保存的结果中已有检查列表时直接使用）
+        if parser is None:
+            parser = LogParser(idle_gap)
+        for _, result in outcome["results"]:
+            parser.evaluate_checklist(result)
+        outcome["diagnostics"] = parser.diagnostics.to_dict()
+        outcome["ok"] = True
+    except Exception as e:
+        outcome["error"] = f"{type(e).__name__}: {e}"
+    
+    outcome["seconds"] = time.perf_counter() - started
+    return outcome
+
+def output_stems(files):
+    """为每个输入文件生成输出文件名前缀，不同目录下的同名文件加序号区分"""
+    stems = {}
+    used = set()
+    for path in files:
+        base = os.path.splitext(strip_compressed(os.path.basename(path)))[0]
+        stem = base
+        counter = 2
+        while stem in used:
+            stem = f"{base}-{counter}"
+            counter += 1
+        used.add(stem)
+        stems[path] = stem
+    return stems
+
+def output_name(stem, encounter, player, multiple_players):
+    """生成单个结果 JSON 的文件名"""
+    name = f"{stem}_{encounter}"
+    if multiple_players:
+        name += f"_{player}"
+    return name + ".json"
+
+def write_outputs(outcome, stem, output_dir, formats, csv_writer, multiple_players):
+    """
+    按 save_analysis 的格式写出每场战斗的 JSON，jsonl 格式时每个日志写出一个结果流（逐条写入），
+    并向 CSV 汇总中追加行；记录了诊断信息时单独写出 <前缀>_diagnostics.json
+    """
+    if outcome["diagnostics"] is not None:
+        with open(os.path.join(output_dir, stem + "_diagnostics.json"), 'w', encoding='utf-8') as f:
+            json.dump(outcome["diagnostics"], f, ensure_ascii=False, indent=2)
+    
+    stream = None
+    if "jsonl" in formats:
+        stream = ResultStreamWriter(os.path.join(output_dir, stem + ".jsonl"), {"source": outcome["path"]})
+    try:
+        for encounter, result in outcome["results"]:
+            if stream is not None:
+                stream.write(encounter, result)
+            
+            if "json" in formats:
+                path = os.path.join(output_dir, output_name(stem, encounter, result["player"], multiple_players))
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(export_result(result), f, ensure_ascii=False, indent=2)
+            
+            if csv_writer is not None:
+                checklist = result.get("checklist", [])
+                csv_writer.writerow({
+                    "file": outcome["path"],
+                    "encounter": encounter,
+                    "player": result["player"],
+                    "boss": result["boss"],
+                    "duration": result["duration"],
+                    "dps": round(result["dps"], 2),
+                    "totalDamage": result["totalDamage"],
+                    "critRate": round(result["critRate"], 4),
+                    "efficiency": round(result["castingTime"]["efficiency"], 4),
+                    "checksPassed": sum(1 for item in checklist if item["status"]),
+                    # 不适用的检查项（status 为 None）不计入总数
+                    "checksTotal": sum(1 for item in checklist if item["status"] is not None)
+                })
+    except BaseException:
+        # 写入失败时不留下不完整的结果流
+        if stream is not None:
+            stream.discard()
+        raise
+    if stream is not None:
+        stream.close()
+
+def print_summary(outcomes, wall_seconds, stream=sys.stdout):
+    """打印每个文件的吞吐量和失败情况汇总表"""
+    name_width = max([len(os.path.basename(o["path"])) for o in outcomes] + [4])
+    stream.write(f"{'文件':<{name_width}}  {'状态':<4}  {'战斗':>4}  {'大小(MB)':>9}  {'用时(s)':>8}  {'MB/s':>8}\n")
+    
+    for o in outcomes:
+        mb = o["bytes"] / 1048576
+        rate = mb / o["seconds"] if o["seconds"] > 0 else 0
+        status = "成功" if o["ok"] else "失败"
+        encounters = len({encounter for encounter, _ in o["results"]})
+        stream.write(
+            f"{os.path.basename(o['path']):<{name_width}}  {status:<4}  {encounters:>4}  "
+            f"{mb:>9.1f}  {o['seconds']:>8.2f}  {rate:>8.1f}\n"
+        )
+        if not o["ok"]:
+            stream.write(f"    错误: {o['error']}\n")
+        elif o["diagnostics"] is not None:
+            stages = "，".join(f"{name} {stage['seconds']:.2f}s" for name, stage in o["diagnostics"]["stages"].items())
+            stream.write(f"    阶段: {stages}\n")
+    
+    total_mb = sum(o["bytes"] for o in outcomes) / 1048576
+    failures = sum(1 for o in outcomes if not o["ok"])
+    rate = total_mb / wall_seconds if wall_seconds > 0 else 0
+    stream.write(
+        f"共 {len(outcomes)} 个文件，失败 {failures} 个，总计 {total_mb:.1f} MB，"
+        f"用时 {wall_seconds:.2f} 秒，{rate:.1f} MB/s\n"
+    )
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="怀旧服惩戒骑士分析工具 - 命令行批量分析")
+    parser.add_argument("inputs", nargs="+", help="日志文件、通配符（支持 **）或目录")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="并行分析的进程数（默认为CPU核数）")
+    parser.add_argument("-o", "--output", default="analysis_output", help="结果输出目录（默认 analysis_output）")
+    parser.add_argument("-f", "--format", choices=["json", "jsonl", "csv", "both"], default="json",
+                        help="输出格式（默认 json；jsonl 为每个日志一个结果流文件；both 为 json 和 csv）")
+    parser.add_argument("--player", action="append", help="只输出指定玩家（可多次指定）")
+    parser.add_argument("--all-players", action="store_true", help="输出日志中所有玩家的结果")
+    parser.add_argument("--idle-gap", type=float, default=LogParser.DEFAULT_IDLE_GAP, help="战斗切分空闲时间（秒）")
+    parser.add_argument("--cache", metavar="PATH", help="使用指定的解析缓存数据库")
+    parser.add_argument("--diagnostics", action="store_true", help="记录各阶段用时和计数器，写入 <文件名>_diagnostics.json")
+    parser.add_argument("--profile", action="store_true", help="同时记录 cProfile 结果（开销较大，隐含 --diagnostics）")
+    parser.add_argument("--warehouse", metavar="PATH", nargs="?", const=FightWarehouse.DEFAULT_PATH,
+                        help="将各场战斗记录到历史数据仓库（默认与图形界面共用同一个数据库）")
+    return parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    
+    files = collect_inputs(args.inputs)
+    if not files:
+        sys.stderr.write("没有找到任何日志文件\n")
+        return EXIT_NO_INPUT
+    
+    formats = {"json", "csv"} if args.format == "both" else {args.format}
+    players = "*" if args.all_players else args.player
+    multiple_players = players is not None
+    os.makedirs(args.output, exist_ok=True)
+    
+    csv_file = None
+    csv_writer = None
+    if "csv" in formats:
+        csv_file = open(os.path.join(args.output, "summary.csv"), 'w', encoding='utf-8-sig', newline='')
+        csv_writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS)
+        csv_writer.writeheader()
+    
+    started = time.perf_counter()
+    outcomes = {}
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(files)))) as executor:
+            futures = {
+                executor.submit(analyze_path, path, args.idle_gap, args.cache, players,
+                                args.diagnostics, args.profile, args.warehouse is not None): path
+                for path in files
+            }
+            for future in as_completed(futures):
+                outcome = future.result()
+                outcomes[outcome["path"]] = outcome
+                status = "完成" if outcome["ok"] else f"失败 ({outcome['error']})"
+                sys.stderr.write(f"[{len(outcomes)}/{len(files)}] {outcome['path']}: {status}\n")
+        
+        # 按输入顺序写出结果，使输出与并行完成的先后无关
+        stems = output_stems(files)
+        for path in files:
+            if outcomes[path]["ok"]:
+                write_outputs(outcomes[path], stems[path], args.output, formats, csv_writer, multiple_players)
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+    
+    ordered = [outcomes[path] for path in files]
+    if args.warehouse is not None:
+        # 所有文件的战斗记录在一个事务中写入
+        records = [record for o in ordered for record in o["fights"]]
+        FightWarehouse(args.warehouse).store(records)
+        sys.stderr.write(f"已将 {len(records)} 场战斗记录到 {args.warehouse}\n")
+    print_summary(ordered, time.perf_counter() - started)
+    return EXIT_FAILURES if any(not o["ok"] for o in ordered) else EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
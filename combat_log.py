@@ -0,0 +1,232 @@
+"""
+魔兽世界客户端战斗日志（WoWCombatLog.txt）解析
+客户端通过 /combatlog 写出的日志每行一个事件：时间戳后跟两个空格，之后是逗号分隔的字段，
+例如:
+    10/18 20:15:32.123  SPELL_DAMAGE,Player-4395-0A1B2C3D,"光明使者-奥罗",0x511,0x0,
+    Creature-0-4395-249-1234-10184-00001A2B3C,"奥妮克希亚",0x10a48,0x0,35395,"十字军打击",0x1,...,2200,-1,1,0,0,0,1,nil,nil,nil
+
+字段直接用 str.split 切分，不对每个字段做正则匹配；事件类型和法术 ID 都通过哈希表分派。
+产生的事件与 LogParser.iter_events() 相同，可以直接交给 EncounterSegmenter 聚合。
+"""
+import re
+import csv
+
+# 用于识别日志格式的行首: "月/日[/年] 时:分:秒.毫秒[时区]  事件类型,"
+COMBAT_LOG_LINE_PATTERN = re.compile(
+    r"\d{1,2}/\d{1,2}(?:/\d{2,4})? \d{1,2}:\d{2}:\d{2}(?:\.\d+)?(?:[-+]\d+)?  [A-Z_]+,"
+)
+COMBAT_LOG_VERSION_PATTERN = re.compile(r"COMBAT_LOG_VERSION,(\d+)")
+
+# 事件类型
+SWING_DAMAGE = 1
+SWING_MISSED = 2
+SPELL_DAMAGE = 3
+SPELL_CAST = 4
+ENCOUNTER_START = 5
+ENCOUNTER_END = 6
+LOG_VERSION = 7
+
+# 事件名 -> 事件类型，未列出的事件只用于记录时间
+EVENT_TYPES = {
+    "SWING_DAMAGE": SWING_DAMAGE,
+    "SWING_MISSED": SWING_MISSED,
+    "SPELL_DAMAGE": SPELL_DAMAGE,
+    "SPELL_PERIODIC_DAMAGE": SPELL_DAMAGE,
+    "RANGE_DAMAGE": SPELL_DAMAGE,
+    "SPELL_CAST_SUCCESS": SPELL_CAST,
+    "ENCOUNTER_START": ENCOUNTER_START,
+    "ENCOUNTER_END": ENCOUNTER_END,
+    "COMBAT_LOG_VERSION": LOG_VERSION
+}
+
+# 伤害后缀: amount, overkill, school, resisted, blocked, absorbed, critical, glancing, crushing, isOffHand
+# 高级日志字段的数量随客户端版本变化，因此伤害字段从行尾往前定位
+DAMAGE_SUFFIX_FIELDS = 10
+# 正式服（日志版本 20 起）在 amount 之后多一个 baseAmount 字段
+BASE_AMOUNT_VERSION = 20
+# critical 字段相对行尾的位置
+CRITICAL_FROM_END = 4
+
+def is_combat_log(head):
+    """
+    判断文本是否为客户端战斗日志
+    
+    Args:
+        head: 文件开头的一段文本
+    
+    Returns:
+        (是否为战斗日志, 日志版本号或 None)
+    """
+    for line in head.lstrip("\ufeff").splitlines():
+        if not line.strip():
+            continue
+        if not COMBAT_LOG_LINE_PATTERN.match(line):
+            return False, None
+        version = COMBAT_LOG_VERSION_PATTERN.search(head)
+        return True, int(version.group(1)) if version else None
+    return False, None
+
+class CombatLogReader:
+    """
+    客户端战斗日志的事件读取器
+    
+    只统计玩家（GUID 以 "Player-" 开头）施放的已知技能：
+    SPELL_CAST_SUCCESS 记为一次施放，SPELL_DAMAGE 等伤害事件记为一次命中（不计施放次数），
+    近战的 SWING_DAMAGE / SWING_MISSED 每次挥砍同时记为施放和命中。
+    ENCOUNTER_START / ENCOUNTER_END 作为战斗开始和结束标记。
+    """
+    
+    def __init__(self, timestamp_decoder, ability_lookup, spell_lookup, abilities,
+                 swing_ability="白色攻击", version=None):
+        """
+        Args:
+            timestamp_decoder: TimestampDecoder，用于解码时间并处理跨越午夜
+            ability_lookup: 日志中的技能名 -> 技能（中文客户端直接按名称匹配）
+            spell_lookup: 法术 ID（字符串） -> 技能
+            abilities: LogParser.paladin_abilities，用于判断技能是否计算伤害
+            swing_ability: 近战攻击对应的技能
+            version: 日志版本号（分块解析时文件头不在本块中，需要外部传入）
+        """
+        self.timestamp_decoder = timestamp_decoder
+        self.ability_lookup = ability_lookup
+        self.spell_lookup = spell_lookup
+        self.abilities = abilities
+        self.swing_ability = swing_ability
+        self.set_version(version)
+    
+    def set_version(self, version):
+        """根据日志版本确定伤害数值相对行尾的位置"""
+        self.version = version
+        if version is not None and version >= BASE_AMOUNT_VERSION:
+            self.amount_from_end = DAMAGE_SUFFIX_FIELDS + 1
+        else:
+            self.amount_from_end = DAMAGE_SUFFIX_FIELDS
+    
+    def iter_events(self, lines):
+        """
+        将战斗日志行转换为事件（生成器）
+        
+        Yields:
+            ("start", 时间) / ("end", 时间) / ("boss", 名称, 时间) /
+            ("line", 时间, 施放者, 技能名, 目标, 伤害, 是否暴击) 施放（近战挥砍同时带伤害） /
+            ("hit", 时间, 施放者, 技能名, 目标, 伤害, 是否暴击) 不计施放次数的伤害
+        """
+        decode_time = self.timestamp_decoder.decode
+        event_types = EVENT_TYPES
+        ability_lookup = self.ability_lookup
+        spell_lookup = self.spell_lookup
+        abilities = self.abilities
+        swing_ability = self.swing_ability
+        swing_damage = abilities[swing_ability]["is_damage"]
+        last_second_str = None
+        second = None
+        
+        for line in lines:
+            head, sep, rest = line.partition("  ")
+            if not sep:
+                continue
+            
+            # 时间: "月/日[/年] 时:分:秒.毫秒[时区]"，整秒部分变化时才重新解码
+            time_str = head[head.find(" ") + 1:]
+            if len(time_str) < 7:
+                continue
+            if time_str[1] == ":":
+                time_str = "0" + time_str
+            second_str = time_str[:8]
+            if second_str != last_second_str:
+                second = decode_time(second_str)
+                last_second_str = second_str
+            fraction = time_str[8:]
+            if fraction:
+                zone = max(fraction.find("-"), fraction.find("+"))
+                if zone > 0:
+                    fraction = fraction[:zone]
+                current_time = second + float(fraction)
+            else:
+                current_time = second
+            
+            event_type = event_types.get(rest[:rest.find(",")])
+            if event_type is None:
+                yield ("line", current_time, None, None, None, None, False)
+                continue
+            
+            if event_type == SPELL_DAMAGE or event_type == SPELL_CAST:
+                fields = rest.split(",", 12)
+                if len(fields) < 12 or not fields[1].startswith("Player-"):
+                    yield ("line", current_time, None, None, None, None, False)
+                    continue
+                if not (fields[2].endswith('"') and fields[10].endswith('"')
+                        and (fields[6].endswith('"') or fields[6] == "nil")):
+                    # 名称中含有逗号，改用 csv 按引号切分
+                    fields = self.split_quoted(rest, 12)
+                
+                ability = spell_lookup.get(fields[9])
+                if ability is None:
+                    ability = ability_lookup.get(fields[10].strip('"'))
+                if ability is None:
+                    yield ("line", current_time, None, None, None, None, False)
+                    continue
+                
+                actor = fields[2].strip('"')
+                target = fields[6].strip('"') if fields[6] != "nil" else None
+                if event_type == SPELL_CAST:
+                    yield ("line", current_time, actor, ability, target, None, False)
+                    continue
+                
+                damage, is_crit = self.parse_damage(fields[12] if len(fields) > 12 else "")
+                if not abilities[ability]["is_damage"]:
+                    damage = None
+                yield ("hit", current_time, actor, ability, target, damage, is_crit)
+            elif event_type == SWING_DAMAGE or event_type == SWING_MISSED:
+                fields = rest.split(",", 9)
+                if len(fields) < 9 or not fields[1].startswith("Player-"):
+                    yield ("line", current_time, None, None, None, None, False)
+                    continue
+                if not (fields[2].endswith('"') and (fields[6].endswith('"') or fields[6] == "nil")):
+                    fields = self.split_quoted(rest, 9)
+                
+                damage = None
+                is_crit = False
+                if event_type == SWING_DAMAGE and swing_damage:
+                    damage, is_crit = self.parse_damage(fields[9] if len(fields) > 9 else "")
+                yield ("line", current_time, fields[2].strip('"'), swing_ability,
+                       fields[6].strip('"'), damage, is_crit)
+            elif event_type == ENCOUNTER_START:
+                # ENCOUNTER_START,encounterID,"encounterName",difficultyID,groupSize,instanceID
+                fields = self.split_quoted(rest, 3)
+                yield ("start", current_time)
+                if len(fields) > 2:
+                    yield ("boss", fields[2], current_time)
+            elif event_type == ENCOUNTER_END:
+                yield ("end", current_time)
+            else:
+                version = COMBAT_LOG_VERSION_PATTERN.match(rest)
+                if version:
+                    self.set_version(int(version.group(1)))
+    
+    def parse_damage(self, suffix):
+        """
+        从伤害事件的剩余字段中取出伤害数值和暴击标记
+        
+        Returns:
+            (伤害或 None, 是否暴击)
+        """
+        fields = ("," + suffix).rsplit(",", self.amount_from_end)
+        if len(fields) <= self.amount_from_end:
+            return None, False
+        try:
+            damage = int(fields[-self.amount_from_end])
+        except ValueError:
+            return None, False
+        return damage, fields[-CRITICAL_FROM_END] not in ("nil", "0")
+    
+    def split_quoted(self, rest, maxsplit):
+        """
+        按 csv 规则切分字段（名称中含有逗号时使用），保持与 str.split(",", maxsplit) 相同的结构
+        
+        名称字段去掉引号，最后一个字段为未切分的剩余部分
+        """
+        fields = next(csv.reader([rest]))
+        if len(fields) > maxsplit + 1:
+            fields[maxsplit:] = [",".join(fields[maxsplit:])]
+        return fields
@@ -0,0 +1,243 @@
+"""
+压缩日志的透明读取
+归档的战斗日志通常压缩保存（文本日志约可压缩到十分之一），解析时按文件开头的魔数识别压缩格式，
+边解压边交给解析器，不需要先解压到临时文件。支持 gzip、bzip2、xz 和 zip（读取压缩包中的第一个文件）。
+
+gzip 文件由多个独立的成员组成且每个成员头部记录了自身长度时（BGZF 格式，例如 bgzip 的输出），
+各成员可以分别解压，由多个线程并行解压后按顺序输出。
+其他文件（包括没有长度记录的多成员 gzip 文件）无法在不解压的情况下找到成员边界，只能顺序解压，
+但解压在后台线程中进行，与解析并行（zlib、bz2、lzma 解压时释放 GIL）。
+"""
+import io
+import bz2
+import gzip
+import lzma
+import struct
+import zipfile
+import zlib
+import itertools
+from collections import deque
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor
+
+# 压缩格式
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_BZIP2 = "bzip2"
+COMPRESSION_XZ = "xz"
+COMPRESSION_ZIP = "zip"
+
+# 文件开头的魔数 -> 压缩格式
+MAGIC_NUMBERS = [
+    (b"\x1f\x8b", COMPRESSION_GZIP),
+    (b"BZh", COMPRESSION_BZIP2),
+    (b"\xfd7zXZ\x00", COMPRESSION_XZ),
+    (b"PK\x03\x04", COMPRESSION_ZIP)
+]
+MAGIC_LENGTH = max(len(magic) for magic, _ in MAGIC_NUMBERS)
+
+# gzip 成员头部：魔数(2) 压缩方法(1) 标志(1) 修改时间(4) 额外标志(1) 操作系统(1) 额外字段长度(2)
+GZIP_HEADER = struct.Struct("<2sBBIBBH")
+# 标志中表示存在额外字段的位
+GZIP_FLAG_EXTRA = 0x04
+# BGZF 在额外字段中以 "BC" 子字段记录成员的总长度减一
+BGZF_SUBFIELD = b"BC"
+
+# 后台线程每次解压的数据块大小
+PREFETCH_BLOCK_SIZE = 1024 * 1024
+# BGZF 文件每个并行解压任务的压缩数据大小
+BGZF_BATCH_BYTES = 256 * 1024
+
+def detect_compression(file_path):
+    """
+    根据文件开头的魔数判断压缩格式
+    
+    Returns:
+        COMPRESSION_* 之一；未压缩时返回 None
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(MAGIC_LENGTH)
+    for magic, compression in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return compression
+    return None
+
+def bgzf_members(f):
+    """
+    读取 BGZF 文件中每个成员的位置，只读取各成员的头部，不解压
+    
+    Args:
+        f: 以二进制方式打开的文件，读取后位置回到开头
+    
+    Returns:
+        (偏移, 长度) 列表；任一成员没有长度记录（不是 BGZF 文件）时返回 None
+    """
+    members = []
+    size = f.seek(0, io.SEEK_END)
+    offset = 0
+    try:
+        while offset < size:
+            f.seek(offset)
+            header = f.read(GZIP_HEADER.size)
+            if len(header) < GZIP_HEADER.size:
+                return None
+            magic, _, flags, _, _, _, extra_length = GZIP_HEADER.unpack(header)
+            if magic != b"\x1f\x8b" or not flags & GZIP_FLAG_EXTRA:
+                return None
+            
+            extra = f.read(extra_length)
+            length = None
+            position = 0
+            # 额外字段由若干 (标识(2), 长度(2), 内容) 子字段组成
+            while position + 4 <= len(extra):
+                subfield = extra[position:position + 2]
+                subfield_length = struct.unpack_from("<H", extra, position + 2)[0]
+                if subfield == BGZF_SUBFIELD and subfield_length == 2:
+                    length = struct.unpack_from("<H", extra, position + 4)[0] + 1
+                position += 4 + subfield_length
+            if length is None:
+                return None
+            
+            members.append((offset, length))
+            offset += length
+    finally:
+        f.seek(0)
+    return members
+
+def decompress_members(data, lengths):
+    """解压一批连续的 gzip 成员（在线程池中执行），同时校验每个成员的 CRC 和长度"""
+    parts = []
+    position = 0
+    view = memoryview(data)
+    for length in lengths:
+        parts.append(zlib.decompress(view[position:position + length], wbits=31))
+        position += length
+    return b"".join(parts)
+
+def read_block(stream, size):
+    """从解压流中读取一块数据（在后台线程中执行），读完时返回 None"""
+    return stream.read(size) or None
+
+def bgzf_jobs(raw, members, batch_bytes):
+    """
+    将 BGZF 文件的成员按 batch_bytes 分批，逐批读取压缩数据，生成 PrefetchReader 的解压任务
+    
+    Yields:
+        (decompress_members, 压缩数据, 各成员长度)
+    """
+    start = 0
+    lengths = []
+    for offset, length in members:
+        if not lengths:
+            start = offset
+        lengths.append(length)
+        if offset + length - start >= batch_bytes:
+            raw.seek(start)
+            yield decompress_members, raw.read(offset + length - start), lengths
+            lengths = []
+    if lengths:
+        offset, length = members[-1]
+        raw.seek(start)
+        yield decompress_members, raw.read(offset + length - start), lengths
+
+class PrefetchReader(io.RawIOBase):
+    """
+    预读解压流
+    解压任务在线程池中提前执行，结果按提交顺序输出，解析器处理当前数据块时后续数据块已在解压；
+    zlib、bz2、lzma 解压时都会释放 GIL，因此解压与解析真正并行。
+    最多同时有 workers * 2 个任务在执行或等待读取，内存占用与文件大小无关。
+    """
+    
+    def __init__(self, jobs, workers=1):
+        """
+        Args:
+            jobs: 生成 (函数, 参数...) 的迭代器，函数返回一块解压后的数据，返回 None 表示数据已读完
+            workers: 线程数；任务之间有先后依赖（顺序读取同一个流）时必须为 1
+        """
+        super().__init__()
+        self.jobs = iter(jobs)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.lookahead = workers * 2
+        self.futures = deque()
+        self.finished = False
+        self.buffer = b""
+        self.position = 0
+    
+    def readable(self):
+        return True
+    
+    def submit(self):
+        """提交后续的任务，保持 lookahead 个任务在执行或等待读取"""
+        while not self.finished and len(self.futures) < self.lookahead:
+            job = next(self.jobs, None)
+            if job is None:
+                break
+            self.futures.append(self.executor.submit(*job))
+    
+    def readinto(self, buffer):
+        while self.position >= len(self.buffer):
+            self.submit()
+            if self.finished or not self.futures:
+                return 0
+            block = self.futures.popleft().result()
+            if block is None:
+                self.finished = True
+                return 0
+            self.buffer = block
+            self.position = 0
+        
+        size = min(len(buffer), len(self.buffer) - self.position)
+        buffer[:size] = self.buffer[self.position:self.position + size]
+        self.position += size
+        return size
+    
+    def close(self):
+        if not self.closed:
+            # 提前关闭时不再等待尚未开始的任务
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        super().close()
+
+@contextmanager
+def open_decompressed(file_path, compression=None, workers=1):
+    """
+    以二进制流的方式打开日志文件，压缩文件边读取边解压
+    
+    Args:
+        file_path: 文件路径
+        compression: detect_compression() 的结果，None 表示未压缩
+        workers: BGZF 文件的解压线程数，1 表示顺序解压
+    
+    Yields:
+        (解压后的二进制流, 原始文件)；原始文件的读取位置可用于估计进度
+    """
+    with ExitStack() as stack:
+        raw = stack.enter_context(open(file_path, 'rb'))
+        if compression is None:
+            yield raw, raw
+            return
+        
+        if compression == COMPRESSION_GZIP:
+            members = bgzf_members(raw) if workers > 1 else None
+            if members and len(members) > 1:
+                # 各成员独立解压，多个线程同时解压
+                reader = PrefetchReader(bgzf_jobs(raw, members, BGZF_BATCH_BYTES), workers)
+                stream = stack.enter_context(io.BufferedReader(reader, PREFETCH_BLOCK_SIZE))
+                yield stream, raw
+                return
+            stream = gzip.GzipFile(fileobj=raw)
+        elif compression == COMPRESSION_BZIP2:
+            stream = bz2.BZ2File(raw)
+        elif compression == COMPRESSION_XZ:
+            stream = lzma.LZMAFile(raw)
+        elif compression == COMPRESSION_ZIP:
+            archive = stack.enter_context(zipfile.ZipFile(raw))
+            names = [info for info in archive.infolist() if not info.is_dir()]
+            if not names:
+                raise ValueError("压缩包中没有文件")
+            stream = archive.open(names[0])
+        else:
+            raise ValueError(f"不支持的压缩格式: {compression}")
+        stack.enter_context(stream)
+        
+        # 其他格式只能顺序解压，由一个后台线程边解压边交给解析器
+        reader = PrefetchReader(itertools.repeat((read_block, stream, PREFETCH_BLOCK_SIZE)))
+        yield stack.enter_context(io.BufferedReader(reader, PREFETCH_BLOCK_SIZE)), raw
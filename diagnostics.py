@@ -0,0 +1,242 @@
+"""
+解析过程的诊断信息
+记录各阶段的用时和调用次数、计数器（读取行数、匹配行数、字节数等），
+可选地用 cProfile 记录函数级的耗时，用于判断时间花在 I/O、分词、聚合、检查列表还是界面刷新上。
+
+流式解析的各阶段交错执行，无法分别计时；timed_iter() 对取下一个元素的耗时抽样计时，
+按元素个数估计包含上游阶段在内的总用时，再扣除上游阶段的用时，即为本阶段自身的用时。
+抽样使每行的额外开销只有一次计数，启用诊断时解析速度基本不受影响。
+"""
+import io
+import time
+import pstats
+import cProfile
+import threading
+
+class StageTimer:
+    """一次阶段计时（with 语句），退出时把用时累加到 Diagnostics 中"""
+    
+    def __init__(self, diagnostics, name, exclude=()):
+        self.diagnostics = diagnostics
+        self.name = name
+        self.exclude = exclude
+        self.started = None
+        self.excluded = 0
+    
+    def __enter__(self):
+        self.excluded = self.diagnostics.inclusive_seconds(self.exclude)
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.started
+        excluded = self.diagnostics.inclusive_seconds(self.exclude) - self.excluded
+        self.diagnostics.add_time(self.name, elapsed, excluded)
+        return False
+
+class NullTimer:
+    """未启用诊断时使用的空计时器"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NULL_TIMER = NullTimer()
+
+class Diagnostics:
+    """
+    诊断信息收集器
+    未启用时所有方法都是空操作，不影响解析速度。
+    解析在后台线程中进行时，界面线程同时记录显示阶段的用时并读取报告，记录的修改和读取都在 lock 中进行。
+    """
+    
+    # cProfile 结果中保留的函数数
+    PROFILE_LIMIT = 30
+    # timed_iter() 每隔多少个元素计时一次
+    SAMPLE_INTERVAL = 64
+    
+    def __init__(self, enabled=True, profile=False):
+        """
+        Args:
+            enabled: 是否记录阶段用时和计数器
+            profile: 是否同时用 cProfile 记录函数级的耗时（开销较大）
+        """
+        self.enabled = enabled
+        self.profile = profile
+        self.profiler = None
+        self.lock = threading.RLock()
+        self.reset()
+    
+    def reset(self):
+        """清空上一次的记录"""
+        with self.lock:
+            # 阶段名 -> {"seconds": 自身用时, "calls": 次数}，按首次出现的顺序排列
+            self.stages = {}
+            # 阶段名 -> 包含被扣除的下游/上游阶段在内的总用时
+            self.inclusive = {}
+            self.counters = {}
+            self.info = {}
+            self.profile_text = None
+            self.wall_started = None
+            self.wall_seconds = 0
+    
+    def stage(self, name, exclude=()):
+        """
+        返回阶段计时器（with 语句）
+        
+        Args:
+            name: 阶段名
+            exclude: 在此期间执行、需要从本阶段扣除用时的其他阶段名
+        """
+        if not self.enabled:
+            return NULL_TIMER
+        return StageTimer(self, name, exclude)
+    
+    def add_time(self, name, seconds, excluded=0):
+        """累加阶段用时"""
+        with self.lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = {"seconds": 0, "calls": 0}
+                self.inclusive[name] = 0
+            stage["seconds"] += max(seconds - excluded, 0)
+            stage["calls"] += 1
+            self.inclusive[name] += seconds
+    
+    def inclusive_seconds(self, names):
+        """若干阶段的总用时之和"""
+        with self.lock:
+            return sum(self.inclusive.get(name, 0) for name in names)
+    
+    def count(self, name, amount=1):
+        """累加计数器"""
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def note(self, name, value):
+        """记录说明性的信息（如缓存是否命中、解析模式）"""
+        if self.enabled:
+            with self.lock:
+                self.info[name] = value
+    
+    def timed_iter(self, name, iterable, counter=None, upstream=None):
+        """
+        对迭代器抽样计时（生成器），迭代结束时把估计的用时累加到阶段 name
+        
+        Args:
+            name: 阶段名
+            iterable: 被计时的迭代器
+            counter: 计数器名，不为 None 时记录元素个数
+            upstream: 上游阶段名，其用时从本阶段中扣除
+        """
+        if not self.enabled:
+            return iterable
+        return self.iter_timed(name, iter(iterable), counter, () if upstream is None else (upstream,))
+    
+    def iter_timed(self, name, iterator, counter, exclude):
+        perf_counter = time.perf_counter
+        interval = self.SAMPLE_INTERVAL
+        excluded = self.inclusive_seconds(exclude)
+        countdown = 1
+        started = None
+        sampled = 0
+        samples = 0
+        items = 0
+        try:
+            # 抽中的元素在 yield 返回后开始计时，到下一个元素取到时结束
+            for item in iterator:
+                if started is not None:
+                    sampled += perf_counter() - started
+                    samples += 1
+                    started = None
+                items += 1
+                countdown -= 1
+                yield item
+                if not countdown:
+                    countdown = interval
+                    started = perf_counter()
+        finally:
+            total = sampled / samples * items if samples else 0
+            self.add_time(name, total, self.inclusive_seconds(exclude) - excluded)
+            if counter is not None:
+                self.count(counter, items)
+    
+    def begin(self):
+        """开始一次解析：清空记录，需要时启动 cProfile"""
+        if not self.enabled:
+            return
+        self.reset()
+        self.wall_started = time.perf_counter()
+        if self.profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+    
+    def end(self):
+        """结束一次解析：记录总用时，停止 cProfile 并整理结果"""
+        if not self.enabled or self.wall_started is None:
+            return
+        wall_seconds = time.perf_counter() - self.wall_started
+        profile_text = None
+        if self.profiler is not None:
+            self.profiler.disable()
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=stream)
+            stats.sort_stats("cumulative").print_stats(self.PROFILE_LIMIT)
+            profile_text = stream.getvalue()
+            self.profiler = None
+        with self.lock:
+            self.wall_seconds = wall_seconds
+            self.profile_text = profile_text
+    
+    def rates(self):
+        """根据计数器和总用时计算吞吐量"""
+        rates = {}
+        with self.lock:
+            if self.wall_seconds > 0:
+                if "bytes" in self.counters:
+                    rates["bytes_per_second"] = self.counters["bytes"] / self.wall_seconds
+                if "lines_read" in self.counters:
+                    rates["lines_per_second"] = self.counters["lines_read"] / self.wall_seconds
+        return rates
+    
+    def to_dict(self):
+        """
+        返回可以序列化为 JSON 的诊断信息
+        
+        Returns:
+            {"seconds", "stages", "counters", "rates", "info", "profile"}；未启用时返回 None
+        """
+        if not self.enabled:
+            return None
+        with self.lock:
+            return {
+                "seconds": self.wall_seconds,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counters": dict(self.counters),
+                "rates": self.rates(),
+                "info": dict(self.info),
+                "profile": self.profile_text
+            }
+    
+    def format_report(self):
+        """返回便于阅读的文本报告"""
+        report = self.to_dict()
+        if report is None:
+            return "诊断未启用"
+        lines = [f"总用时: {report['seconds']:.3f} 秒"]
+        total = sum(stage["seconds"] for stage in report["stages"].values()) or 1
+        for name, stage in report["stages"].items():
+            lines.append(
+                f"  {name:<16} {stage['seconds'] * 1000:>10.1f} ms  {stage['calls']:>6} 次  "
+                f"{stage['seconds'] / total:>6.1%}"
+            )
+        for name, value in report["counters"].items():
+            lines.append(f"  {name}: {value}")
+        for name, value in report["rates"].items():
+            lines.append(f"  {name}: {value:,.0f}")
+        for name, value in report["info"].items():
+            lines.append(f"  {name}: {value}")
+        return "\n".join(lines)
@@ -0,0 +1,688 @@
+"""
+列式事件表
+将每条技能事件保存为 NumPy 列（时间、施放者、技能、目标、伤害、暴击、是否计为施放），
+字符串通过符号表驻留为整数 ID。总伤害、各技能 DPS、暴击率和按时间分桶的
+伤害曲线都可以用向量化运算直接得到，不需要再次读取原始日志。
+
+TimeIndex 在事件表之上为每场战斗建立按时间分桶的前缀和索引，任意时间窗口的
+伤害、施放次数和暴击率只需两次数组下标访问。
+
+事件表可以保存为目录形式的二进制附属文件（每列一个 .npy 文件加一个符号表 JSON），
+重新打开时以内存映射方式加载，按战斗或时间范围取出的数据都是映射数组的视图，不复制内容。
+
+NumPy 为可选依赖，未安装时不能使用事件表，其余功能不受影响。
+"""
+import os
+import json
+import math
+import shutil
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖
+    np = None
+
+# 是否可以使用事件表
+HAS_NUMPY = np is not None
+
+# 没有伤害数值的事件（如治疗技能）在伤害列中记为 -1
+NO_DAMAGE = -1
+# 伤害列为 32 位整数，超出范围的数值（只可能来自损坏的日志）按上限记录
+MAX_AMOUNT = 2 ** 31 - 1
+
+# 各列在构建器中的 array 类型码和在事件表中的 NumPy 类型，每条事件共 24 字节：
+# 时间 8 + 施放者 4 + 技能 2 + 目标 4 + 伤害 4 + 暴击 1 + 施放 1。
+# 技能只来自固定的技能表，16 位足够；暴击和施放标记以 0/1 字节保存，转换为布尔列时不复制
+COLUMN_TYPES = {
+    "time": ('d', "float64"),
+    "actor": ('i', "int32"),
+    "ability": ('h', "int16"),
+    "target": ('i', "int32"),
+    "amount": ('i', "int32"),
+    "crit": ('b', "bool"),
+    "cast": ('b', "bool")
+}
+
+# 附属文件格式版本，格式变化时旧文件自动失效
+SIDECAR_VERSION = 3
+# 附属文件中的符号表和元数据文件名
+SIDECAR_META = "symbols.json"
+
+def require_numpy():
+    """未安装 NumPy 时给出明确的错误"""
+    if np is None:
+        raise ImportError("事件表需要安装 numpy: pip install numpy")
+
+class SymbolTable:
+    """
+    字符串符号表
+    将玩家、技能、目标名称驻留为从 0 开始的整数 ID
+    """
+    
+    def __init__(self, names=None):
+        self.names = []
+        self.ids = {}
+        for name in names or []:
+            self.intern(name)
+    
+    def intern(self, name):
+        """返回名称对应的 ID，首次出现时分配新的 ID"""
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            symbol_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol_id
+    
+    def get(self, name):
+        """返回名称对应的 ID，不存在时返回 None"""
+        return self.ids.get(name)
+    
+    def __getitem__(self, symbol_id):
+        return self.names[symbol_id]
+    
+    def __len__(self):
+        return len(self.names)
+
+class EventTableBuilder:
+    """
+    事件表构建器
+    解析过程中逐条追加事件，先写入紧凑的 array 列（类型见 COLUMN_TYPES），
+    名称驻留为符号 ID，不为每条事件创建对象；结束后各列直接作为 NumPy 数组的缓冲区，不复制
+    """
+    
+    def __init__(self):
+        require_numpy()
+        self.actors = SymbolTable()
+        self.abilities = SymbolTable()
+        self.targets = SymbolTable()
+        
+        for name, (typecode, _) in COLUMN_TYPES.items():
+            setattr(self, name, array(typecode))
+    
+    def __len__(self):
+        return len(self.time)
+    
+    def nbytes(self):
+        """各列占用的字节数（不含符号表）"""
+        return sum(len(getattr(self, name)) * getattr(self, name).itemsize for name in COLUMN_TYPES)
+    
+    def append(self, time, actor, ability, target, damage, is_crit, is_cast=True):
+        """追加一条技能事件，is_cast 为 False 时只计命中不计施放次数"""
+        self.cast.append(1 if is_cast else 0)
+        self.time.append(time)
+        self.actor.append(self.actors.intern(actor))
+        self.ability.append(self.abilities.intern(ability))
+        self.target.append(self.targets.intern(target))
+        if damage is None:
+            self.amount.append(NO_DAMAGE)
+            self.crit.append(0)
+        else:
+            self.amount.append(damage if damage <= MAX_AMOUNT else MAX_AMOUNT)
+            self.crit.append(1 if is_crit else 0)
+    
+    def tee(self, events):
+        """
+        生成器：原样传递事件流，同时把技能事件记录到事件表中
+
+        只记录带技能的事件，其顺序和数量与 EncounterSegmenter 统计的技能事件数一致
+        """
+        append = self.append
+        for event in events:
+            kind = event[0]
+            if (kind == "line" or kind == "hit") and event[3] is not None:
+                _, current_time, actor, ability, target, damage, is_crit = event
+                append(current_time, actor, ability, target, damage, is_crit, kind == "line")
+            yield event
+    
+    def extend(self, other, time_offset=0):
+        """
+        追加另一个构建器（如并行解析的一个分块）的全部事件
+
+        Args:
+            other: EventTableBuilder 对象，其符号 ID 会重新映射到本构建器的符号表
+            time_offset: 追加的事件时间统一加上的秒数（用于处理跨越午夜）
+        """
+        if not len(other.time):
+            return
+        
+        self.time.frombytes((np.frombuffer(other.time, dtype=np.float64) + time_offset).tobytes())
+        for column, symbols, other_symbols in (("actor", self.actors, other.actors),
+                                               ("ability", self.abilities, other.abilities),
+                                               ("target", self.targets, other.targets)):
+            dtype = COLUMN_TYPES[column][1]
+            remap = np.array([symbols.intern(name) for name in other_symbols.names], dtype=dtype)
+            ids = np.frombuffer(getattr(other, column), dtype=dtype)
+            getattr(self, column).frombytes(remap[ids].tobytes())
+        self.amount.extend(other.amount)
+        self.crit.extend(other.crit)
+        self.cast.extend(other.cast)
+    
+    def build(self, encounter_casts=()):
+        """
+        生成事件表
+        
+        Args:
+            encounter_casts: 按顺序排列的每场战斗的技能事件数，用于划分各场战斗的行范围
+            
+        Returns:
+            EventTable 对象
+        """
+        columns = {name: np.frombuffer(getattr(self, name), dtype=dtype) for name, (_, dtype) in COLUMN_TYPES.items()}
+        return EventTable(
+            actors=self.actors,
+            abilities=self.abilities,
+            targets=self.targets,
+            encounter_offsets=np.concatenate(([0], np.cumsum(encounter_casts, dtype=np.int64))),
+            **columns
+        )
+
+class EventTable:
+    """
+    列式事件表
+    每列是一个等长的 NumPy 数组，同一场战斗的事件位于连续的行范围内
+    """
+    
+    # 各列的名称，也是附属文件中 .npy 文件的文件名
+    COLUMNS = ("time", "actor", "ability", "target", "amount", "crit", "cast")
+    
+    def __init__(self, time, actor, ability, target, amount, crit, cast,
+                 actors, abilities, targets, encounter_offsets):
+        require_numpy()
+        self.time = time
+        self.actor = actor
+        self.ability = ability
+        self.target = target
+        self.amount = amount
+        self.crit = crit
+        # 是否计为一次施放（客户端战斗日志中法术的伤害事件只计命中）
+        self.cast = cast
+        
+        self.actors = actors
+        self.abilities = abilities
+        self.targets = targets
+        
+        # 第 i 场战斗的事件位于 [encounter_offsets[i], encounter_offsets[i + 1])
+        self.encounter_offsets = encounter_offsets
+    
+    def __len__(self):
+        return len(self.time)
+    
+    def nbytes(self):
+        """各列占用的字节数（不含符号表；内存映射加载时为映射的文件大小）"""
+        return sum(getattr(self, name).nbytes for name in self.COLUMNS)
+    
+    def encounter_rows(self, index):
+        """返回第 index 场战斗的行范围（slice）"""
+        return slice(int(self.encounter_offsets[index]), int(self.encounter_offsets[index + 1]))
+    
+    def time_rows(self, start_time, end_time, rows=slice(None)):
+        """
+        返回 rows 范围内时间位于 [start_time, end_time) 的行范围（slice）
+
+        同一范围内的事件按时间顺序排列，用二分查找定位，不扫描数据。
+        """
+        offset = rows.start or 0
+        time = self.time[rows]
+        first = int(np.searchsorted(time, start_time, side='left'))
+        last = int(np.searchsorted(time, end_time, side='left'))
+        return slice(offset + first, offset + max(first, last))
+    
+    def view(self, rows):
+        """
+        返回只包含 rows 范围的事件表
+
+        各列都是原数组的视图（内存映射加载时仍然是映射），符号表共享，不复制数据。
+        """
+        columns = {name: getattr(self, name)[rows] for name in self.COLUMNS}
+        return EventTable(
+            actors=self.actors,
+            abilities=self.abilities,
+            targets=self.targets,
+            encounter_offsets=np.array([0, len(columns["time"])], dtype=np.int64),
+            **columns
+        )
+    
+    def save(self, directory, meta=None):
+        """
+        保存为二进制附属文件目录
+
+        先写入临时目录再整体替换，写入中断时不会留下不完整的附属文件。
+        
+        Args:
+            directory: 附属文件目录
+            meta: 额外保存的元数据（可以序列化为 JSON），load() 时原样返回
+        """
+        temp_directory = directory + ".tmp"
+        if os.path.exists(temp_directory):
+            shutil.rmtree(temp_directory)
+        os.makedirs(temp_directory)
+        
+        for name in self.COLUMNS:
+            np.save(os.path.join(temp_directory, name + ".npy"), np.ascontiguousarray(getattr(self, name)))
+        
+        symbols = {
+            "version": SIDECAR_VERSION,
+            "actors": self.actors.names,
+            "abilities": self.abilities.names,
+            "targets": self.targets.names,
+            "encounter_offsets": [int(offset) for offset in self.encounter_offsets],
+            "meta": meta
+        }
+        with open(os.path.join(temp_directory, SIDECAR_META), 'w', encoding='utf-8') as f:
+            json.dump(symbols, f, ensure_ascii=False)
+        
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.replace(temp_directory, directory)
+    
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        加载 save() 保存的附属文件目录
+        
+        Args:
+            directory: 附属文件目录
+            mmap: 是否以只读内存映射方式加载各列（不读入内存）
+            
+        Returns:
+            (EventTable, 保存时的 meta)
+            
+        Raises:
+            OSError: 文件不存在或无法读取
+            ValueError: 附属文件格式不匹配或已损坏
+        """
+        require_numpy()
+        with open(os.path.join(directory, SIDECAR_META), 'r', encoding='utf-8') as f:
+            symbols = json.load(f)
+        if symbols.get("version") != SIDECAR_VERSION:
+            raise ValueError(f"不支持的事件表版本: {symbols.get('version')}")
+        
+        mmap_mode = 'r' if mmap else None
+        columns = {}
+        for name in cls.COLUMNS:
+            columns[name] = np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode)
+        if len({len(column) for column in columns.values()}) > 1:
+            raise ValueError("事件表各列长度不一致")
+        
+        table = cls(
+            actors=SymbolTable(symbols["actors"]),
+            abilities=SymbolTable(symbols["abilities"]),
+            targets=SymbolTable(symbols["targets"]),
+            encounter_offsets=np.array(symbols["encounter_offsets"], dtype=np.int64),
+            **columns
+        )
+        return table, symbols["meta"]
+    
+    def select(self, rows=slice(None), actor=None, ability=None):
+        """
+        返回满足条件的行的布尔掩码（相对于 rows 切片）
+
+        Args:
+            rows: 行范围
+            actor: 施放者名称，None 表示全部
+            ability: 技能名称，None 表示全部
+        """
+        mask = np.ones(len(self.time[rows]), dtype=bool)
+        if actor is not None:
+            actor_id = self.actors.get(actor)
+            if actor_id is None:
+                return np.zeros_like(mask)
+            mask &= self.actor[rows] == actor_id
+        if ability is not None:
+            ability_id = self.abilities.get(ability)
+            if ability_id is None:
+                return np.zeros_like(mask)
+            mask &= self.ability[rows] == ability_id
+        return mask
+    
+    def ability_stats(self, rows=slice(None), actor=None):
+        """
+        用向量化运算统计各技能的施放次数、伤害、命中和暴击次数
+        
+        Args:
+            rows: 行范围（如 encounter_rows() 的返回值）
+            actor: 施放者名称，None 表示全部施放者
+            
+        Returns:
+            技能名 -> {"name", "casts", "damage", "crits", "hits"}，与 LogParser.ability_data 结构相同
+        """
+        mask = self.select(rows, actor)
+        ability = self.ability[rows][mask]
+        amount = self.amount[rows][mask]
+        crit = self.crit[rows][mask]
+        cast = self.cast[rows][mask]
+        
+        size = len(self.abilities)
+        hit = amount != NO_DAMAGE
+        events = np.bincount(ability, minlength=size)
+        casts = np.bincount(ability, weights=cast, minlength=size)
+        hits = np.bincount(ability, weights=hit, minlength=size)
+        crits = np.bincount(ability, weights=crit & hit, minlength=size)
+        damage = np.bincount(ability, weights=np.where(hit, amount, 0), minlength=size)
+        
+        stats = {}
+        for ability_id in np.flatnonzero(events):
+            name = self.abilities[ability_id]
+            stats[name] = {
+                "name": name,
+                "casts": int(casts[ability_id]),
+                "damage": int(damage[ability_id]),
+                "crits": int(crits[ability_id]),
+                "hits": int(hits[ability_id])
+            }
+        return stats
+    
+    def total_damage(self, rows=slice(None), actor=None, ability=None):
+        """返回满足条件的事件的总伤害"""
+        amount = self.amount[rows][self.select(rows, actor, ability)]
+        # 伤害列为 32 位整数，求和时使用 64 位避免溢出
+        return int(amount[amount != NO_DAMAGE].sum(dtype=np.int64))
+    
+    def crit_rate(self, rows=slice(None), actor=None, ability=None):
+        """返回满足条件的事件的暴击率（暴击次数 / 命中次数）"""
+        mask = self.select(rows, actor, ability)
+        hit = self.amount[rows][mask] != NO_DAMAGE
+        hits = int(hit.sum())
+        return int((self.crit[rows][mask] & hit).sum()) / hits if hits else 0
+    
+    def time_series(self, rows=slice(None), bucket_seconds=1.0, actor=None, ability=None, start_time=None):
+        """
+        按时间分桶统计伤害
+        
+        Args:
+            rows: 行范围
+            bucket_seconds: 每个桶的秒数
+            actor: 施放者名称，None 表示全部
+            ability: 技能名称，None 表示全部
+            start_time: 第一个桶的开始时间，默认为范围内第一条事件的时间
+            
+        Returns:
+            (各桶的开始时间, 各桶的伤害) 两个数组
+        """
+        time = self.time[rows]
+        if len(time) == 0:
+            return np.zeros(0), np.zeros(0)
+        if start_time is None:
+            start_time = time[0]
+        
+        mask = self.select(rows, actor, ability)
+        amount = self.amount[rows]
+        mask &= amount != NO_DAMAGE
+        
+        count = int((time[-1] - start_time) // bucket_seconds) + 1
+        buckets = ((time[mask] - start_time) // bucket_seconds).astype(np.int64)
+        inside = (buckets >= 0) & (buckets < count)
+        damage = np.bincount(buckets[inside], weights=amount[mask][inside], minlength=count)
+        return start_time + np.arange(count) * bucket_seconds, damage
+
+class TimeIndex:
+    """
+    单场战斗的前缀和时间索引
+    按 (施放者, 技能) 记录从战斗开始到每个时间桶边界为止的累计施放次数、伤害、命中和暴击次数，
+    任意 [开始, 结束) 窗口的统计等于两个边界处累计值之差，与窗口内的事件数量无关。
+    窗口边界按最近的桶边界取整，精度为 bucket_seconds。
+    """
+    
+    # 累计值数组第一维的各项统计
+    FIELDS = ("casts", "damage", "hits", "crits")
+    # 每项统计最多的 (组合 x 时间桶) 单元数，超出时自动加大桶的秒数以限制内存（约 64MB）
+    MAX_CELLS = 2 * 1024 * 1024
+    
+    def __init__(self, table, rows, start_time, end_time, bucket_seconds=1.0):
+        """
+        Args:
+            table: EventTable 对象
+            rows: 战斗在事件表中的行范围
+            start_time: 战斗开始时间（秒），窗口时间相对于该时间
+            end_time: 战斗结束时间（秒）
+            bucket_seconds: 时间桶的秒数
+        """
+        self.table = table
+        self.start_time = start_time
+        self.bucket_seconds = bucket_seconds
+        self.duration = max(end_time - start_time, 0)
+        self.bucket_count = int(math.ceil(self.duration / bucket_seconds)) + 1
+        
+        time = table.time[rows]
+        amount = table.amount[rows]
+        hit = amount != NO_DAMAGE
+        
+        # 每个出现过的 (施放者, 技能) 组合占一行
+        ability_count = max(len(table.abilities), 1)
+        pairs = table.actor[rows].astype(np.int64) * ability_count + table.ability[rows]
+        keys, key_rows = np.unique(pairs, return_inverse=True)
+        self.key_actor = keys // ability_count
+        self.key_ability = keys % ability_count
+        
+        if len(keys) * self.bucket_count > self.MAX_CELLS:
+            bucket_seconds *= math.ceil(len(keys) * self.bucket_count / self.MAX_CELLS)
+            self.bucket_seconds = bucket_seconds
+            self.bucket_count = int(math.ceil(self.duration / bucket_seconds)) + 1
+        
+        buckets = np.floor((time - start_time) / bucket_seconds + 1e-9).astype(np.int64)
+        np.clip(buckets, 0, self.bucket_count - 1, out=buckets)
+        cells = key_rows.reshape(-1) * self.bucket_count + buckets
+        size = len(keys) * self.bucket_count
+        
+        values = (
+            table.cast[rows].astype(np.int64),
+            np.where(hit, amount, 0),
+            hit.astype(np.int64),
+            (table.crit[rows] & hit).astype(np.int64)
+        )
+        # cumulative[字段, 组合, i] 为前 i 个时间桶的累计值
+        self.cumulative = np.zeros((len(self.FIELDS), len(keys), self.bucket_count + 1), dtype=np.int64)
+        for field, weights in enumerate(values):
+            counts = np.bincount(cells, weights=weights, minlength=size).astype(np.int64)
+            np.cumsum(counts.reshape(len(keys), self.bucket_count), axis=1, out=self.cumulative[field, :, 1:])
+        
+        self.selections = {}
+    
+    def bounds(self, start, end):
+        """
+        将 [start, end) 换算为桶边界下标
+        
+        边界取最近的桶边界；end 不小于战斗时长时包括战斗结束时刻的事件。
+        """
+        first = min(max(int(round(start / self.bucket_seconds)), 0), self.bucket_count)
+        if end >= self.duration:
+            return first, self.bucket_count
+        last = min(max(int(round(end / self.bucket_seconds)), first), self.bucket_count)
+        return first, last
+    
+    def key_selection(self, actor=None, ability=None):
+        """返回满足条件的 (施放者, 技能) 组合的行下标"""
+        cache_key = (actor, ability)
+        selection = self.selections.get(cache_key)
+        if selection is None:
+            mask = np.ones(len(self.key_actor), dtype=bool)
+            if actor is not None:
+                mask &= self.key_actor == self.table.actors.get(actor)
+            if ability is not None:
+                mask &= self.key_ability == self.table.abilities.get(ability)
+            selection = self.selections[cache_key] = np.flatnonzero(mask)
+        return selection
+    
+    def window(self, start, end, actor=None, ability=None):
+        """
+        统计 [start, end) 窗口内的数据
+        
+        Args:
+            start: 窗口开始时间，相对战斗开始的秒数
+            end: 窗口结束时间，相对战斗开始的秒数
+            actor: 施放者名称，None 表示全部
+            ability: 技能名称，None 表示全部
+            
+        Returns:
+            {"start", "end", "duration", "casts", "damage", "hits", "crits", "dps", "critRate"}
+        """
+        first, last = self.bounds(start, end)
+        selection = self.key_selection(actor, ability)
+        totals = (self.cumulative[:, selection, last] - self.cumulative[:, selection, first]).sum(axis=1)
+        
+        stats = {field: int(total) for field, total in zip(self.FIELDS, totals)}
+        stats["start"] = first * self.bucket_seconds
+        stats["end"] = min(last * self.bucket_seconds, self.duration)
+        stats["duration"] = max(stats["end"] - stats["start"], 0)
+        stats["dps"] = stats["damage"] / stats["duration"] if stats["duration"] > 0 else 0
+        stats["critRate"] = stats["crits"] / stats["hits"] if stats["hits"] > 0 else 0
+        return stats
+    
+    def ability_stats(self, start, end, actor=None):
+        """
+        统计 [start, end) 窗口内各技能的数据
+        
+        Returns:
+            技能名 -> {"name", "casts", "damage", "crits", "hits"}，与 EventTable.ability_stats() 结构相同
+        """
+        first, last = self.bounds(start, end)
+        selection = self.key_selection(actor)
+        totals = self.cumulative[:, selection, last] - self.cumulative[:, selection, first]
+        
+        stats = {}
+        for column, ability_id in enumerate(self.key_ability[selection]):
+            name = self.table.abilities[ability_id]
+            data = stats.setdefault(name, {"name": name, "casts": 0, "damage": 0, "crits": 0, "hits": 0})
+            for field, value in zip(self.FIELDS, totals[:, column]):
+                data[field] += int(value)
+        return {name: data for name, data in stats.items() if data["casts"] > 0 or data["hits"] > 0}
+
+class EventListModel:
+    """
+    逐条事件列表的数据模型（供界面中的虚拟表格使用）
+    只保存排序和筛选后的行号数组，各行的内容在显示时才从事件表中取出，
+    因此数百万条事件的排序和筛选也只是几次向量化运算。
+    """
+    
+    # 可以排序的列，与 rows() 返回的元组顺序相同
+    COLUMNS = ("time", "actor", "ability", "target", "amount", "crit", "cast")
+    
+    def __init__(self, table, rows=slice(None), start_time=0.0):
+        """
+        Args:
+            table: EventTable
+            rows: 行范围（如 encounter_rows() 或 time_rows() 的返回值）
+            start_time: 显示的时间相对于该时间（如战斗开始时间）
+        """
+        self.table = table
+        self.start = rows.start or 0
+        self.count = len(table.time[rows])
+        self.start_time = float(start_time)
+        
+        # 筛选后的行号（绝对行号）；None 表示范围内的全部行
+        self.selected = None
+        # 排序后的行号；None 表示与 selected 相同（按时间顺序）
+        self.order = None
+        self.sort_column = None
+        self.descending = False
+    
+    def __len__(self):
+        if self.order is not None:
+            return len(self.order)
+        if self.selected is not None:
+            return len(self.selected)
+        return self.count
+    
+    def range(self):
+        """模型对应的行范围"""
+        return slice(self.start, self.start + self.count)
+    
+    def symbol_mask(self, column, symbols, name):
+        """名称列等于 name 的掩码"""
+        symbol_id = symbols.get(name)
+        if symbol_id is None:
+            return np.zeros(self.count, dtype=bool)
+        return getattr(self.table, column)[self.range()] == symbol_id
+    
+    def set_filter(self, actor=None, ability=None, target=None, crit=None):
+        """
+        按施放者、技能、目标和是否暴击筛选，保持当前的排序方式
+
+        Args:
+            actor / ability / target: 名称，None 表示不筛选
+            crit: True 只显示暴击，False 只显示未暴击的命中，None 表示不筛选
+        """
+        table = self.table
+        mask = None
+        for column, symbols, name in (("actor", table.actors, actor),
+                                      ("ability", table.abilities, ability),
+                                      ("target", table.targets, target)):
+            if name is not None:
+                column_mask = self.symbol_mask(column, symbols, name)
+                mask = column_mask if mask is None else mask & column_mask
+        if crit is not None:
+            rows = self.range()
+            crit_mask = table.crit[rows] if crit else (~table.crit[rows] & (table.amount[rows] != NO_DAMAGE))
+            mask = crit_mask if mask is None else mask & crit_mask
+        
+        self.selected = None if mask is None else self.start + np.flatnonzero(mask)
+        self.sort(self.sort_column, self.descending)
+    
+    def sort(self, column, descending=False):
+        """
+        按列排序（稳定排序，值相同的行保持时间顺序）；column 为 None 时恢复时间顺序
+        """
+        self.sort_column = column
+        self.descending = descending
+        if column is None or (column == "time" and not descending):
+            self.order = None
+            return
+        
+        selected = self.selected if self.selected is not None else np.arange(self.start, self.start + self.count)
+        keys = self.sort_keys(column, selected)
+        if descending:
+            keys = -keys
+        self.order = selected[np.argsort(keys, kind="stable")]
+    
+    def sort_keys(self, column, selected):
+        """排序键：名称列按名称的字典序，布尔列转换为整数"""
+        table = self.table
+        values = getattr(table, column)[selected]
+        symbols = {"actor": table.actors, "ability": table.abilities, "target": table.targets}.get(column)
+        if symbols is not None:
+            names = [name or "" for name in symbols.names]
+            rank = np.empty(len(names), dtype=np.int64)
+            rank[np.array(sorted(range(len(names)), key=names.__getitem__), dtype=np.int64)] = np.arange(len(names))
+            return rank[values] if len(names) else values.astype(np.int64)
+        if values.dtype == bool:
+            return values.astype(np.int64)
+        return values
+    
+    def row_ids(self, first, last):
+        """第 first 到 last（不含）行对应的事件表行号"""
+        if self.order is not None:
+            return self.order[first:last]
+        if self.selected is not None:
+            return self.selected[first:last]
+        first = min(max(first, 0), self.count)
+        last = min(max(last, first), self.count)
+        return slice(self.start + first, self.start + last)
+    
+    def rows(self, first, last):
+        """
+        取出第 first 到 last（不含）行
+
+        Returns:
+            元组列表 (相对时间, 施放者, 技能, 目标, 伤害或 None, 是否暴击, 是否计为施放)
+        """
+        table = self.table
+        ids = self.row_ids(first, last)
+        actors = table.actors.names
+        abilities = table.abilities.names
+        targets = table.targets.names
+        return [
+            (time - self.start_time, actors[actor], abilities[ability], targets[target],
+             None if amount == NO_DAMAGE else amount, crit, cast)
+            for time, actor, ability, target, amount, crit, cast in zip(
+                table.time[ids].tolist(), table.actor[ids].tolist(), table.ability[ids].tolist(),
+                table.target[ids].tolist(), table.amount[ids].tolist(), table.crit[ids].tolist(),
+                table.cast[ids].tolist()
+            )
+        ]
+    
+    def distinct(self, column):
+        """范围内出现过的名称（用于筛选下拉菜单），按名称排序"""
+        symbols = {"actor": self.table.actors, "ability": self.table.abilities, "target": self.table.targets}[column]
+        ids = np.unique(getattr(self.table, column)[self.range()])
+        return sorted(symbols[symbol_id] for symbol_id in ids.tolist() if symbols[symbol_id] is not None)
@@ -1,6 +1,595 @@
+import io
+import os
 import re
 import json
-from datetime import datetime
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from event_store import EventTable, EventTableBuilder, TimeIndex, require_numpy
+from combat_log import CombatLogReader, is_combat_log
+from compressed_input import detect_compression, open_decompressed
+from result_stream import ResultStreamReader, ResultStreamWriter, is_result_stream
+from diagnostics import Diagnostics
+from parse_cache import directory_size
+from rotation_model import RotationModel, ROTATION
+
+# 事件分词器：一次匹配同时取出 时间、施放者、技能、目标、伤害 和 暴击标记
+# 例如: [12:30:20] 光明使者 使用了 十字军打击 对 奥妮克希亚 造成了 2200 点伤害 (暴击)
+# 没有技能事件的时间戳行（如"战斗开始"）只匹配到时间部分
+EVENT_PATTERN = re.compile(
+    r"\[(\d{2}:\d{2}:\d{2}(?:\.\d+)?)\]\s*"
+    r"(?:(\S+)\s+使用了\s+(\S+)"
+    r"(?:\s+对\s+(\S+))?"
+    r"(?:\s+造成了\s*(\d+)\s*点伤害)?"
+    r"(\s*[(（]暴击[)）])?)?"
+)
+PLAYER_PATTERN = re.compile(r"玩家\s*[：:]\s*([^\s]+)")
+TARGET_PATTERN = re.compile(r"目标\s*[：:]\s*([^\s]+)")
+# 文本日志的行以 [HH:MM:SS] 时间戳开头
+TEXT_LOG_LINE_PATTERN = re.compile(r"\s*\[\d{2}:\d{2}:\d{2}")
+# 判断是否为文本日志时检查的非空行数
+TEXT_LOG_SNIFF_LINES = 50
+
+SECONDS_PER_DAY = 24 * 3600
+
+# 日志格式：本工具的中文文本日志 / 客户端写出的 WoWCombatLog.txt
+LOG_FORMAT_TEXT = "text"
+LOG_FORMAT_COMBAT_LOG = "combat_log"
+
+# 解析器版本：解析或聚合逻辑变化时递增，使旧的解析缓存失效
+PARSER_VERSION = 2
+
+def is_text_log(head):
+    """
+    判断文本是否为本工具的文本日志：开头的非空行中至少一半以时间戳开头，
+    非日志文件（如 README.md）中偶尔出现的示例行不会使整个文件被当作日志
+    
+    Args:
+        head: 文件开头的一段文本
+    """
+    lines = [line for line in head.lstrip("\ufeff").splitlines() if line.strip()][:TEXT_LOG_SNIFF_LINES]
+    matched = sum(1 for line in lines if TEXT_LOG_LINE_PATTERN.match(line))
+    return bool(lines) and matched * 2 >= len(lines)
+
+class ParseCancelled(Exception):
+    """解析被用户取消"""
+
+class TimestampDecoder:
+    """
+    时间戳解码器
+    将 HH:MM:SS 或 HH:MM:SS.mmm 解码为秒数，代替开销较大的 datetime.strptime。
+    时间倒退超过半天时视为跨越午夜，之后的时间自动加上一天，
+    因此战斗时长、DPS 等计算在午夜前后也保持正确。
+    """
+    
+    # 时间倒退超过该秒数时判定为跨越午夜
+    ROLLOVER_THRESHOLD = SECONDS_PER_DAY // 2
+    # 备忘缓存的最大条目数（同一秒内通常有多条事件）
+    CACHE_SIZE = 4096
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """重置跨日状态和缓存"""
+        self.cache = {}
+        self.day_offset = 0
+        self.first_seconds = None
+        self.last_seconds = None
+    
+    def seconds_of_day(self, time_str):
+        """将时间字符串解码为当天的秒数（带小数部分时返回浮点数）"""
+        seconds = self.cache.get(time_str)
+        if seconds is None:
+            seconds = int(time_str[0:2]) * 3600 + int(time_str[3:5]) * 60 + int(time_str[6:8])
+            if len(time_str) > 8:
+                seconds += float("0" + time_str[8:])
+            
+            if len(self.cache) >= self.CACHE_SIZE:
+                self.cache.clear()
+            self.cache[time_str] = seconds
+        return seconds
+    
+    def decode(self, time_str):
+        """将时间字符串解码为连续的秒数，自动处理跨越午夜"""
+        seconds = self.seconds_of_day(time_str)
+        
+        if self.last_seconds is None:
+            self.first_seconds = seconds
+        elif seconds < self.last_seconds - self.ROLLOVER_THRESHOLD:
+            self.day_offset += SECONDS_PER_DAY
+        self.last_seconds = seconds
+        
+        return seconds + self.day_offset
+
+class Encounter:
+    """
+    单场战斗的聚合数据
+    只保存计数器，内存占用与事件数量无关
+    """
+    
+    def __init__(self, start_time, started_by_marker=False):
+        self.start_time = start_time
+        self.end_time = start_time
+        self.last_cast_time = None
+        self.started_by_marker = started_by_marker
+        # 结束原因："end"（战斗结束标记）、"start"（新的开始标记）、"gap"（空闲超时）
+        self.closed_by = None
+        self.player = None
+        self.boss = None
+        # 技能事件数（施放和命中），也是该战斗在事件表中的行数
+        self.casts = 0
+        # (施放者, 技能) -> {"name", "casts", "damage", "crits", "hits"}
+        # 一遍解析即可得到所有玩家的数据，条目数只与玩家数和技能数有关
+        self.actor_data = {}
+        # 在事件表（event_store.EventTable）中的行范围，未保留事件时为 None
+        self.event_rows = None
+    
+    def get_actors(self):
+        """返回战斗中出现过的所有施放者，按总伤害从高到低排序"""
+        damage_by_actor = {}
+        for (actor, ability), data in self.actor_data.items():
+            damage_by_actor[actor] = damage_by_actor.get(actor, 0) + data["damage"]
+        return sorted(damage_by_actor, key=damage_by_actor.get, reverse=True)
+    
+    def get_ability_data(self, actor):
+        """返回指定施放者的技能使用数据（技能 -> 统计）"""
+        ability_data = {}
+        for (data_actor, ability), data in self.actor_data.items():
+            if data_actor == actor:
+                ability_data[ability] = data
+        return ability_data
+    
+    def main_actor(self):
+        """返回默认分析的玩家：日志头中的玩家，不存在时取伤害最高的施放者"""
+        actors = self.get_actors()
+        if self.player in actors or not actors:
+            return self.player
+        return actors[0]
+    
+    def merge(self, other):
+        """将时间上紧随其后的另一段数据合并到本场战斗中"""
+        for key, data in other.actor_data.items():
+            ability_data = self.actor_data.get(key)
+            if ability_data is None:
+                self.actor_data[key] = dict(data)
+            else:
+                ability_data["casts"] += data["casts"]
+                ability_data["damage"] += data["damage"]
+                ability_data["crits"] += data["crits"]
+                ability_data["hits"] += data["hits"]
+        
+        self.casts += other.casts
+        if self.start_time is None:
+            self.start_time = other.start_time
+        if other.end_time is not None:
+            self.end_time = other.end_time
+        if other.last_cast_time is not None:
+            self.last_cast_time = other.last_cast_time
+        self.player = other.player or self.player
+        self.boss = other.boss or self.boss
+    
+    def to_dict(self):
+        """转换为可以序列化为 JSON 的字典（用于解析缓存）"""
+        return {
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "last_cast_time": self.last_cast_time,
+            "started_by_marker": self.started_by_marker,
+            "closed_by": self.closed_by,
+            "player": self.player,
+            "boss": self.boss,
+            "casts": self.casts,
+            "actor_data": [[actor, ability, data] for (actor, ability), data in self.actor_data.items()]
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """从 to_dict() 生成的字典恢复"""
+        encounter = cls(data["start_time"], data["started_by_marker"])
+        encounter.end_time = data["end_time"]
+        encounter.last_cast_time = data["last_cast_time"]
+        encounter.closed_by = data["closed_by"]
+        encounter.player = data["player"]
+        encounter.boss = data["boss"]
+        encounter.casts = data["casts"]
+        for actor, ability, ability_data in data["actor_data"]:
+            encounter.actor_data[(actor, ability)] = ability_data
+        return encounter
+    
+    def shift(self, offset):
+        """将所有时间平移 offset 秒（用于拼接分块解析的结果）"""
+        if self.start_time is not None:
+            self.start_time += offset
+        if self.end_time is not None:
+            self.end_time += offset
+        if self.last_cast_time is not None:
+            self.last_cast_time += offset
+
+class EncounterSegmenter:
+    """
+    战斗分段器
+    将事件流切分为多场战斗：遇到"战斗开始"/"进入战斗"标记，
+    或两条事件之间的空闲时间超过 idle_gap 秒时开始新的战斗，
+    遇到"战斗结束"标记时结束当前战斗。
+
+    chunk_mode 用于并行解析的单个文件分块：分块开头的事件可能属于上一块
+    尚未结束的战斗，因此在遇到第一个切分点之前的事件单独保存为 leading，
+    由 feed_chunk() 在合并时按顺序决定归属。
+    """
+    
+    def __init__(self, idle_gap, chunk_mode=False):
+        self.idle_gap = idle_gap
+        self.chunk_mode = chunk_mode
+        self.encounters = []
+        self.current = None
+        
+        # 分块模式下，第一个切分点之前的片段及其切分原因
+        self.leading_pending = chunk_mode
+        self.leading = None
+        self.leading_boundary = None
+    
+    def close_current(self, reason=None):
+        """结束当前战斗，没有任何技能事件的片段（如战斗间隙）直接丢弃"""
+        current = self.current
+        self.current = None
+        
+        if self.leading_pending:
+            self.leading_pending = False
+            self.leading = current
+            self.leading_boundary = reason
+            return
+        
+        # 分块模式下保留空片段，它的结束标记在合并时仍然需要
+        if current is not None and (current.casts > 0 or self.chunk_mode):
+            current.closed_by = reason
+            self.encounters.append(current)
+    
+    def feed(self, events):
+        """将事件流累加到当前战斗中，必要时切分出新的战斗"""
+        idle_gap = self.idle_gap
+        
+        for event in events:
+            kind = event[0]
+            if kind == "line" or kind == "hit":
+                _, current_time, actor, ability, target, damage, is_crit = event
+                
+                current = self.current
+                if current is None:
+                    current = self.current = Encounter(current_time)
+                elif current.start_time is None:
+                    current.start_time = current_time
+                elif current_time - current.end_time > idle_gap:
+                    if current.casts > 0 or self.leading_pending:
+                        self.close_current("gap")
+                        current = self.current = Encounter(current_time)
+                    elif not current.started_by_marker:
+                        # 战斗前零散的记录不计入战斗时间
+                        current.start_time = current_time
+                
+                current.end_time = current_time
+                
+                if ability is None:
+                    continue
+                
+                key = (actor, ability)
+                ability_data = current.actor_data.get(key)
+                if ability_data is None:
+                    ability_data = current.actor_data[key] = {
+                        "name": ability,
+                        "casts": 0,
+                        "damage": 0,
+                        "crits": 0,
+                        "hits": 0
+                    }
+                # "hit" 是不计施放次数的伤害（如客户端战斗日志中法术的每次伤害）
+                if kind == "line":
+                    ability_data["casts"] += 1
+                current.casts += 1
+                
+                if damage is not None:
+                    ability_data["damage"] += damage
+                    ability_data["hits"] += 1
+                    
+                    # 检查是否暴击
+                    if is_crit:
+                        ability_data["crits"] += 1
+                
+                current.last_cast_time = current_time
+            elif kind == "start":
+                # 已有技能事件时开始新的战斗；否则（如连续的开始标记）沿用当前战斗，
+                # 但以标记时间作为战斗开始时间
+                if self.leading_pending or (self.current is not None and self.current.casts > 0):
+                    self.close_current("start")
+                if self.current is None:
+                    self.current = Encounter(event[1], started_by_marker=True)
+                else:
+                    self.current.start_time = self.current.end_time = event[1]
+                    self.current.started_by_marker = True
+            elif kind == "end":
+                if self.current is None and self.leading_pending:
+                    # 结束时间属于上一块的战斗，用一个空片段带过去
+                    self.current = Encounter(event[1])
+                if self.current is not None and self.current.start_time is not None:
+                    self.current.end_time = event[1]
+                self.close_current("end")
+            elif kind == "player":
+                if self.current is None:
+                    self.current = Encounter(event[2])
+                self.current.player = event[1]
+            elif kind == "boss":
+                if self.current is None:
+                    self.current = Encounter(event[2])
+                self.current.boss = event[1]
+    
+    def finish_chunk(self, timestamp_decoder):
+        """
+        结束分块模式的分段，返回用于合并的分块结果
+
+        Args:
+            timestamp_decoder: 解析该分块时使用的 TimestampDecoder
+            
+        Returns:
+            分块结果字典，各战斗的时间均相对于分块内部的第一天
+        """
+        if self.leading_pending:
+            # 整个分块都没有切分点
+            self.leading_pending = False
+            self.leading = self.current
+            self.current = None
+        
+        return {
+            "leading": self.leading,
+            "boundary": self.leading_boundary,
+            "encounters": self.encounters,
+            "trailing": self.current,
+            "first_seconds": timestamp_decoder.first_seconds,
+            "last_seconds": timestamp_decoder.last_seconds,
+            "day_offset": timestamp_decoder.day_offset
+        }
+    
+    def absorb(self, segment):
+        """按分段规则把分块中的一个片段接到当前战斗之后"""
+        current = self.current
+        if current is None:
+            self.current = segment
+            return
+        
+        if segment.started_by_marker:
+            is_new = True
+        elif segment.start_time is None or current.end_time is None:
+            is_new = False
+        else:
+            is_new = segment.start_time - current.end_time > self.idle_gap
+        
+        if not is_new:
+            current.merge(segment)
+        elif current.casts > 0:
+            self.close_current(current.closed_by or ("start" if segment.started_by_marker else "gap"))
+            self.current = segment
+        elif current.started_by_marker and not segment.started_by_marker:
+            current.merge(segment)
+        else:
+            # 当前片段没有技能事件，只保留它的玩家/目标信息
+            segment.player = segment.player or current.player
+            segment.boss = segment.boss or current.boss
+            self.current = segment
+    
+    def feed_chunk(self, chunk, offset):
+        """
+        按顺序合并一个分块的结果
+
+        Args:
+            chunk: finish_chunk() 返回的分块结果
+            offset: 该分块的时间偏移（秒），用于处理跨越午夜
+        """
+        segments = []
+        if chunk["leading"] is not None:
+            segments.append(chunk["leading"])
+        segments.extend(chunk["encounters"])
+        if chunk["trailing"] is not None:
+            segments.append(chunk["trailing"])
+        for segment in segments:
+            segment.shift(offset)
+        
+        if chunk["leading"] is not None:
+            self.absorb(chunk["leading"])
+        if chunk["boundary"] == "end":
+            self.close_current("end")
+        
+        for encounter in chunk["encounters"]:
+            self.absorb(encounter)
+            if encounter.closed_by == "end":
+                self.close_current("end")
+        
+        if chunk["trailing"] is not None:
+            self.absorb(chunk["trailing"])
+    
+    def finish(self):
+        """
+        结束分段并返回全部战斗
+
+        Returns:
+            Encounter 列表；整个日志都没有技能事件时返回只包含一个空战斗的列表
+        """
+        current = self.current
+        self.close_current()
+        if not self.encounters:
+            empty = current if current is not None else Encounter(None)
+            self.encounters.append(empty)
+        
+        self.inherit_players(self.encounters)
+        return self.encounters
+    
+    def snapshot(self):
+        """
+        返回到目前为止的全部战斗（包括尚未结束的当前战斗），不结束分段
+
+        Returns:
+            Encounter 列表；还没有技能事件时返回空列表
+        """
+        encounters = list(self.encounters)
+        if self.current is not None and self.current.casts > 0:
+            encounters.append(self.current)
+        
+        self.inherit_players(encounters)
+        return encounters
+    
+    def inherit_players(self, encounters):
+        """没有玩家信息的战斗沿用上一场战斗的玩家"""
+        last_player = None
+        for encounter in encounters:
+            if encounter.player:
+                last_player = encounter.player
+            else:
+                encounter.player = last_player
+
+class LogTailer:
+    """
+    实时跟踪正在写入的战斗日志
+    记住上次读取到的字节位置，每次只解析新增的完整行，并在已有的聚合数据上增量更新。
+    文件末尾尚未写完的半行会保留到下一次读取；日志被截断或轮转（换成新文件）时从头开始。
+    """
+    
+    # 每次读取的块大小
+    READ_BLOCK_SIZE = 1024 * 1024
+    
+    def __init__(self, parser, file_path):
+        """
+        Args:
+            parser: 用于分词和生成结果的 LogParser
+            file_path: 要跟踪的日志文件路径
+        """
+        self.parser = parser
+        self.file_path = file_path
+        self.reset()
+    
+    def reset(self):
+        """清空已读取的位置和聚合数据，从文件开头重新跟踪"""
+        self.parser.reset_data()
+        self.segmenter = EncounterSegmenter(self.parser.idle_gap)
+        self.offset = 0
+        self.pending = b""
+        self.file_id = None
+        self.lines_read = 0
+    
+    def poll(self, max_bytes=None, cancel_event=None):
+        """
+        读取并解析文件新增的内容
+        
+        Args:
+            max_bytes: 本次最多读取的字节数，None 表示读到文件末尾
+            cancel_event: threading.Event，被设置后在读取下一块之前抛出 ParseCancelled
+                          （已解析的块保留，下次从中断处继续）
+            
+        Returns:
+            是否还有未读取的新内容（读取量达到 max_bytes 时为 True）
+        """
+        stat = os.stat(self.file_path)
+        file_id = (stat.st_dev, stat.st_ino)
+        if self.file_id is not None and (file_id != self.file_id or stat.st_size < self.offset):
+            # 日志被轮转或截断
+            self.reset()
+        self.file_id = file_id
+        
+        if stat.st_size == self.offset:
+            return False
+        if self.offset == 0:
+            self.parser.detect_format(self.file_path)
+            if self.parser.compression is not None:
+                raise ValueError("压缩的日志文件不支持实时跟踪")
+        
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.offset)
+            budget = max_bytes
+            while budget is None or budget > 0:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ParseCancelled()
+                size = self.READ_BLOCK_SIZE if budget is None else min(self.READ_BLOCK_SIZE, budget)
+                block = f.read(size)
+                if not block:
+                    break
+                self.offset += len(block)
+                if budget is not None:
+                    budget -= len(block)
+                
+                # 只处理完整的行，末尾的半行留到下次
+                block = self.pending + block
+                cut = block.rfind(b"\n") + 1
+                self.pending = block[cut:]
+                if cut:
+                    lines = block[:cut].decode('utf-8', errors='replace').split("\n")
+                    lines.pop()
+                    self.lines_read += len(lines)
+                    self.segmenter.feed(self.parser.iter_events(lines))
+        
+        return self.offset < os.path.getsize(self.file_path)
+    
+    def results(self):
+        """
+        根据当前的聚合数据生成各场战斗的分析结果（包括正在进行的战斗）
+        
+        Returns:
+            分析结果字典的列表，同时更新 parser.encounters / parser.results
+        """
+        parser = self.parser
+        parser.encounters = self.segmenter.snapshot()
+        parser.results = [parser.build_result(encounter, checklist=False) for encounter in parser.encounters]
+        return parser.results
+
+def split_file_ranges(file_path, parts):
+    """
+    将文件按字节切分为若干段，每段的边界都对齐到行首
+
+    Args:
+        file_path: 文件路径
+        parts: 期望的分段数
+        
+    Returns:
+        (起始偏移, 结束偏移) 列表
+    """
+    size = os.path.getsize(file_path)
+    boundaries = [0]
+    with open(file_path, 'rb') as f:
+        for i in range(1, parts):
+            position = size * i // parts
+            if position <= boundaries[-1]:
+                continue
+            # 从前一个字节开始读到行尾，恰好落在行首时不会跳过整行
+            f.seek(position - 1)
+            f.readline()
+            boundary = f.tell()
+            if boundaries[-1] < boundary < size:
+                boundaries.append(boundary)
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+def parse_chunk(file_path, start, end, idle_gap, keep_events=False,
+                log_format=LOG_FORMAT_TEXT, combat_log_version=None):
+    """
+    解析文件中的一段字节范围（在工作进程中执行）
+
+    日志格式由主进程判断后传入（客户端战斗日志的版本号只写在文件开头）。
+
+    Returns:
+        EncounterSegmenter.finish_chunk() 返回的分块结果；
+        keep_events 时 "events" 为该分块的 EventTableBuilder
+    """
+    parser = LogParser(idle_gap)
+    parser.log_format = log_format
+    parser.combat_log_version = combat_log_version
+    lines = parser.iter_lines(file_path, start, end)
+    events = parser.iter_events(lines)
+    builder = None
+    if keep_events:
+        builder = EventTableBuilder()
+        events = builder.tee(events)
+    
+    segmenter = EncounterSegmenter(idle_gap, chunk_mode=True)
+    segmenter.feed(events)
+    chunk = segmenter.finish_chunk(parser.timestamp_decoder)
+    chunk["events"] = builder
+    return chunk
 
 class LogParser:
     """
@@ -8,49 +597,126 @@ class LogParser:
     用于解析魔兽世界战斗日志，提取惩戒骑士相关的战斗数据
     """
     
-    def __init__(self):
+    # 默认的战斗切分空闲时间（秒）
+    DEFAULT_IDLE_GAP = 30
+    # 小于该大小的文件即使指定了多个进程也直接单进程解析
+    PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+    # 按字节范围读取时每次读取的块大小
+    READ_BLOCK_SIZE = 1024 * 1024
+    # 每读取多少行回报一次进度并检查是否取消
+    PROGRESS_INTERVAL = 20000
+    # 判断日志格式时读取的文件开头字节数
+    FORMAT_SNIFF_BYTES = 64 * 1024
+    
+    def __init__(self, idle_gap=DEFAULT_IDLE_GAP, cache=None, keep_events=False, diagnostics=False):
+        # 两条事件间隔超过该秒数时切分为新的战斗
+        self.idle_gap = idle_gap
+        
+        # 解析结果缓存（parse_cache.ParseCache），为 None 时不使用缓存
+        self.cache = cache
+        
+        # 是否在解析时保留逐条事件的列式事件表（需要 numpy），
+        # 保留时分析结果由事件表的向量化统计生成
+        self.keep_events = keep_events
+        if keep_events:
+            require_numpy()
+        
+        # 诊断信息：各阶段用时和计数器，设置 self.diagnostics.profile 后同时记录 cProfile 结果
+        self.diagnostics = Diagnostics(enabled=diagnostics)
+        
+        # 输出循环模型：检查列表中的期望施放次数和 DPS 分布由蒙特卡洛模拟得到，
+        # 只在 evaluate_checklist() 时为要显示或输出的结果模拟
+        self.rotation_model = RotationModel()
+        
+        # 进度回调 progress_callback(已读字节数, 总字节数, 已读行数) 和取消标志（threading.Event）
+        self.progress_callback = None
+        self.cancel_event = None
+        
         # 惩戒骑士技能列表
+        # spell_ids 为客户端战斗日志中的法术 ID（包括各等级和审判的伤害效果），
+        # 近战攻击在客户端日志中是 SWING 事件，没有法术 ID
         self.paladin_abilities = {
             "审判": {
-                "pattern": r"审判",
+                "spell_ids": [20271, 53407, 53408, 20187, 20467, 31804, 31898, 53726, 53733],
                 "is_damage": True
             },
             "十字军打击": {
-                "pattern": r"十字军打击",
+                "spell_ids": [35395],
                 "is_damage": True
             },
             "奉献": {
-                "pattern": r"奉献",
+                "spell_ids": [26573, 20116, 20922, 20923, 20924, 27173, 48818, 48819],
                 "is_damage": True
             },
             "神圣风暴": {
-                "pattern": r"神圣风暴",
+                "spell_ids": [53385],
                 "is_damage": True
             },
             "白色攻击": {
-                "pattern": r"攻击",
+                "aliases": ["攻击"],
                 "is_damage": True
             },
             "圣光术": {
-                "pattern": r"圣光术",
+                "spell_ids": [635, 639, 647, 1026, 1042, 3472, 10328, 10329, 25292, 27135, 27136, 48781, 48782],
                 "is_damage": False
             },
             "圣疗术": {
-                "pattern": r"圣疗术",
+                "spell_ids": [633, 2800, 10310, 27154, 48788],
                 "is_damage": False
             },
             "圣盾术": {
-                "pattern": r"圣盾术",
+                "spell_ids": [642, 1020],
                 "is_damage": False
             }
         }
         
+        # 日志中的技能名 -> 技能，用哈希查找代替逐个技能的正则匹配
+        self.ability_lookup = {}
+        # 法术 ID（字符串，与日志中的字段直接比较） -> 技能
+        self.spell_lookup = {}
+        for ability, info in self.paladin_abilities.items():
+            self.ability_lookup[ability] = ability
+            for alias in info.get("aliases", []):
+                self.ability_lookup[alias] = ability
+            for spell_id in info.get("spell_ids", []):
+                self.spell_lookup[str(spell_id)] = ability
+        
+        # 日志格式和客户端战斗日志的版本号，由 detect_format() 根据文件内容判断
+        self.log_format = LOG_FORMAT_TEXT
+        self.combat_log_version = None
+        # 文件开头是否像战斗日志（文本日志或客户端战斗日志），非日志文件为 False
+        self.format_recognized = False
+        # 文件的压缩格式（compressed_input.COMPRESSION_*），未压缩时为 None
+        self.compression = None
+        
         # 初始化数据结构
         self.reset_data()
     
     def reset_data(self):
         """重置数据结构"""
-        self.data = {
+        self.data = self.empty_result()
+        self.ability_data = self.empty_ability_data()
+        
+        # 分段后的各场战斗及其分析结果
+        self.encounters = []
+        self.results = []
+        # 打开的结果流（result_stream.ResultStreamReader），此时 self.results 为惰性列表
+        self.result_stream = None
+        
+        # 列式事件表（event_store.EventTable），仅在 keep_events 时生成
+        self.event_table = None
+        # (战斗序号, 桶秒数) -> TimeIndex，首次查询时间窗口时建立
+        self.time_indexes = {}
+        
+        # 战斗时间数据（秒，由 TimestampDecoder 解码）
+        self.timestamp_decoder = TimestampDecoder()
+        self.start_time = None
+        self.end_time = None
+        self.last_cast_time = None
+    
+    def empty_result(self):
+        """返回空的分析结果结构"""
+        return {
             "player": "",
             "boss": "",
             "duration": 0,
@@ -64,42 +730,48 @@ class LogParser:
                 "idleTime": 0,
                 "efficiency": 0
             },
-            "checklist": []
+            # 由 generate_checklist() / evaluate_checklist() 生成，为空表示尚未生成
+            "checklist": [],
+            "rotationModel": None
         }
-        
-        # 技能使用数据
-        self.ability_data = {}
+    
+    def empty_ability_data(self):
+        """返回空的技能使用数据"""
+        ability_data = {}
         for ability in self.paladin_abilities:
-            self.ability_data[ability] = {
+            ability_data[ability] = {
                 "name": ability,
                 "casts": 0,
                 "damage": 0,
                 "crits": 0,
                 "hits": 0
             }
-        
-        # 战斗时间数据
-        self.start_time = None
-        self.end_time = None
-        self.last_cast_time = None
+        return ability_data
     
-    def parse_file(self, file_path):
+    def parse_file(self, file_path, workers=1, progress_callback=None, cancel_event=None):
         """
         解析日志文件
         
         Args:
             file_path: 日志文件路径
+            workers: 并行解析的进程数，1 表示单进程
+            progress_callback: 进度回调，参数为 (已读字节数, 总字节数, 已读行数)
+            cancel_event: threading.Event，被设置后解析抛出 ParseCancelled
             
         Returns:
             解析后的数据字典
         """
         self.reset_data()
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
         
         # 检查文件类型
+        if is_result_stream(file_path):
+            return self.parse_result_stream(file_path)
         if file_path.endswith('.json'):
             return self.parse_json_file(file_path)
         else:
-            return self.parse_text_file(file_path)
+            return self.parse_text_file(file_path, workers)
     
     def parse_json_file(self, file_path):
         """解析JSON格式的日志文件"""
@@ -109,6 +781,7 @@ class LogParser:
             
             # 如果是已经分析过的数据，直接返回
             if "player" in data and "abilities" in data:
+                self.results = [data]
                 return data
             
             # 否则尝试解析JSON格式的原始日志
@@ -122,165 +795,738 @@ class LogParser:
             print(f"解析JSON文件时出错: {str(e)}")
             return self.get_mock_data()
     
-    def parse_text_file(self, file_path):
-        """解析文本格式的战斗日志"""
+    def parse_result_stream(self, file_path):
+        """
+        打开保存的结果流（JSON Lines），只读取索引
+        各场战斗和各玩家的结果在切换到该战斗或玩家时才从文件中读取
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+            reader = ResultStreamReader(file_path)
+            if not reader.encounter_count():
+                raise ValueError("结果流中没有战斗")
+            self.result_stream = reader
+            self.results = reader.default_results()
+            return self.results[0]
             
-            # 解析玩家和Boss信息
-            player_name = "未知玩家"
-            boss_name = "未知Boss"
+        except Exception as e:
+            print(f"读取结果流时出错: {str(e)}")
+            return self.get_mock_data()
+    
+    def save_result_stream(self, file_path, all_players=True, cancel_event=None):
+        """
+        将各场战斗的结果逐条写入结果流（JSON Lines），内存中只保留索引
+        
+        Args:
+            file_path: 输出文件路径
+            all_players: 是否写入每场战斗中所有玩家的结果；否则只写入各场战斗的默认结果
+            cancel_event: threading.Event，被设置后停止写入并抛出 ParseCancelled（目标文件保持不变）
             
-            for line in lines[:100]:  # 只检查前100行
-                player_match = re.search(r"玩家\s*[：:]\s*([^\s]+)", line)
-                if player_match:
-                    player_name = player_match.group(1)
-                
-                boss_match = re.search(r"目标\s*[：:]\s*([^\s]+)", line)
-                if boss_match:
-                    boss_name = boss_match.group(1)
+        Returns:
+            写入的结果条数
+        """
+        with ResultStreamWriter(file_path) as writer:
+            for index, result in enumerate(self.results):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ParseCancelled()
+                # 保存的每条结果都带有检查列表
+                writer.write(index + 1, self.evaluate_checklist(result))
+                if not all_players:
+                    continue
+                for actor in self.get_actors(index):
+                    if actor != result["player"]:
+                        writer.write(index + 1, self.evaluate_checklist(self.get_player_report(actor, index)))
+            count = len(writer.index)
+        
+        # 覆盖了当前打开的结果流时，原索引中的偏移已失效，重新读取索引
+        if self.result_stream is not None and os.path.samefile(self.result_stream.file_path, file_path):
+            self.result_stream = ResultStreamReader(file_path)
+            self.results = self.result_stream.default_results()
+        return count
+    
+    def parse_text_file(self, file_path, workers=1):
+        """
+        解析文本格式的战斗日志
+
+        日志中的每场战斗都会单独分析，结果保存在 self.results 中，
+        返回值为第一场战斗的分析结果。
+        """
+        try:
+            return self.evaluate_checklist(self.parse_encounters(file_path, workers)[0])
             
-            self.data["player"] = player_name
-            self.data["boss"] = boss_name
+        except ParseCancelled:
+            raise
+        except Exception as e:
+            print(f"解析文本文件时出错: {str(e)}")
+            return self.get_mock_data()
+    
+    def parse_encounters(self, file_path, workers=1):
+        """
+        解析文本格式的战斗日志，返回每场战斗的分析结果
+
+        文本日志和客户端战斗日志（WoWCombatLog.txt）根据文件内容自动识别。
+        采用流式处理：读取 -> 分词 -> 分段聚合 三个生成器阶段串联，
+        文件只读取一遍，且任何时刻只有一行文本驻留内存。
+        workers 大于 1 时，文件按行边界切分为多段，在进程池中并行解析后合并。
+        keep_events 时同时生成事件表，事件表保存为二进制附属文件而不使用聚合缓存。
+        
+        启用诊断时，各阶段的用时和计数器记录在 self.diagnostics 中（不附加到结果，结果保存时不含诊断信息）。
+        
+        Args:
+            file_path: 日志文件路径
+            workers: 并行解析的进程数，1 表示单进程
             
-            # 解析战斗时间
-            for line in lines:
-                time_match = re.search(r"\[(\d{2}:\d{2}:\d{2})\]", line)
-                if time_match:
-                    time_str = time_match.group(1)
-                    current_time = datetime.strptime(time_str, "%H:%M:%S")
-                    
-                    if not self.start_time:
-                        self.start_time = current_time
-                    
-                    self.end_time = current_time
-                    
-                    # 检查技能使用
-                    for ability, info in self.paladin_abilities.items():
-                        if re.search(info["pattern"], line):
-                            self.ability_data[ability]["casts"] += 1
-                            
-                            # 检查是否是伤害技能
-                            if info["is_damage"]:
-                                damage_match = re.search(r"造成了\s*(\d+)\s*点伤害", line)
-                                if damage_match:
-                                    damage = int(damage_match.group(1))
-                                    self.ability_data[ability]["damage"] += damage
-                                    self.ability_data[ability]["hits"] += 1
-                                    
-                                    # 检查是否暴击
-                                    if "暴击" in line:
-                                        self.ability_data[ability]["crits"] += 1
-                            
-                            self.last_cast_time = current_time
-                            break
+        Returns:
+            分析结果字典的列表，每场战斗一个
+        """
+        # 同一个解析器解析多个文件时，不沿用上一个文件的战斗、事件表、时间索引和时间戳解码状态
+        self.reset_data()
+        diagnostics = self.diagnostics
+        diagnostics.begin()
+        try:
+            return self.parse_log(file_path, workers)
+        finally:
+            diagnostics.end()
+    
+    def parse_log(self, file_path, workers=1):
+        """parse_encounters() 的解析过程，各阶段的用时和计数记录在 self.diagnostics 中"""
+        diagnostics = self.diagnostics
+        diagnostics.count("bytes", os.path.getsize(file_path))
+        with diagnostics.stage("detect_format"):
+            self.detect_format(file_path)
+        diagnostics.note("format", self.log_format)
+        if self.compression is not None:
+            diagnostics.note("compression", self.compression)
+        if self.keep_events:
+            return self.parse_event_table(file_path, workers)
+        
+        cache_key = None
+        if self.cache is not None:
+            with diagnostics.stage("cache_lookup"):
+                cache_key = self.cache.make_key(file_path, self.cache_version())
+                cached = self.cache.get(cache_key)
+            diagnostics.note("cache", "命中" if cached is not None else "未命中")
+            if cached is not None:
+                self.encounters = [Encounter.from_dict(data) for data in cached]
+                self.build_results()
+                return self.results
+        
+        if self.can_parse_parallel(file_path, workers):
+            diagnostics.note("mode", f"并行（{workers} 进程）")
+            with diagnostics.stage("parse_parallel"):
+                self.encounters = self.parse_parallel(file_path, workers)
+        else:
+            diagnostics.note("mode", "单进程")
+            lines = diagnostics.timed_iter("read", self.iter_lines(file_path, workers=workers), "lines_read")
+            events = diagnostics.timed_iter("tokenize", self.iter_events(lines), "events", upstream="read")
             
-            # 计算战斗时长（秒）
-            if self.start_time and self.end_time:
-                delta = self.end_time - self.start_time
-                self.data["duration"] = delta.total_seconds()
+            with diagnostics.stage("segment", exclude=("tokenize",)):
+                segmenter = EncounterSegmenter(self.idle_gap)
+                segmenter.feed(events)
+                self.encounters = segmenter.finish()
+        
+        # 解析期间文件被修改（如仍在写入）时不写入缓存
+        if cache_key is not None and cache_key == self.cache.make_key(file_path, self.cache_version()):
+            with diagnostics.stage("cache_store"):
+                self.cache.put(cache_key, file_path, [encounter.to_dict() for encounter in self.encounters])
+        
+        self.build_results()
+        return self.results
+    
+    def can_parse_parallel(self, file_path, workers):
+        """
+        是否按字节范围在进程池中并行解析
+        压缩文件无法按字节范围切分，只能单进程顺序解析（BGZF 文件的解压仍然多线程并行）
+        """
+        return (workers > 1 and self.compression is None
+                and os.path.getsize(file_path) >= self.PARALLEL_MIN_BYTES)
+    
+    def build_results(self):
+        """
+        为每场战斗生成分析结果，并记录战斗数和匹配到的技能事件数
+        各结果的检查列表在显示或保存时由 evaluate_checklist() 生成
+        """
+        with self.diagnostics.stage("build_result"):
+            self.results = [self.build_result(encounter, checklist=False) for encounter in self.encounters]
+        self.diagnostics.count("encounters", len(self.encounters))
+        self.diagnostics.count("lines_matched", sum(encounter.casts for encounter in self.encounters))
+    
+    def parse_event_table(self, file_path, workers=1):
+        """
+        解析日志，同时生成列式事件表
+
+        每场战斗的技能事件在表中连续存放，分析结果由事件表的向量化统计生成。
+        使用缓存时事件表保存为附属文件，再次打开未修改的日志时以内存映射方式加载，
+        不再读取和分词原始文本。
+        """
+        diagnostics = self.diagnostics
+        cache_key = None
+        sidecar = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(file_path, self.cache_version())
+            sidecar = self.cache.sidecar_dir(file_path)
+            with diagnostics.stage("sidecar_load"):
+                loaded = self.load_event_table(sidecar, cache_key)
+            diagnostics.note("cache", "命中（事件表附属文件）" if loaded else "未命中")
+            if loaded:
+                return self.results
+        
+        builder = EventTableBuilder()
+        if self.can_parse_parallel(file_path, workers):
+            diagnostics.note("mode", f"并行（{workers} 进程）")
+            with diagnostics.stage("parse_parallel"):
+                self.encounters = self.parse_parallel(file_path, workers, builder)
+        else:
+            diagnostics.note("mode", "单进程")
+            lines = diagnostics.timed_iter("read", self.iter_lines(file_path, workers=workers), "lines_read")
+            events = diagnostics.timed_iter("tokenize", self.iter_events(lines), "events", upstream="read")
+            events = builder.tee(events)
             
-            # 处理技能数据
-            total_damage = 0
-            total_hits = 0
-            total_crits = 0
+            with diagnostics.stage("segment", exclude=("tokenize",)):
+                segmenter = EncounterSegmenter(self.idle_gap)
+                segmenter.feed(events)
+                self.encounters = segmenter.finish()
+        
+        with diagnostics.stage("event_table"):
+            self.event_table = builder.build([encounter.casts for encounter in self.encounters])
+        
+        # 解析期间文件被修改（如仍在写入）时不保存附属文件
+        if cache_key is not None and cache_key == self.cache.make_key(file_path, self.cache_version()):
+            meta = {
+                "key": cache_key,
+                "path": os.path.abspath(file_path),
+                "encounters": [encounter.to_dict() for encounter in self.encounters]
+            }
+            try:
+                with diagnostics.stage("sidecar_save"):
+                    self.event_table.save(sidecar, meta)
+                    # 附属文件随缓存条目一起按 LRU 淘汰
+                    self.cache.put(cache_key, file_path, meta["encounters"], directory_size(sidecar))
+            except OSError as e:
+                print(f"保存事件表时出错: {str(e)}")
+        
+        self.attach_event_table()
+        return self.results
+    
+    def load_event_table(self, sidecar, cache_key):
+        """
+        以内存映射方式加载事件表附属文件
+
+        Returns:
+            附属文件存在且与日志文件匹配时返回 True，并生成 self.results
+        """
+        try:
+            table, meta = EventTable.load(sidecar)
+        except (OSError, ValueError, KeyError):
+            return False
+        if not meta or meta.get("key") != cache_key:
+            return False
+        if not self.cache.touch(cache_key):
+            # 没有对应缓存条目的附属文件（由旧版本保存）补登记，使其可以被淘汰
+            self.cache.put(cache_key, meta["path"], meta["encounters"], directory_size(sidecar))
+        
+        self.event_table = table
+        self.encounters = [Encounter.from_dict(data) for data in meta["encounters"]]
+        self.attach_event_table()
+        return True
+    
+    def attach_event_table(self):
+        """为每场战斗标记其在事件表中的行范围，并由事件表生成分析结果"""
+        for index, encounter in enumerate(self.encounters):
+            encounter.event_rows = self.event_table.encounter_rows(index)
+        self.diagnostics.count("event_table_bytes", self.event_table.nbytes())
+        
+        self.build_results()
+    
+    def cache_version(self):
+        """解析缓存的版本标识：解析器版本、分段参数和技能表任一变化都会使缓存失效"""
+        abilities = json.dumps(self.paladin_abilities, ensure_ascii=False, sort_keys=True)
+        digest = hashlib.sha1(abilities.encode('utf-8')).hexdigest()[:12]
+        return f"{PARSER_VERSION}:{self.idle_gap}:{digest}"
+    
+    def detect_format(self, file_path):
+        """
+        根据文件开头的内容判断日志格式，结果保存在 self.log_format 和 self.combat_log_version，
+        两种格式都不像时 self.format_recognized 为 False（仍按文本日志解析）；
+        压缩文件按魔数识别压缩格式（保存在 self.compression），再判断解压后内容的格式
+
+        Returns:
+            LOG_FORMAT_TEXT 或 LOG_FORMAT_COMBAT_LOG
+        """
+        self.compression = detect_compression(file_path)
+        with open_decompressed(file_path, self.compression) as (f, _):
+            head = f.read(self.FORMAT_SNIFF_BYTES).decode('utf-8', errors='replace')
+        
+        is_log, version = is_combat_log(head)
+        self.log_format = LOG_FORMAT_COMBAT_LOG if is_log else LOG_FORMAT_TEXT
+        self.combat_log_version = version
+        self.format_recognized = is_log or is_text_log(head)
+        return self.log_format
+    
+    def get_actors(self, encounter_index=0):
+        """
+        返回指定战斗中出现过的所有施放者
+
+        Args:
+            encounter_index: 战斗序号（从0开始）
             
-            for ability, data in self.ability_data.items():
-                if data["casts"] > 0:
-                    ability_info = {
-                        "name": ability,
-                        "casts": data["casts"],
-                        "damage": data["damage"],
-                        "dps": data["damage"] / self.data["duration"] if self.data["duration"] > 0 else 0,
-                        "critRate": data["crits"] / data["hits"] if data["hits"] > 0 else 0
-                    }
-                    self.data["abilities"].append(ability_info)
-                    
-                    if self.paladin_abilities[ability]["is_damage"]:
-                        total_damage += data["damage"]
-                        total_hits += data["hits"]
-                        total_crits += data["crits"]
+        Returns:
+            施放者名称列表，按总伤害从高到低排序
+        """
+        if self.result_stream is not None:
+            return self.result_stream.players(encounter_index)
+        if encounter_index >= len(self.encounters):
+            return []
+        return self.encounters[encounter_index].get_actors()
+    
+    def get_player_report(self, player, encounter_index=0):
+        """
+        返回任意玩家在指定战斗中的分析结果，直接使用已聚合的数据，不会重新读取文件
+        （打开的是结果流时按索引只读取该玩家的一条结果）
+
+        Args:
+            player: 玩家名称
+            encounter_index: 战斗序号（从0开始）
             
-            # 计算总体数据
-            self.data["totalDamage"] = total_damage
-            self.data["dps"] = total_damage / self.data["duration"] if self.data["duration"] > 0 else 0
-            self.data["critRate"] = total_crits / total_hits if total_hits > 0 else 0
+        Returns:
+            分析结果字典
+        """
+        if self.result_stream is not None:
+            return self.result_stream.get(encounter_index, player)
+        return self.build_result(self.encounters[encounter_index], player)
+    
+    def get_time_index(self, encounter_index=0, bucket_seconds=1.0):
+        """
+        返回指定战斗的前缀和时间索引，首次调用时由事件表建立
+
+        Args:
+            encounter_index: 战斗序号（从0开始）
+            bucket_seconds: 时间桶的秒数，即窗口边界的精度
             
-            # 计算施法时间数据
-            # 这里简化处理，假设每次施法间隔超过3秒的视为空闲时间
-            casting_time = self.data["duration"] - 0  # 这里需要实际计算空闲时间
-            self.data["castingTime"] = {
-                "totalTime": self.data["duration"],
-                "castingTime": casting_time,
-                "idleTime": self.data["duration"] - casting_time,
-                "efficiency": casting_time / self.data["duration"] if self.data["duration"] > 0 else 0
-            }
+        Returns:
+            TimeIndex 对象；没有事件表（未启用 keep_events 或实时跟踪中）时返回 None
+        """
+        encounter = self.encounters[encounter_index]
+        if self.event_table is None or encounter.event_rows is None:
+            return None
+        
+        key = (encounter_index, bucket_seconds)
+        time_index = self.time_indexes.get(key)
+        if time_index is None:
+            start_time = encounter.start_time or 0
+            end_time = encounter.end_time if encounter.end_time is not None else start_time
+            time_index = self.time_indexes[key] = TimeIndex(
+                self.event_table, encounter.event_rows, start_time, end_time, bucket_seconds
+            )
+        return time_index
+    
+    def get_window_stats(self, start, end, player=None, ability=None, encounter_index=0, bucket_seconds=1.0):
+        """
+        统计战斗中 [start, end) 时间窗口内的伤害、施放次数和暴击率
+
+        Args:
+            start: 窗口开始时间，相对战斗开始的秒数
+            end: 窗口结束时间，相对战斗开始的秒数
+            player: 施放者名称，None 表示全部
+            ability: 技能名称，None 表示全部
+            encounter_index: 战斗序号（从0开始）
+            bucket_seconds: 窗口边界的精度（秒）
+            
+        Returns:
+            TimeIndex.window() 返回的字典；没有事件表时返回 None
+        """
+        time_index = self.get_time_index(encounter_index, bucket_seconds)
+        if time_index is None:
+            return None
+        return time_index.window(start, end, player, ability)
+    
+    def get_window_report(self, player, start, end, encounter_index=0, bucket_seconds=1.0):
+        """
+        返回玩家在战斗的 [start, end) 时间窗口内的分析结果，结构与 build_result() 相同
+
+        Returns:
+            分析结果字典；没有事件表时返回 None
+        """
+        if self.get_time_index(encounter_index, bucket_seconds) is None:
+            return None
+        return self.build_result(self.encounters[encounter_index], player, (start, end), bucket_seconds)
+    
+    def build_result(self, encounter, player=None, window=None, bucket_seconds=1.0, checklist=True):
+        """
+        根据单场战斗的聚合数据生成分析结果
+
+        Args:
+            encounter: Encounter 对象
+            player: 要分析的玩家，默认为 encounter.main_actor()
+            window: (开始, 结束) 相对战斗开始的秒数，只统计该时间窗口，需要事件表
+            bucket_seconds: window 边界的精度（秒）
+            checklist: 是否生成检查列表；为 False 时检查列表为空，由 evaluate_checklist() 在需要时生成
             
-            # 生成检查列表
+        Returns:
+            分析结果字典
+        """
+        if player is None:
+            player = encounter.main_actor()
+        
+        self.data = self.empty_result()
+        self.ability_data = self.empty_ability_data()
+        
+        self.start_time = encounter.start_time
+        self.end_time = encounter.end_time
+        self.last_cast_time = encounter.last_cast_time
+        
+        if window is not None:
+            time_index = self.get_time_index(self.encounters.index(encounter), bucket_seconds)
+            stats = time_index.window(window[0], window[1])
+            self.ability_data.update(time_index.ability_stats(window[0], window[1], player))
+            if self.start_time is not None:
+                self.end_time = self.start_time + stats["end"]
+                self.start_time += stats["start"]
+        elif self.event_table is not None and encounter.event_rows is not None:
+            self.ability_data.update(self.event_table.ability_stats(encounter.event_rows, player))
+        else:
+            self.ability_data.update(encounter.get_ability_data(player))
+        
+        self.data["player"] = player or "未知玩家"
+        self.data["boss"] = encounter.boss or "未知Boss"
+        
+        # 计算战斗时长（秒）
+        if self.start_time is not None and self.end_time is not None:
+            self.data["duration"] = float(self.end_time - self.start_time)
+        
+        # 处理技能数据
+        total_damage = 0
+        total_hits = 0
+        total_crits = 0
+        
+        for ability, data in self.ability_data.items():
+            if data["casts"] > 0 or data["hits"] > 0:
+                ability_info = {
+                    "name": ability,
+                    "casts": data["casts"],
+                    "damage": data["damage"],
+                    "dps": data["damage"] / self.data["duration"] if self.data["duration"] > 0 else 0,
+                    "critRate": data["crits"] / data["hits"] if data["hits"] > 0 else 0,
+                    "hits": data["hits"],
+                    "crits": data["crits"]
+                }
+                self.data["abilities"].append(ability_info)
+                
+                if self.paladin_abilities[ability]["is_damage"]:
+                    total_damage += data["damage"]
+                    total_hits += data["hits"]
+                    total_crits += data["crits"]
+        
+        # 计算总体数据
+        self.data["totalDamage"] = total_damage
+        self.data["dps"] = total_damage / self.data["duration"] if self.data["duration"] > 0 else 0
+        self.data["critRate"] = total_crits / total_hits if total_hits > 0 else 0
+        
+        # 计算施法时间数据
+        # 这里简化处理，假设每次施法间隔超过3秒的视为空闲时间
+        casting_time = self.data["duration"] - 0  # 这里需要实际计算空闲时间
+        self.data["castingTime"] = {
+            "totalTime": self.data["duration"],
+            "castingTime": casting_time,
+            "idleTime": self.data["duration"] - casting_time,
+            "efficiency": casting_time / self.data["duration"] if self.data["duration"] > 0 else 0
+        }
+        
+        # 生成检查列表
+        if checklist:
             self.generate_checklist()
+        
+        return self.data
+    
+    def parse_parallel(self, file_path, workers, builder=None):
+        """
+        在进程池中并行解析文件的各个分段，并按顺序合并为完整的战斗列表
+
+        Args:
+            file_path: 日志文件路径
+            workers: 进程数
+            builder: EventTableBuilder，不为 None 时各分块的事件按顺序追加到其中
             
-            return self.data
+        Returns:
+            Encounter 列表
+        """
+        ranges = split_file_ranges(file_path, workers)
+        total_bytes = ranges[-1][1]
+        chunks = [None] * len(ranges)
+        
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                executor.submit(parse_chunk, file_path, start, end, self.idle_gap, builder is not None,
+                                self.log_format, self.combat_log_version): index
+                for index, (start, end) in enumerate(ranges)
+            }
+            bytes_done = 0
+            for future in as_completed(futures):
+                index = futures[future]
+                chunks[index] = future.result()
+                start, end = ranges[index]
+                bytes_done += end - start
+                self.report_progress(bytes_done, total_bytes, None)
+        finally:
+            # 取消或出错时不再等待尚未开始的分块
+            executor.shutdown(wait=True, cancel_futures=True)
+        
+        segmenter = EncounterSegmenter(self.idle_gap)
+        offset = 0
+        last_seconds = None
+        for chunk in chunks:
+            # 分块之间跨越午夜时，后续分块整体加上一天
+            if (chunk["first_seconds"] is not None and last_seconds is not None
+                    and chunk["first_seconds"] < last_seconds - TimestampDecoder.ROLLOVER_THRESHOLD):
+                offset += SECONDS_PER_DAY
             
-        except Exception as e:
-            print(f"解析文本文件时出错: {str(e)}")
-            return self.get_mock_data()
+            segmenter.feed_chunk(chunk, offset)
+            if builder is not None:
+                builder.extend(chunk["events"], offset)
+            
+            offset += chunk["day_offset"]
+            if chunk["last_seconds"] is not None:
+                last_seconds = chunk["last_seconds"]
+        
+        return segmenter.finish()
     
-    def generate_checklist(self):
-        """生成性能检查列表"""
-        # 审判使用检查
-        judgment_casts = self.ability_data["审判"]["casts"]
-        judgment_expected = self.data["duration"] / 10  # 假设审判应该每10秒使用一次
-        judgment_status = judgment_casts >= judgment_expected * 0.8
-        
-        self.data["checklist"].append({
-            "name": "审判使用",
-            "status": judgment_status,
-            "description": "审判保持良好的上线时间" if judgment_status else "审判使用频率过低，应该更频繁地使用"
-        })
+    def iter_lines(self, file_path, start=0, end=None, workers=1):
+        """
+        逐行读取日志文件（生成器）
+
+        直接迭代文件对象而不是调用 readlines()，内存占用与文件大小无关。
+        压缩文件（按 self.compression）边读取边解压，进度按已读取的压缩数据估计；
+        BGZF 文件用 workers 个线程并行解压。
+        指定 start/end 时只读取该字节范围内的行（范围边界需对齐到行首，仅适用于未压缩的文件）。
+        不是有效 UTF-8 的字节替换为 U+FFFD，整个文件读取和按字节范围读取的结果相同。
+        """
+        if start == 0 and end is None:
+            with open_decompressed(file_path, self.compression, workers) as (stream, raw):
+                f = io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
+                if self.progress_callback is None and self.cancel_event is None:
+                    for line in f:
+                        yield line
+                    return
+                
+                total_bytes = os.fstat(raw.fileno()).st_size
+                interval = self.PROGRESS_INTERVAL
+                for line_no, line in enumerate(f, 1):
+                    if line_no % interval == 0:
+                        self.report_progress(raw.tell(), total_bytes, line_no)
+                    yield line
+                self.report_progress(total_bytes, total_bytes, None)
+            return
         
-        # 十字军打击使用检查
-        crusader_casts = self.ability_data["十字军打击"]["casts"]
-        crusader_expected = self.data["duration"] / 6  # 假设十字军打击应该每6秒使用一次
-        crusader_status = crusader_casts >= crusader_expected * 0.8
+        # 按块读取并整体解码，范围边界对齐到行首，块内剩余的半行留到下一块
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            remaining = (end - start) if end is not None else None
+            pending = b""
+            while remaining is None or remaining > 0:
+                size = self.READ_BLOCK_SIZE if remaining is None else min(self.READ_BLOCK_SIZE, remaining)
+                block = f.read(size)
+                if not block:
+                    break
+                if remaining is not None:
+                    remaining -= len(block)
+                
+                block = pending + block
+                cut = block.rfind(b"\n") + 1
+                pending = block[cut:]
+                lines = block[:cut].decode('utf-8', errors='replace').split("\n")
+                lines.pop()
+                yield from lines
+            
+            if pending:
+                yield pending.decode('utf-8', errors='replace')
+    
+    def report_progress(self, bytes_read, total_bytes, lines_read):
+        """回报解析进度，并在取消标志被设置时中止解析"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ParseCancelled()
+        if self.progress_callback is not None:
+            self.progress_callback(bytes_read, total_bytes, lines_read)
+    
+    def iter_events(self, lines):
+        """
+        按 self.log_format 将日志行转换为事件
+
+        Returns:
+            事件生成器，事件格式见 iter_text_events() 和 CombatLogReader.iter_events()
+        """
+        if self.log_format == LOG_FORMAT_COMBAT_LOG:
+            reader = CombatLogReader(
+                self.timestamp_decoder, self.ability_lookup, self.spell_lookup,
+                self.paladin_abilities, version=self.combat_log_version
+            )
+            return reader.iter_events(lines)
+        return self.iter_text_events(lines)
+    
+    def iter_text_events(self, lines):
+        """
+        将文本日志行转换为事件（生成器）
+
+        每行只做一次预编译正则匹配，技能通过 self.ability_lookup 哈希查找。
+        战斗开始/结束标记以及玩家、目标信息在同一遍扫描中识别。
+
+        Yields:
+            ("start", 时间) / ("end", 时间) /
+            ("player", 名称, 时间) / ("boss", 名称, 时间) /
+            ("line", 时间, 施放者, 技能名, 目标, 伤害, 是否暴击)
+            其中施放者、技能名、目标、伤害在未匹配时为 None
+        """
+        match_event = EVENT_PATTERN.match
+        decode_time = self.timestamp_decoder.decode
+        ability_lookup = self.ability_lookup
+        abilities = self.paladin_abilities
+        last_time_str = None
+        current_time = None
         
-        self.data["checklist"].append({
-            "name": "十字军打击使用",
-            "status": crusader_status,
-            "description": "十字军打击在冷却结束后立即使用" if crusader_status else "十字军打击使用频率过低，应该在冷却结束后立即使用"
-        })
+        for line in lines:
+            match = match_event(line)
+            if match:
+                time_str, actor, name, target, amount, crit = match.groups()
+                # 同一秒内的连续事件直接复用上一次的解码结果
+                if time_str != last_time_str:
+                    current_time = decode_time(time_str)
+                    last_time_str = time_str
+                line_time = current_time
+            else:
+                actor = None
+                line_time = None
+            
+            # 非技能行才可能是战斗标记或玩家/目标信息
+            if actor is None:
+                is_marker = False
+                if line_time is not None and "战斗" in line:
+                    if "战斗结束" in line:
+                        yield ("end", line_time)
+                        is_marker = True
+                    elif "战斗开始" in line or "进入战斗" in line:
+                        yield ("start", line_time)
+                        is_marker = True
+                
+                if "玩家" in line:
+                    player_match = PLAYER_PATTERN.search(line)
+                    if player_match:
+                        yield ("player", player_match.group(1), line_time)
+                
+                if "目标" in line:
+                    boss_match = TARGET_PATTERN.search(line)
+                    if boss_match:
+                        yield ("boss", boss_match.group(1), line_time)
+                
+                if line_time is not None and not is_marker:
+                    yield ("line", line_time, None, None, None, None, False)
+                continue
+            
+            ability = ability_lookup.get(name)
+            damage = None
+            if ability is not None and amount is not None and abilities[ability]["is_damage"]:
+                damage = int(amount)
+            
+            yield ("line", current_time, actor, ability, target, damage, crit is not None)
+    
+    def evaluate_checklist(self, result):
+        """
+        为分析结果生成性能检查列表，已生成的直接返回
+        输出循环模型只为要显示或输出的结果模拟，解析时不为每场战斗的每个玩家模拟；
+        模拟参数相同的结果由 RotationModel 缓存。
         
-        # 奉献使用检查
-        consecration_casts = self.ability_data["奉献"]["casts"]
-        consecration_expected = self.data["duration"] / 8  # 假设奉献应该每8秒使用一次
-        consecration_status = consecration_casts >= consecration_expected * 0.7
+        Args:
+            result: build_result() 返回的分析结果，检查列表和模型结果写入其中
+            
+        Returns:
+            result
+        """
+        if result.get("checklist"):
+            return result
+        with self.diagnostics.stage("checklist"):
+            result["checklist"] = self.checklist_items(result)
+        return result
+    
+    def generate_checklist(self):
+        """为最近一次 build_result() 的结果（self.data）生成性能检查列表"""
+        self.evaluate_checklist(self.data)
+    
+    def checklist_items(self, result):
+        """
+        生成性能检查列表
+        各技能的施放次数与输出循环模型的模拟结果比较，低于模拟的第10百分位时需要改进；
+        模型同时给出该战斗时长下的 DPS 分布，结果保存在 result["rotationModel"] 中。
+        没有施放过循环中任何技能的施放者（如其他职业的近战）不适用惩戒骑士的输出循环，不做评估。
         
-        self.data["checklist"].append({
-            "name": "奉献使用",
-            "status": consecration_status,
-            "description": "奉献使用得当" if consecration_status else "奉献使用频率过低，应该更频繁地使用"
-        })
+        Returns:
+            检查项列表，不适用的检查项 status 为 None
+        """
+        ability_data = {ability["name"]: ability for ability in result["abilities"]}
+        if not any((ability_data.get(ability) or {}).get("casts", 0) for ability, _, _ in ROTATION):
+            result["rotationModel"] = None
+            return [{
+                "name": "输出循环",
+                "status": None,
+                "description": "不适用：没有施放审判、神圣风暴、十字军打击或奉献，不按惩戒骑士的输出循环评估"
+            }]
         
-        # 神圣风暴使用检查
-        divine_storm_casts = self.ability_data["神圣风暴"]["casts"]
-        divine_storm_expected = self.data["duration"] / 10  # 假设神圣风暴应该每10秒使用一次
-        divine_storm_status = divine_storm_casts >= divine_storm_expected * 0.7
+        model = self.rotation_model.evaluate(result["duration"], ability_data, result["dps"])
+        result["rotationModel"] = model
+        checklist = []
         
-        self.data["checklist"].append({
-            "name": "神圣风暴使用",
-            "status": divine_storm_status,
-            "description": "神圣风暴使用得当" if divine_storm_status else "神圣风暴使用频率过低，应该更频繁地使用"
-        })
+        checks = [
+            ("审判", "审判使用", "审判保持良好的上线时间", "审判使用频率过低，应该更频繁地使用"),
+            ("十字军打击", "十字军打击使用", "十字军打击在冷却结束后立即使用", "十字军打击使用频率过低，应该在冷却结束后立即使用"),
+            ("奉献", "奉献使用", "奉献使用得当", "奉献使用频率过低，应该更频繁地使用"),
+            ("神圣风暴", "神圣风暴使用", "神圣风暴使用得当", "神圣风暴使用频率过低，应该更频繁地使用")
+        ]
+        for ability, name, passed, failed in checks:
+            casts = (ability_data.get(ability) or {}).get("casts", 0)
+            if model is None:
+                status = True
+                description = passed
+            else:
+                status = casts >= model["minCasts"][ability]
+                description = (
+                    f"{passed if status else failed}"
+                    f"（{casts} 次，模型期望 {model['expectedCasts'][ability]:.1f} 次）"
+                )
+            
+            checklist.append({
+                "name": name,
+                "status": status,
+                "description": description
+            })
+        
+        # 与模拟的 DPS 分布比较（需要 NumPy）
+        if model is not None and model["percentile"] is not None:
+            dps = model["dps"]
+            dps_status = result["dps"] >= dps["p10"]
+            if model["percentile"] <= 0:
+                standing = "低于全部模拟"
+            elif model["percentile"] >= 1:
+                standing = "高于全部模拟"
+            else:
+                # 四舍五入后不显示为 0% 或 100%
+                standing = f"超过 {min(max(round(model['percentile'] * 100), 1), 99)}% 的模拟"
+            
+            checklist.append({
+                "name": "输出循环",
+                "status": dps_status,
+                "description": (
+                    f"DPS {result['dps']:.0f}，模拟循环的 P10/P50/P90 为 "
+                    f"{dps['p10']:.0f}/{dps['p50']:.0f}/{dps['p90']:.0f}，{standing}"
+                )
+            })
         
         # 整体施法效率检查
-        efficiency = self.data["castingTime"]["efficiency"]
+        efficiency = result["castingTime"]["efficiency"]
         efficiency_status = efficiency >= 0.85
         
-        self.data["checklist"].append({
+        checklist.append({
             "name": "整体施法效率",
             "status": efficiency_status,
             "description": "施法效率良好，空闲时间较少" if efficiency_status else "施法效率较低，存在较多空闲时间"
         })
+        return checklist
     
     def get_mock_data(self):
         """生成模拟数据用于测试"""
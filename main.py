@@ -1,15 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import json
 import os
 import re
-import urllib.request
-import urllib.parse
+import queue
+import threading
+import contextlib
 from datetime import datetime
-from log_parser import LogParser
 import time
 
+# 解析器（numpy）、网络客户端、缓存数据库和 JSON 等较重的模块在第一次用到时才导入，
+# 启动时只加载 tkinter，窗口可以尽快显示；启动用时由 benchmark.py --startup 检查
+
 class RetributionPaladinAnalyzer:
+    # 实时跟踪模式的刷新间隔（毫秒）
+    LIVE_INTERVAL = 2000
+    # 实时跟踪模式每次在后台线程中最多解析的字节数，积压较多时分多次快速追赶
+    LIVE_BYTES_PER_TICK = 2 * 1024 * 1024
+    # 事件明细筛选条件中表示不筛选的选项
+    ALL_FILTER = "全部"
+    
     def __init__(self, root):
         self.root = root
         self.root.title("怀旧服惩戒骑士分析工具")
@@ -25,9 +34,39 @@ class RetributionPaladinAnalyzer:
         # 当前选择的文件
         self.current_file = None
         self.analysis_data = None
-        
-        # 创建日志解析器
-        self.log_parser = LogParser()
+        # 当前显示的结果来自本地日志（"local"）还是 WarcraftLogs（"warcraftlogs"）
+        self.analysis_source = None
+        
+        # 日志解析器在第一次分析本地日志时创建（见 get_log_parser）
+        self.log_parser = None
+        
+        # 后台任务：解析和网络请求都在工作线程中执行，结果通过队列交回主线程
+        self.task_queue = queue.Queue()
+        self.task_thread = None
+        self.task_done_callback = None
+        self.task_started = None
+        self.cancel_event = None
+        # 当前任务是否为不显示进度的后台刷新（实时跟踪）
+        self.task_quiet = False
+        self.task_poll_job = None
+        
+        # 实时跟踪模式
+        self.live_tailer = None
+        self.live_job = None
+        self.live_lines_shown = 0
+        
+        # WarcraftLogs 客户端和获取到的报告（未配置 API 凭据时客户端为 None，使用模拟数据）
+        # API 响应缓存在本地，重复查看同一份报告时不再请求 API（第一次获取报告时打开）
+        self.wl_cache = None
+        self.wl_cache_opened = False
+        
+        # 历史数据仓库：每次分析后记录各场战斗的聚合数据，用于"历史趋势"选项卡（第一次用到时打开）
+        self.warehouse = None
+        self.warehouse_opened = False
+        self.wl_client = None
+        self.wl_report = None
+        self.wl_fights = []
+        self.wl_players = []
         
         # 创建主框架
         self.main_frame = ttk.Frame(self.root, padding="10")
@@ -75,6 +114,18 @@ class RetributionPaladinAnalyzer:
         self.checklist_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.checklist_frame, text="性能检查列表")
         
+        # 创建事件明细选项卡
+        self.events_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.events_frame, text="事件明细")
+        
+        # 创建历史趋势选项卡
+        self.trends_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.trends_frame, text="历史趋势")
+        
+        # 创建诊断选项卡
+        self.diagnostics_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.diagnostics_frame, text="诊断")
+        
         # 创建底部按钮框架
         self.bottom_frame = ttk.Frame(self.main_frame)
         self.bottom_frame.pack(fill=tk.X, pady=10)
@@ -82,11 +133,108 @@ class RetributionPaladinAnalyzer:
         self.save_button = ttk.Button(self.bottom_frame, text="保存分析结果", command=self.save_analysis)
         self.save_button.pack(side=tk.RIGHT, padx=5)
         
-        # 初始化各选项卡
-        self.init_dashboard()
-        self.init_abilities_analysis()
-        self.init_casting_time_analysis()
-        self.init_checklist()
+        # 后台任务进度
+        self.progress_var = tk.DoubleVar()
+        self.progress_bar = ttk.Progressbar(self.bottom_frame, variable=self.progress_var, maximum=100, length=200)
+        self.progress_bar.pack(side=tk.LEFT, padx=5)
+        
+        self.cancel_button = ttk.Button(self.bottom_frame, text="取消", command=self.cancel_task, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        
+        self.status_label = ttk.Label(self.bottom_frame, text="")
+        self.status_label.pack(side=tk.LEFT, padx=5)
+        
+        # 各结果选项卡在第一次显示时才创建控件：选项卡 -> (创建函数, 刷新函数, 诊断中的阶段名)
+        # 按显示顺序排列，诊断选项卡在最后，刷新时可以包含其他选项卡的刷新用时
+        self.tab_views = {
+            str(self.dashboard_frame): (self.init_dashboard, self.update_dashboard, "render_dashboard"),
+            str(self.abilities_frame): (self.init_abilities_analysis, self.update_abilities_analysis, "render_abilities"),
+            str(self.casting_frame): (self.init_casting_time_analysis, self.update_casting_time_analysis, "render_casting_time"),
+            str(self.checklist_frame): (self.init_checklist, self.update_checklist, "render_checklist"),
+            str(self.events_frame): (self.init_event_view, self.update_event_view, "render_events"),
+            str(self.trends_frame): (self.init_trends, self.update_trends, "render_trends"),
+            str(self.diagnostics_frame): (self.init_diagnostics, self.update_diagnostics, None)
+        }
+        self.built_tabs = set()
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.show_tab(self.notebook.select())
+    
+    def get_log_parser(self):
+        """
+        返回日志解析器，第一次调用时导入解析模块并创建
+        解析结果缓存在本地，再次打开同一文件时无需重新解析
+        """
+        if self.log_parser is None:
+            from log_parser import LogParser
+            from parse_cache import ParseCache
+            from event_store import HAS_NUMPY
+            try:
+                parse_cache = ParseCache()
+            except Exception as e:
+                print(f"无法打开解析缓存: {str(e)}")
+                parse_cache = None
+            # 安装了 numpy 时保留逐条事件，用于按时间范围统计；诊断信息显示在"诊断"选项卡中
+            self.log_parser = LogParser(cache=parse_cache, keep_events=HAS_NUMPY, diagnostics=True)
+        return self.log_parser
+    
+    def get_wl_cache(self):
+        """返回 WarcraftLogs 响应缓存，第一次调用时打开；无法打开时返回 None"""
+        if not self.wl_cache_opened:
+            self.wl_cache_opened = True
+            from response_cache import ResponseCache
+            try:
+                self.wl_cache = ResponseCache()
+            except Exception as e:
+                print(f"无法打开响应缓存: {str(e)}")
+                self.wl_cache = None
+        return self.wl_cache
+    
+    def get_warehouse(self):
+        """返回历史数据仓库，第一次调用时打开；无法打开时返回 None"""
+        if not self.warehouse_opened:
+            self.warehouse_opened = True
+            from warehouse import FightWarehouse
+            try:
+                self.warehouse = FightWarehouse()
+            except Exception as e:
+                print(f"无法打开历史数据仓库: {str(e)}")
+                self.warehouse = None
+        return self.warehouse
+    
+    def record_history(self, records, report):
+        """
+        将战斗记录写入历史数据仓库（在工作线程中执行）
+        写入失败不影响本次分析的结果，只在日志中提示
+        """
+        warehouse = self.warehouse
+        if warehouse is None or not records:
+            return
+        try:
+            count = warehouse.store(records)
+            report("log", f"已将 {count} 场战斗记录到历史数据")
+        except Exception as e:
+            report("log", f"无法记录历史数据: {str(e)}")
+    
+    def on_tab_changed(self, event=None):
+        self.show_tab(self.notebook.select())
+    
+    def show_tab(self, name):
+        """显示结果选项卡：第一次显示时创建控件，并填入当前的分析结果"""
+        view = self.tab_views.get(name)
+        if view is None:
+            return
+        init, update, stage = view
+        if name not in self.built_tabs:
+            self.built_tabs.add(name)
+            init()
+            with self.view_stage(stage):
+                update()
+    
+    def view_stage(self, name):
+        """界面刷新的计时器（尚未创建解析器或不计时时为空操作）"""
+        if name is None or self.log_parser is None:
+            return contextlib.nullcontext()
+        return self.log_parser.diagnostics.stage(name)
     
     def setup_local_tab(self):
         """设置本地文件选项卡内容"""
@@ -107,8 +255,54 @@ class RetributionPaladinAnalyzer:
         self.analyze_button = ttk.Button(self.file_frame, text="分析", command=self.analyze_file)
         self.analyze_button.pack(side=tk.LEFT, padx=5)
         
+        self.live_button = ttk.Button(self.file_frame, text="实时跟踪", command=self.toggle_live)
+        self.live_button.pack(side=tk.LEFT, padx=5)
+        
+        # 创建战斗选择框架（一个日志文件中可能包含多场战斗）
+        self.encounter_frame = ttk.Frame(self.local_tab)
+        self.encounter_frame.pack(fill=tk.X, pady=5)
+        
+        self.encounter_label = ttk.Label(self.encounter_frame, text="选择战斗:")
+        self.encounter_label.pack(side=tk.LEFT, padx=5)
+        
+        self.encounter_var = tk.StringVar()
+        self.encounter_combo = ttk.Combobox(self.encounter_frame, textvariable=self.encounter_var, state="readonly", width=40)
+        self.encounter_combo.pack(side=tk.LEFT, padx=5)
+        self.encounter_combo.bind("<<ComboboxSelected>>", self.select_encounter)
+        
+        self.local_player_label = ttk.Label(self.encounter_frame, text="选择玩家:")
+        self.local_player_label.pack(side=tk.LEFT, padx=5)
+        
+        self.local_player_var = tk.StringVar()
+        self.local_player_combo = ttk.Combobox(self.encounter_frame, textvariable=self.local_player_var, state="readonly", width=20)
+        self.local_player_combo.pack(side=tk.LEFT, padx=5)
+        self.local_player_combo.bind("<<ComboboxSelected>>", self.select_local_player)
+        
+        # 创建时间范围框架（如斩杀阶段、前30秒），相对战斗开始的秒数
+        self.range_frame = ttk.Frame(self.local_tab)
+        self.range_frame.pack(fill=tk.X, pady=5)
+        
+        self.range_label = ttk.Label(self.range_frame, text="时间范围(秒):")
+        self.range_label.pack(side=tk.LEFT, padx=5)
+        
+        self.range_start_var = tk.StringVar()
+        self.range_start_entry = ttk.Entry(self.range_frame, textvariable=self.range_start_var, width=8)
+        self.range_start_entry.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(self.range_frame, text="至").pack(side=tk.LEFT)
+        
+        self.range_end_var = tk.StringVar()
+        self.range_end_entry = ttk.Entry(self.range_frame, textvariable=self.range_end_var, width=8)
+        self.range_end_entry.pack(side=tk.LEFT, padx=5)
+        
+        self.range_apply_button = ttk.Button(self.range_frame, text="应用", command=self.apply_time_range)
+        self.range_apply_button.pack(side=tk.LEFT, padx=5)
+        
+        self.range_clear_button = ttk.Button(self.range_frame, text="整场战斗", command=self.clear_time_range)
+        self.range_clear_button.pack(side=tk.LEFT, padx=5)
+        
         # 创建说明文本
-        self.local_info = ttk.Label(self.local_tab, text="选择本地战斗日志文件进行分析。支持.txt和.json格式。")
+        self.local_info = ttk.Label(self.local_tab, text="选择本地战斗日志文件进行分析。支持.txt（包括客户端的 WoWCombatLog.txt）、.json和.jsonl格式，以及 gzip/bzip2/xz/zip 压缩的日志。")
         self.local_info.pack(pady=5)
     
     def setup_warcraftlogs_tab(self):
@@ -163,31 +357,408 @@ class RetributionPaladinAnalyzer:
     def browse_file(self):
         file_path = filedialog.askopenfilename(
             title="选择战斗日志文件",
-            filetypes=[("文本文件", "*.txt"), ("JSON文件", "*.json"), ("所有文件", "*.*")]
+            filetypes=[("文本文件", "*.txt"), ("压缩的日志", "*.gz *.bgz *.bz2 *.xz *.zip"),
+                       ("分析结果", "*.json *.jsonl"), ("所有文件", "*.*")]
         )
         if file_path:
             self.file_path_var.set(file_path)
             self.current_file = file_path
     
+    def start_task(self, target, on_done, quiet=False):
+        """
+        在后台线程中执行耗时任务，避免阻塞界面
+        
+        Args:
+            target: 任务函数，参数为 (report, cancel_event)。
+                    report(kind, payload) 将进度("progress")或日志("log")发回主线程
+            on_done: 任务成功完成后在主线程中调用，参数为任务的返回值
+            quiet: 不显示进度和状态的后台刷新（如实时跟踪）；已有任务时直接返回 False，
+                   之后启动的普通任务会先取消并等待它结束
+            
+        Returns:
+            任务是否已启动
+        """
+        # 上一个任务仍在进行，或其结果尚未在主线程中处理
+        if self.task_done_callback is not None:
+            if quiet:
+                return False
+            if not self.task_quiet:
+                messagebox.showwarning("警告", "已有任务正在进行，请等待完成或点击取消")
+                return False
+            # 后台刷新每次只处理少量数据，取消后很快结束；结果不再使用
+            self.cancel_event.set()
+            self.task_thread.join()
+            self.drain_task_queue()
+            if self.live_tailer is not None and self.live_job is None:
+                self.live_job = self.root.after(self.LIVE_INTERVAL, self.live_poll)
+        
+        self.cancel_event = threading.Event()
+        self.task_done_callback = on_done
+        self.task_started = time.time()
+        self.task_quiet = quiet
+        cancel_event = self.cancel_event
+        
+        def report(kind, payload):
+            self.task_queue.put((kind, payload))
+        
+        def run():
+            try:
+                result = target(report, cancel_event)
+                self.task_queue.put(("done", result))
+            except Exception as e:
+                self.task_queue.put(("error", e))
+        
+        if not quiet:
+            self.progress_var.set(0)
+            self.status_label.config(text="正在处理...")
+            self.cancel_button.config(state=tk.NORMAL)
+        self.analyze_button.config(state=tk.DISABLED)
+        self.fetch_button.config(state=tk.DISABLED)
+        # 解析过程中解析器的结果尚不完整，暂时禁止切换战斗和玩家
+        self.encounter_combo.config(state=tk.DISABLED)
+        self.local_player_combo.config(state=tk.DISABLED)
+        self.range_apply_button.config(state=tk.DISABLED)
+        self.range_clear_button.config(state=tk.DISABLED)
+        
+        self.task_thread = threading.Thread(target=run, daemon=True)
+        self.task_thread.start()
+        # 被取代的后台刷新的轮询继续为新任务服务
+        if self.task_poll_job is None:
+            self.task_poll_job = self.root.after(100, self.poll_task_queue)
+        return True
+    
+    def drain_task_queue(self):
+        """丢弃已取消的任务发回的消息"""
+        while True:
+            try:
+                self.task_queue.get_nowait()
+            except queue.Empty:
+                return
+    
+    def poll_task_queue(self):
+        """由 root.after 定时调用，在主线程中处理后台任务发回的消息"""
+        self.task_poll_job = None
+        latest_progress = None
+        while True:
+            try:
+                kind, payload = self.task_queue.get_nowait()
+            except queue.Empty:
+                break
+            
+            if kind == "progress":
+                # 只显示最新的进度
+                latest_progress = payload
+            elif kind == "log":
+                self.log_message(payload)
+            else:
+                self.finish_task(kind, payload)
+                return
+        
+        if latest_progress is not None and not self.task_quiet:
+            self.show_progress(*latest_progress)
+        self.task_poll_job = self.root.after(100, self.poll_task_queue)
+    
+    def show_progress(self, bytes_read, total_bytes, lines_read):
+        """显示已读字节数、处理速度和预计剩余时间"""
+        elapsed = max(time.time() - self.task_started, 1e-6)
+        if total_bytes:
+            self.progress_var.set(bytes_read * 100 / total_bytes)
+        
+        text = f"已读取 {bytes_read / 1048576:.1f}/{total_bytes / 1048576:.1f} MB"
+        if lines_read:
+            text += f"，{lines_read / elapsed:,.0f} 行/秒"
+        if 0 < bytes_read < total_bytes:
+            eta = (total_bytes - bytes_read) / (bytes_read / elapsed)
+            text += f"，预计剩余 {eta:.0f} 秒"
+        self.status_label.config(text=text)
+    
+    def finish_task(self, kind, payload):
+        """后台任务结束后恢复界面状态，并在主线程中处理结果"""
+        cancelled = self.cancel_event is not None and self.cancel_event.is_set()
+        on_done = self.task_done_callback
+        self.task_done_callback = None
+        
+        self.cancel_button.config(state=tk.DISABLED)
+        self.analyze_button.config(state=tk.NORMAL)
+        self.fetch_button.config(state=tk.NORMAL)
+        self.encounter_combo.config(state="readonly")
+        self.local_player_combo.config(state="readonly")
+        self.range_apply_button.config(state=tk.NORMAL)
+        self.range_clear_button.config(state=tk.NORMAL)
+        
+        if self.task_quiet:
+            # 后台刷新不改变进度和状态，出错时由任务自身返回错误信息
+            if not cancelled and kind != "error":
+                on_done(payload)
+        elif cancelled:
+            self.progress_var.set(0)
+            self.status_label.config(text="已取消")
+        elif kind == "error":
+            self.status_label.config(text="出错")
+            messagebox.showerror("错误", f"处理时出错: {str(payload)}")
+        else:
+            self.progress_var.set(100)
+            self.status_label.config(text=f"完成，用时 {time.time() - self.task_started:.1f} 秒")
+            on_done(payload)
+    
+    def cancel_task(self):
+        """取消正在进行的后台任务"""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.status_label.config(text="正在取消...")
+    
     def analyze_file(self):
         if not self.current_file:
             messagebox.showwarning("警告", "请先选择一个文件")
             return
         
+        # 完整分析会重置解析器，先停止实时跟踪
+        self.stop_live()
+        
+        from warehouse import file_fight_records
+        file_path = self.current_file
+        log_parser = self.get_log_parser()
+        self.get_warehouse()
+        
+        def task(report, cancel_event):
+            # 使用日志解析器解析文件（大文件自动使用多进程并行解析）
+            data = log_parser.parse_file(
+                file_path,
+                workers=os.cpu_count() or 1,
+                progress_callback=lambda *progress: report("progress", progress),
+                cancel_event=cancel_event
+            )
+            self.record_history(file_fight_records(log_parser, file_path), report)
+            return data
+        
+        self.start_task(task, self.show_file_results)
+    
+    def show_file_results(self, data):
+        """解析完成后在主线程中更新各选项卡"""
         try:
-            # 使用日志解析器解析文件
-            self.analysis_data = self.log_parser.parse_file(self.current_file)
+            self.analysis_data = data
+            self.analysis_source = "local"
+            self.range_start_var.set("")
+            self.range_end_var.set("")
+            
+            # 列出日志中的所有战斗（结果流只读取索引中的摘要）
+            results = self.log_parser.results or [self.analysis_data]
+            if self.log_parser.result_stream is not None:
+                results = self.log_parser.result_stream.summaries()
+            encounters = self.update_encounter_list(results, 0)
+            self.update_local_players()
             
             # 更新各选项卡的数据
-            self.update_dashboard()
-            self.update_abilities_analysis()
-            self.update_casting_time_analysis()
-            self.update_checklist()
+            self.refresh_views()
             
-            messagebox.showinfo("成功", "分析完成")
+            messagebox.showinfo("成功", f"分析完成，共 {len(encounters)} 场战斗")
         except Exception as e:
             messagebox.showerror("错误", f"分析文件时出错: {str(e)}")
     
+    def update_encounter_list(self, results, index):
+        """
+        填充战斗下拉菜单并选中指定的战斗
+        
+        Returns:
+            下拉菜单中的战斗描述列表
+        """
+        encounters = []
+        for i, result in enumerate(results):
+            minutes, seconds = divmod(int(result["duration"]), 60)
+            encounters.append(f"{i + 1}: {result['boss']} - {minutes}:{seconds:02d}")
+        self.encounter_combo['values'] = encounters
+        if encounters:
+            self.encounter_combo.current(index)
+        return encounters
+    
+    def toggle_live(self):
+        """开始或停止实时跟踪当前选择的日志文件"""
+        if self.live_tailer is not None:
+            self.stop_live()
+            return
+        
+        if not self.current_file:
+            messagebox.showwarning("警告", "请先选择一个文件")
+            return
+        
+        from log_parser import LogTailer
+        self.live_tailer = LogTailer(self.get_log_parser(), self.current_file)
+        self.live_lines_shown = 0
+        self.live_button.config(text="停止跟踪")
+        self.status_label.config(text="实时跟踪中...")
+        self.live_poll()
+    
+    def stop_live(self):
+        """停止实时跟踪"""
+        if self.live_job is not None:
+            self.root.after_cancel(self.live_job)
+            self.live_job = None
+        if self.task_quiet and self.cancel_event is not None:
+            # 正在进行的后台刷新的结果不再使用
+            self.cancel_event.set()
+        if self.live_tailer is not None:
+            self.live_tailer = None
+            self.live_button.config(text="实时跟踪")
+            self.status_label.config(text="已停止实时跟踪")
+    
+    def live_poll(self):
+        """由 root.after 定时调用：在后台线程中只解析新增的行，完成后在主线程中刷新各选项卡"""
+        self.live_job = None
+        tailer = self.live_tailer
+        if tailer is None:
+            return
+        
+        # 当前选中的战斗和玩家在主线程中读取，交给后台任务
+        old_count = len(self.encounter_combo['values'])
+        index = self.encounter_combo.current()
+        player = self.local_player_var.get()
+        lines_shown = self.live_lines_shown
+        
+        def task(report, cancel_event):
+            try:
+                has_more = tailer.poll(self.LIVE_BYTES_PER_TICK, cancel_event)
+                snapshot = {"tailer": tailer, "has_more": has_more}
+                if tailer.lines_read != lines_shown and not has_more:
+                    snapshot.update(self.build_live_snapshot(tailer, old_count, index, player))
+                return snapshot
+            except Exception as e:
+                return {"tailer": tailer, "error": e}
+        
+        # 解析器正被其他后台任务使用时跳过本次刷新
+        if not self.start_task(task, self.apply_live_snapshot, quiet=True):
+            self.live_job = self.root.after(self.LIVE_INTERVAL, self.live_poll)
+    
+    def build_live_snapshot(self, tailer, old_count, index, player):
+        """
+        实时跟踪时生成各场战斗的结果和要显示的结果（在工作线程中执行，不访问界面控件）
+        
+        Args:
+            old_count: 刷新前战斗下拉菜单中的战斗数
+            index: 刷新前选中的战斗，-1 表示未选择
+            player: 刷新前选中的玩家，空字符串表示默认玩家
+            
+        Returns:
+            {"lines_read", "results", "index", "data"}；还没有战斗时 results 为空列表
+        """
+        parser = tailer.parser
+        results = tailer.results()
+        snapshot = {"lines_read": tailer.lines_read, "results": results, "index": index, "data": None}
+        if not results:
+            return snapshot
+        
+        # 原来选中的是最后一场战斗（或未选择）时跟随最新的战斗
+        if index < 0 or index >= old_count - 1 or index >= len(results):
+            index = len(results) - 1
+        snapshot["index"] = index
+        if player and player in parser.get_actors(index):
+            snapshot["data"] = parser.get_player_report(player, index)
+        else:
+            snapshot["data"] = results[index]
+        parser.evaluate_checklist(snapshot["data"])
+        return snapshot
+    
+    def apply_live_snapshot(self, snapshot):
+        """后台刷新完成后在主线程中更新战斗列表和各选项卡，并安排下一次刷新"""
+        tailer = snapshot["tailer"]
+        if tailer is not self.live_tailer:
+            # 跟踪已停止或重新开始
+            return
+        if "error" in snapshot:
+            self.stop_live()
+            messagebox.showerror("错误", f"实时跟踪时出错: {str(snapshot['error'])}")
+            return
+        
+        if "lines_read" in snapshot:
+            self.live_lines_shown = snapshot["lines_read"]
+        if snapshot.get("results"):
+            self.update_encounter_list(snapshot["results"], snapshot["index"])
+            self.analysis_data = snapshot["data"]
+            self.analysis_source = "local"
+            self.update_local_players()
+            
+            # 更新各选项卡的数据
+            self.refresh_views()
+        
+        self.status_label.config(text=f"实时跟踪中... 已读取 {tailer.offset / 1048576:.1f} MB，{tailer.lines_read} 行")
+        self.live_job = self.root.after(50 if snapshot["has_more"] else self.LIVE_INTERVAL, self.live_poll)
+    
+    def select_encounter(self, event=None):
+        """切换显示的战斗，直接使用已解析的结果，无需重新读取文件"""
+        index = self.encounter_combo.current()
+        if index < 0 or index >= len(self.log_parser.results):
+            return
+        
+        self.analysis_data = self.log_parser.results[index]
+        self.analysis_source = "local"
+        self.range_start_var.set("")
+        self.range_end_var.set("")
+        self.update_local_players()
+        
+        # 更新各选项卡的数据
+        self.refresh_views()
+    
+    def update_local_players(self):
+        """列出当前战斗中的所有玩家，并选中正在显示的玩家"""
+        players = self.log_parser.get_actors(max(self.encounter_combo.current(), 0))
+        self.local_player_combo['values'] = players
+        if self.analysis_data and self.analysis_data["player"] in players:
+            self.local_player_combo.current(players.index(self.analysis_data["player"]))
+        else:
+            self.local_player_var.set("")
+    
+    def select_local_player(self, event=None):
+        """切换分析的玩家，直接使用已聚合的数据，无需重新读取文件"""
+        player = self.local_player_var.get()
+        if not player:
+            return
+        
+        if self.range_start_var.get() or self.range_end_var.get():
+            self.apply_time_range()
+            return
+        
+        self.analysis_data = self.log_parser.get_player_report(player, max(self.encounter_combo.current(), 0))
+        
+        # 更新各选项卡的数据
+        self.refresh_views()
+    
+    def apply_time_range(self):
+        """只统计当前战斗中指定时间范围内的数据，使用前缀和索引，无需重新扫描事件"""
+        if not self.analysis_data or self.log_parser is None or not self.log_parser.encounters:
+            messagebox.showwarning("警告", "请先分析一个文本格式的战斗日志")
+            return
+        
+        try:
+            start = float(self.range_start_var.get() or 0)
+            end = float(self.range_end_var.get() or "inf")
+        except ValueError:
+            messagebox.showerror("错误", "时间范围必须是数字（秒）")
+            return
+        if end <= start:
+            messagebox.showerror("错误", "结束时间必须大于开始时间")
+            return
+        
+        player = self.local_player_var.get() or self.analysis_data["player"]
+        index = max(self.encounter_combo.current(), 0)
+        report = self.log_parser.get_window_report(player, start, end, index)
+        if report is None:
+            messagebox.showinfo("提示", "按时间范围统计需要安装 numpy，且不支持实时跟踪模式")
+            return
+        self.analysis_data = report
+        
+        # 更新各选项卡的数据
+        self.refresh_views()
+    
+    def clear_time_range(self):
+        """恢复显示整场战斗的数据"""
+        self.range_start_var.set("")
+        self.range_end_var.set("")
+        if self.log_parser is None or not self.log_parser.encounters or not self.analysis_data:
+            return
+        if self.local_player_var.get():
+            self.select_local_player()
+        else:
+            self.select_encounter()
+    
     def fetch_warcraftlogs(self):
         """获取WarcraftLogs数据"""
         url = self.url_var.get().strip()
@@ -231,67 +802,109 @@ class RetributionPaladinAnalyzer:
             messagebox.showerror("错误", "无法从链接中提取报告ID")
             return
             
+        # 报告所在的服务器（国服/国际服）同时也是 API 服务器
+        import urllib.parse
+        from warcraftlogs import WarcraftLogsClient
+        base_url = "https://" + urllib.parse.urlsplit(url).hostname
+        self.wl_client = WarcraftLogsClient.from_environment(base_url, cache=self.get_wl_cache())
+        
         self.log_message(f"正在获取报告 {report_id} 的数据...")
-        self.log_message("注意: 当前版本使用模拟数据。要使用真实API数据，需要:")
-        self.log_message("1. 拥有并关联Battle.net账号（必须条件）")
-        self.log_message("2. 在WarcraftLogs开发者门户注册应用")
-        self.log_message("3. 获取API密钥和客户端ID")
-        self.log_message("4. 实现OAuth2认证流程")
-        self.log_message("5. 使用API密钥发送请求到WarcraftLogs API")
-        self.log_message("重要提示: 根据WarcraftLogs官方要求，您必须拥有关联的Battle.net账号才能创建密钥或使用API")
-        
-        # 模拟API请求延迟
-        self.log_message("正在连接到WarcraftLogs API...")
-        self.root.update()
-        time.sleep(1)
-        
-        # 模拟获取战斗列表
-        self.log_message("正在获取战斗列表...")
-        self.root.update()
-        time.sleep(1)
-        
-        # 清空现有选项
-        self.fight_combo['values'] = []
-        self.player_combo['values'] = []
-        
-        # 添加模拟战斗数据
+        if self.wl_client is None:
+            self.log_message("注意: 未配置 API 凭据，当前使用模拟数据。要使用真实API数据，需要:")
+            self.log_message("1. 拥有并关联Battle.net账号（必须条件）")
+            self.log_message("2. 在WarcraftLogs开发者门户注册应用，获取客户端ID和密钥")
+            self.log_message("3. 设置环境变量 WCL_CLIENT_ID 和 WCL_CLIENT_SECRET 后重新启动程序")
+            self.log_message("重要提示: 根据WarcraftLogs官方要求，您必须拥有关联的Battle.net账号才能创建密钥或使用API")
+        
+        client = self.wl_client
+        
+        def task(report, cancel_event):
+            if client is None:
+                # 模拟API请求延迟，等待期间可以被取消
+                report("log", "正在连接到WarcraftLogs API...")
+                if cancel_event.wait(1):
+                    return None
+                report("log", "正在获取战斗列表...")
+                if cancel_event.wait(1):
+                    return None
+                return self.get_mock_warcraftlogs_report(report_id)
+            
+            report("log", f"正在连接到 {client.base_url} ...")
+            data = client.fetch_report(report_id)
+            if client.cache is not None:
+                report("log", client.cache.stats_message())
+            return data
+        
+        self.start_task(task, self.show_warcraftlogs_report)
+    
+    def get_mock_warcraftlogs_report(self, report_id):
+        """生成模拟的报告数据（未配置 API 凭据时使用），结构与 WarcraftLogsClient.fetch_report() 相同"""
         fights = [
-            "1: 奥妮克希亚 (击杀) - 5:30",
-            "2: 黑翼之巢 - 熔岩守卫 (击杀) - 3:45",
-            "3: 黑翼之巢 - 勒什雷尔 (击杀) - 4:20",
-            "4: 黑翼之巢 - 费尔默 (击杀) - 2:50",
-            "5: 黑翼之巢 - 埃博诺克 (击杀) - 3:10",
-            "6: 黑翼之巢 - 弗莱格尔 (击杀) - 4:00",
-            "7: 黑翼之巢 - 克洛玛古斯 (击杀) - 6:15",
-            "8: 黑翼之巢 - 奈法利安 (击杀) - 8:30"
+            ("奥妮克希亚", 330),
+            ("黑翼之巢 - 熔岩守卫", 225),
+            ("黑翼之巢 - 勒什雷尔", 260),
+            ("黑翼之巢 - 费尔默", 170),
+            ("黑翼之巢 - 埃博诺克", 190),
+            ("黑翼之巢 - 弗莱格尔", 240),
+            ("黑翼之巢 - 克洛玛古斯", 375),
+            ("黑翼之巢 - 奈法利安", 510)
+        ]
+        players = [
+            ("光明使者", "惩戒骑"),
+            ("暗影之刃", "战士"),
+            ("自然之力", "德鲁伊"),
+            ("火焰之心", "法师"),
+            ("神圣守护", "神圣骑"),
+            ("暗影愈合", "牧师"),
+            ("元素掌控", "萨满"),
+            ("死亡阴影", "术士"),
+            ("致命毒刃", "盗贼"),
+            ("野性守护", "猎人")
         ]
+        return {
+            "code": report_id,
+            "title": "模拟报告",
+            "fights": [
+                {"id": i + 1, "name": name, "startTime": 0, "endTime": seconds * 1000, "kill": True}
+                for i, (name, seconds) in enumerate(fights)
+            ],
+            "players": [
+                {"id": i + 1, "name": name, "type": "Player", "subType": sub_type}
+                for i, (name, sub_type) in enumerate(players)
+            ]
+        }
+    
+    def show_warcraftlogs_report(self, report):
+        """获取完成后在主线程中填充战斗和玩家列表"""
+        if report is None:
+            return
+        
+        self.wl_report = report
+        self.wl_fights = report["fights"]
+        self.wl_players = report["players"]
+        
+        # 填充战斗列表
+        fights = []
+        for i, fight in enumerate(self.wl_fights):
+            minutes, seconds = divmod(int((fight["endTime"] - fight["startTime"]) / 1000), 60)
+            result = "击杀" if fight.get("kill") else "未击杀"
+            fights.append(f"{i + 1}: {fight['name']} ({result}) - {minutes}:{seconds:02d}")
         self.fight_combo['values'] = fights
         if fights:
             self.fight_combo.current(0)
-            
-        # 添加模拟玩家数据
-        players = [
-            "光明使者 (惩戒骑)",
-            "暗影之刃 (战士)",
-            "自然之力 (德鲁伊)",
-            "火焰之心 (法师)",
-            "神圣守护 (神圣骑)",
-            "暗影愈合 (牧师)",
-            "元素掌控 (萨满)",
-            "死亡阴影 (术士)",
-            "致命毒刃 (盗贼)",
-            "野性守护 (猎人)"
-        ]
+        
+        # 填充玩家列表
+        players = [f"{player['name']} ({player.get('subType', '')})" for player in self.wl_players]
         self.player_combo['values'] = players
         if players:
-            # 自动选择惩戒骑士
+            # 自动选择惩戒骑士（国际服报告中职业为 Paladin）
             for i, player in enumerate(players):
-                if "惩戒骑" in player:
+                if "惩戒骑" in player or "Paladin" in player:
                     self.player_combo.current(i)
                     break
             else:
                 self.player_combo.current(0)
-                
+        
         self.log_message(f"成功获取报告数据！找到 {len(fights)} 场战斗和 {len(players)} 名玩家。")
         self.log_message("请选择要分析的战斗和玩家，然后点击'分析'按钮。")
         
@@ -300,7 +913,7 @@ class RetributionPaladinAnalyzer:
     
     def analyze_warcraftlogs(self):
         """分析WarcraftLogs数据"""
-        if not hasattr(self, 'wl_fights') or not hasattr(self, 'wl_players'):
+        if not self.wl_fights or not self.wl_players:
             messagebox.showwarning("警告", "请先获取WarcraftLogs数据")
             return
         
@@ -317,29 +930,44 @@ class RetributionPaladinAnalyzer:
         
         self.log_message(f"正在分析 {player['name']} 在 {fight['name']} 中的表现...")
         
-        try:
-            # 这里应该是实际从WarcraftLogs API获取详细战斗数据的代码
-            # 由于WarcraftLogs API需要认证，这里我们使用模拟数据
-            
-            # 使用模拟数据
-            self.analysis_data = self.log_parser.get_mock_data()
-            
-            # 更新玩家和Boss名称
-            self.analysis_data["player"] = player["name"]
-            self.analysis_data["boss"] = fight["name"]
-            
-            # 更新各选项卡的数据
-            self.update_dashboard()
-            self.update_abilities_analysis()
-            self.update_casting_time_analysis()
-            self.update_checklist()
+        from log_parser import LogParser
+        from warehouse import report_fight_records
+        client = self.wl_client
+        report_data = self.wl_report
+        if client is not None:
+            self.get_warehouse()
+        
+        def task(report, cancel_event):
+            if client is None:
+                # 未配置 API 凭据时使用模拟数据
+                data = LogParser().get_mock_data()
+                data["player"] = player["name"]
+                data["boss"] = fight["name"]
+                return data
             
-            self.log_message("分析完成")
-            messagebox.showinfo("成功", "分析完成")
-            
-        except Exception as e:
-            self.log_message(f"分析失败: {str(e)}")
-            messagebox.showerror("错误", f"分析WarcraftLogs数据时出错: {str(e)}")
+            # 事件分页获取后直接累加到独立的解析器中，不影响本地文件的分析结果
+            parser = LogParser()
+            data = client.analyze_fight(
+                parser, report_data, fight, player, cancel_event,
+                progress=lambda pages, events: report("log", f"已获取 {pages} 页，{events} 条事件")
+            )
+            if client.cache is not None:
+                report("log", client.cache.stats_message())
+            self.record_history(report_fight_records(parser, report_data, fight, player), report)
+            return data
+        
+        self.start_task(task, self.show_warcraftlogs_results)
+    
+    def show_warcraftlogs_results(self, data):
+        """WarcraftLogs 分析完成后在主线程中更新各选项卡"""
+        self.analysis_data = data
+        self.analysis_source = "warcraftlogs"
+        
+        # 更新各选项卡的数据
+        self.refresh_views()
+        
+        self.log_message("分析完成")
+        messagebox.showinfo("成功", "分析完成")
     
     def log_message(self, message):
         """在日志区域显示消息"""
@@ -356,16 +984,46 @@ class RetributionPaladinAnalyzer:
         file_path = filedialog.asksaveasfilename(
             title="保存分析结果",
             defaultextension=".json",
-            filetypes=[("JSON文件", "*.json"), ("所有文件", "*.*")]
+            filetypes=[("JSON文件", "*.json"), ("JSON Lines（所有战斗和玩家）", "*.jsonl"), ("所有文件", "*.*")]
         )
         
-        if file_path:
+        if file_path.endswith(".jsonl"):
+            self.save_result_stream(file_path)
+        elif file_path:
+            import json
+            from result_stream import export_result
             try:
+                # 切换战斗或玩家后没有打开过检查列表选项卡时，检查列表尚未生成
+                self.get_log_parser().evaluate_checklist(self.analysis_data)
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.analysis_data, f, ensure_ascii=False, indent=2)
+                    json.dump(export_result(self.analysis_data), f, ensure_ascii=False, indent=2)
+                messagebox.showinfo("成功", "分析结果已保存")
+            except Exception as e:
+                messagebox.showerror("错误", f"保存失败: {str(e)}")
+    
+    def save_result_stream(self, file_path):
+        """
+        将所有战斗中所有玩家的结果逐条写入结果流，在后台线程中执行
+        WarcraftLogs 的分析结果不在解析器中，只写入当前显示的结果
+        """
+        from result_stream import ResultStreamWriter
+        log_parser = self.log_parser
+        if self.analysis_source != "local" or log_parser is None or not log_parser.results:
+            try:
+                with ResultStreamWriter(file_path) as writer:
+                    writer.write(1, self.get_log_parser().evaluate_checklist(self.analysis_data))
                 messagebox.showinfo("成功", "分析结果已保存")
             except Exception as e:
                 messagebox.showerror("错误", f"保存失败: {str(e)}")
+            return
+        
+        def task(report, cancel_event):
+            return log_parser.save_result_stream(file_path, cancel_event=cancel_event)
+        
+        def done(count):
+            messagebox.showinfo("成功", f"分析结果已保存，共 {count} 条")
+        
+        self.start_task(task, done)
     
     def init_dashboard(self):
         # 创建仪表盘内容
@@ -487,6 +1145,276 @@ class RetributionPaladinAnalyzer:
         
         self.checklist_tree.pack(fill=tk.BOTH, expand=True)
     
+    def init_event_view(self):
+        # 创建事件明细内容：逐条事件的虚拟表格，只渲染可见的行
+        self.events_content = ttk.Frame(self.events_frame)
+        self.events_content.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # 筛选条件
+        self.event_filter_frame = ttk.Frame(self.events_content)
+        self.event_filter_frame.pack(fill=tk.X, pady=5)
+        
+        self.event_actor_var = tk.StringVar(value=self.ALL_FILTER)
+        self.event_ability_var = tk.StringVar(value=self.ALL_FILTER)
+        self.event_target_var = tk.StringVar(value=self.ALL_FILTER)
+        self.event_crit_var = tk.StringVar(value=self.ALL_FILTER)
+        self.event_filter_combos = []
+        for label, variable, width in (("施放者:", self.event_actor_var, 14),
+                                       ("技能:", self.event_ability_var, 12),
+                                       ("目标:", self.event_target_var, 14),
+                                       ("暴击:", self.event_crit_var, 8)):
+            ttk.Label(self.event_filter_frame, text=label).pack(side=tk.LEFT, padx=5)
+            combo = ttk.Combobox(self.event_filter_frame, textvariable=variable, state="readonly", width=width)
+            combo.pack(side=tk.LEFT, padx=5)
+            combo.bind("<<ComboboxSelected>>", self.apply_event_filter)
+            self.event_filter_combos.append(combo)
+        self.event_filter_combos[3]['values'] = [self.ALL_FILTER, "暴击", "未暴击"]
+        
+        self.event_count_label = ttk.Label(self.events_content, text="分析本地日志后显示逐条事件（需要安装 numpy）")
+        self.event_count_label.pack(anchor=tk.W, pady=2)
+        
+        from virtual_table import VirtualTable
+        self.event_table = VirtualTable(
+            self.events_content,
+            columns=[
+                ("time", "时间(秒)", 80, tk.E),
+                ("actor", "施放者", 120, tk.W),
+                ("ability", "技能", 100, tk.W),
+                ("target", "目标", 120, tk.W),
+                ("amount", "伤害", 80, tk.E),
+                ("crit", "暴击", 50, tk.CENTER),
+                ("cast", "类型", 60, tk.CENTER)
+            ],
+            formatter=lambda row: (
+                f"{row[0]:.3f}", row[1] or "", row[2], row[3] or "",
+                "" if row[4] is None else row[4], "是" if row[5] else "", "施放" if row[6] else "命中"
+            )
+        )
+        self.event_table.pack(fill=tk.BOTH, expand=True)
+        self.event_model = None
+    
+    def update_event_view(self):
+        """按当前的战斗、玩家和时间范围重建事件明细的数据模型"""
+        table = self.log_parser.event_table if self.log_parser is not None else None
+        index = max(self.encounter_combo.current(), 0)
+        if (self.analysis_source != "local" or table is None or self.live_tailer is not None
+                or index >= len(self.log_parser.encounters)):
+            self.event_model = None
+            self.event_table.set_model(None)
+            self.event_count_label.config(text="分析本地日志后显示逐条事件（需要安装 numpy，实时跟踪时不可用）")
+            return
+        
+        encounter = self.log_parser.encounters[index]
+        start_time = encounter.start_time or 0
+        rows = encounter.event_rows
+        try:
+            # 设置了时间范围时只显示该范围内的事件
+            if self.range_start_var.get() or self.range_end_var.get():
+                start = float(self.range_start_var.get() or 0)
+                end = float(self.range_end_var.get() or "inf")
+                rows = table.time_rows(start_time + start, start_time + end, rows)
+        except ValueError:
+            pass
+        
+        from event_store import EventListModel
+        self.event_model = EventListModel(table, rows, start_time)
+        for combo, column in zip(self.event_filter_combos, ("actor", "ability", "target")):
+            combo['values'] = [self.ALL_FILTER] + self.event_model.distinct(column)
+        # 默认只显示正在分析的玩家的事件
+        player = self.analysis_data["player"] if self.analysis_data else None
+        self.event_actor_var.set(player if player in self.event_filter_combos[0]['values'] else self.ALL_FILTER)
+        self.apply_event_filter()
+    
+    def apply_event_filter(self, event=None):
+        """按下拉菜单中的条件筛选事件明细"""
+        model = self.event_model
+        if model is None:
+            return
+        
+        def selected(variable):
+            value = variable.get()
+            return None if value == self.ALL_FILTER or not value else value
+        
+        crit = {"暴击": True, "未暴击": False}.get(self.event_crit_var.get())
+        model.set_filter(
+            actor=selected(self.event_actor_var),
+            ability=selected(self.event_ability_var),
+            target=selected(self.event_target_var),
+            crit=crit
+        )
+        if self.event_table.model is model:
+            self.event_table.refresh()
+        else:
+            self.event_table.set_model(model)
+        self.event_count_label.config(text=f"共 {model.count:,} 条事件，显示 {len(model):,} 条（点击列标题排序）")
+    
+    def init_trends(self):
+        # 创建历史趋势内容：按周、首领或玩家统计已记录战斗的中位数和 P90
+        self.trends_content = ttk.Frame(self.trends_frame)
+        self.trends_content.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        self.trend_filter_frame = ttk.Frame(self.trends_content)
+        self.trend_filter_frame.pack(fill=tk.X, pady=5)
+        
+        self.trend_groups = {"按周": "week", "按首领": "boss", "按玩家": "player"}
+        self.trend_metrics = {"DPS": "dps", "暴击率": "crit_rate", "总伤害": "damage"}
+        self.trend_group_var = tk.StringVar(value="按周")
+        self.trend_metric_var = tk.StringVar(value="DPS")
+        self.trend_boss_var = tk.StringVar(value=self.ALL_FILTER)
+        self.trend_player_var = tk.StringVar(value=self.ALL_FILTER)
+        
+        self.trend_combos = []
+        for label, variable, values, width in (("分组:", self.trend_group_var, list(self.trend_groups), 8),
+                                               ("指标:", self.trend_metric_var, list(self.trend_metrics), 8),
+                                               ("首领:", self.trend_boss_var, [self.ALL_FILTER], 18),
+                                               ("玩家:", self.trend_player_var, [self.ALL_FILTER], 14)):
+            ttk.Label(self.trend_filter_frame, text=label).pack(side=tk.LEFT, padx=5)
+            combo = ttk.Combobox(self.trend_filter_frame, textvariable=variable, values=values,
+                                 state="readonly", width=width)
+            combo.pack(side=tk.LEFT, padx=5)
+            combo.bind("<<ComboboxSelected>>", self.query_trends)
+            self.trend_combos.append(combo)
+        
+        self.trend_summary = ttk.Label(self.trends_content, text="分析日志后，各场战斗的数据会自动记录到历史数据中")
+        self.trend_summary.pack(anchor=tk.W, pady=2)
+        
+        self.trends_tree = ttk.Treeview(self.trends_content, columns=("samples", "median", "p90", "mean", "best"))
+        self.trends_tree.heading("#0", text="分组")
+        self.trends_tree.heading("samples", text="样本数")
+        self.trends_tree.heading("median", text="中位数")
+        self.trends_tree.heading("p90", text="P90")
+        self.trends_tree.heading("mean", text="平均")
+        self.trends_tree.heading("best", text="最高")
+        
+        self.trends_tree.column("#0", width=180)
+        for column in ("samples", "median", "p90", "mean", "best"):
+            self.trends_tree.column(column, width=100, anchor=tk.E)
+        
+        self.trends_tree.pack(fill=tk.BOTH, expand=True)
+    
+    def update_trends(self):
+        """刷新首领和玩家列表（可能刚记录了新的战斗）并重新查询"""
+        warehouse = self.get_warehouse()
+        if warehouse is None:
+            self.trend_summary.config(text="无法打开历史数据仓库")
+            return
+        self.trend_combos[2]['values'] = [self.ALL_FILTER] + warehouse.bosses()
+        self.trend_combos[3]['values'] = [self.ALL_FILTER] + warehouse.players()
+        self.query_trends()
+    
+    def query_trends(self, event=None):
+        warehouse = self.warehouse
+        if warehouse is None:
+            return
+        
+        def selected(variable):
+            value = variable.get()
+            return None if value == self.ALL_FILTER else value
+        
+        metric = self.trend_metrics[self.trend_metric_var.get()]
+        started = time.perf_counter()
+        try:
+            trend = warehouse.trend(
+                self.trend_groups[self.trend_group_var.get()], metric,
+                boss=selected(self.trend_boss_var), player=selected(self.trend_player_var)
+            )
+        except Exception as e:
+            self.trend_summary.config(text=f"查询历史数据时出错: {str(e)}")
+            return
+        seconds = time.perf_counter() - started
+        
+        def fmt(value):
+            return f"{value * 100:.2f}%" if metric == "crit_rate" else f"{value:.1f}"
+        
+        # 清空现有数据
+        self.trends_tree.delete(*self.trends_tree.get_children())
+        
+        for row in trend:
+            self.trends_tree.insert(
+                "", "end", text=row["key"],
+                values=(row["samples"], fmt(row["median"]), fmt(row["p90"]), fmt(row["mean"]), fmt(row["best"]))
+            )
+        self.trend_summary.config(
+            text=f"共 {warehouse.fight_count()} 场战斗，{sum(row['samples'] for row in trend)} 个样本，"
+                 f"查询用时 {seconds * 1000:.1f} ms"
+        )
+    
+    def init_diagnostics(self):
+        # 创建诊断内容
+        self.diagnostics_content = ttk.Frame(self.diagnostics_frame)
+        self.diagnostics_content.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # cProfile 开关
+        self.profile_var = tk.BooleanVar(value=False)
+        self.profile_check = ttk.Checkbutton(
+            self.diagnostics_content, text="下次分析时记录 cProfile（解析会变慢）",
+            variable=self.profile_var, command=self.toggle_profile
+        )
+        self.profile_check.pack(anchor=tk.W, pady=2)
+        
+        self.diagnostics_summary = ttk.Label(self.diagnostics_content, text="尚未分析")
+        self.diagnostics_summary.pack(anchor=tk.W, pady=2)
+        
+        # 各阶段用时和计数器
+        self.diagnostics_tree = ttk.Treeview(self.diagnostics_content, columns=("value", "calls", "share"), height=12)
+        self.diagnostics_tree.heading("#0", text="阶段/计数器")
+        self.diagnostics_tree.heading("value", text="用时(ms)/数值")
+        self.diagnostics_tree.heading("calls", text="次数")
+        self.diagnostics_tree.heading("share", text="占比")
+        
+        self.diagnostics_tree.column("#0", width=200)
+        self.diagnostics_tree.column("value", width=150)
+        self.diagnostics_tree.column("calls", width=80)
+        self.diagnostics_tree.column("share", width=80)
+        
+        self.diagnostics_tree.pack(fill=tk.X, pady=5)
+        
+        # cProfile 结果
+        self.profile_text = scrolledtext.ScrolledText(self.diagnostics_content, height=10, font=("Consolas", 9))
+        self.profile_text.pack(fill=tk.BOTH, expand=True)
+        self.profile_text.config(state=tk.DISABLED)
+    
+    def toggle_profile(self):
+        """切换是否在下次分析时记录 cProfile"""
+        self.get_log_parser().diagnostics.profile = self.profile_var.get()
+    
+    def refresh_views(self):
+        """刷新已创建的选项卡，并记录界面刷新的用时（其余选项卡在第一次显示时刷新）"""
+        for name, (init, update, stage) in self.tab_views.items():
+            if name in self.built_tabs:
+                with self.view_stage(stage):
+                    update()
+    
+    def update_diagnostics(self):
+        if self.log_parser is None:
+            return
+        diagnostics = self.log_parser.diagnostics
+        if not diagnostics.enabled:
+            return
+        
+        # 清空现有数据
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        
+        report = diagnostics.to_dict()
+        info = "，".join(f"{name}: {value}" for name, value in report["info"].items())
+        self.diagnostics_summary.config(text=f"解析总用时 {report['seconds']:.3f} 秒  {info}")
+        
+        total = sum(stage["seconds"] for stage in report["stages"].values()) or 1
+        for name, stage in report["stages"].items():
+            self.diagnostics_tree.insert(
+                "", "end", text=name,
+                values=(f"{stage['seconds'] * 1000:.1f}", stage["calls"], f"{stage['seconds'] / total * 100:.1f}%")
+            )
+        for name, value in report["counters"].items():
+            self.diagnostics_tree.insert("", "end", text=name, values=(f"{value:,}", "", ""))
+        for name, value in report["rates"].items():
+            self.diagnostics_tree.insert("", "end", text=name, values=(f"{value:,.0f}", "", ""))
+        
+        self.profile_text.config(state=tk.NORMAL)
+        self.profile_text.delete("1.0", tk.END)
+        self.profile_text.insert(tk.END, report["profile"] or "未记录 cProfile 结果")
+        self.profile_text.config(state=tk.DISABLED)
+    
     def update_dashboard(self):
         if not self.analysis_data:
             return
@@ -506,8 +1434,7 @@ class RetributionPaladinAnalyzer:
             return
         
         # 清空现有数据
-        for item in self.abilities_tree.get_children():
-            self.abilities_tree.delete(item)
+        self.abilities_tree.delete(*self.abilities_tree.get_children())
         
         # 添加技能数据
         for ability in self.analysis_data["abilities"]:
@@ -536,13 +1463,19 @@ class RetributionPaladinAnalyzer:
         if not self.analysis_data:
             return
         
+        # 切换战斗、玩家或时间范围后的结果在第一次显示时才生成检查列表
+        if not self.analysis_data.get("checklist"):
+            self.get_log_parser().evaluate_checklist(self.analysis_data)
+        
         # 清空现有数据
-        for item in self.checklist_tree.get_children():
-            self.checklist_tree.delete(item)
+        self.checklist_tree.delete(*self.checklist_tree.get_children())
         
         # 添加检查项数据
         for item in self.analysis_data["checklist"]:
-            status = "通过" if item["status"] else "需要改进"
+            if item["status"] is None:
+                status = "不适用"
+            else:
+                status = "通过" if item["status"] else "需要改进"
             self.checklist_tree.insert(
                 "", "end", text=item["name"],
                 values=(status, item["description"])
@@ -0,0 +1,116 @@
+import os
+import shutil
+import hashlib
+
+from sqlite_cache import SQLiteCache
+
+def directory_size(directory):
+    """返回目录中文件的总大小（字节），目录不存在时返回 0"""
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+class ParseCache(SQLiteCache):
+    """
+    解析结果缓存
+    将日志的聚合数据保存在本地 SQLite 数据库中，再次打开同一个日志文件时直接读取，
+    不再重新解析。缓存总大小超过上限时按最近最少使用（LRU）的顺序淘汰。
+    逐条事件的二进制附属文件（event_store.EventTable）保存在同一目录的 events 子目录中，
+    每个日志文件一份，新的解析结果覆盖旧的；附属文件的大小计入对应条目，条目被淘汰时一并删除。
+    """
+    
+    TABLE = "entries"
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            value BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            last_access REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+    )
+    
+    # 默认缓存位置和大小上限（包括事件表附属文件）
+    DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".retribution_analyzer", "parse_cache.sqlite3")
+    DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+    # 计算内容指纹时读取文件开头和结尾的字节数
+    FINGERPRINT_BYTES = 64 * 1024
+    
+    def __init__(self, path=DEFAULT_PATH, max_bytes=None):
+        """
+        Args:
+            path: SQLite 数据库文件路径
+            max_bytes: 缓存内容的总大小上限（字节），None 表示 DEFAULT_MAX_BYTES
+        """
+        super().__init__(path, max_bytes)
+    
+    def fingerprint(self, file_path, size):
+        """计算文件的快速内容指纹：只读取开头和结尾各一小段"""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            digest.update(f.read(self.FINGERPRINT_BYTES))
+            if size > self.FINGERPRINT_BYTES:
+                f.seek(max(size - self.FINGERPRINT_BYTES, self.FINGERPRINT_BYTES))
+                digest.update(f.read(self.FINGERPRINT_BYTES))
+        return digest.hexdigest()
+    
+    def make_key(self, file_path, version):
+        """
+        根据文件身份生成缓存键
+        
+        Args:
+            file_path: 日志文件路径
+            version: 解析器版本标识，解析逻辑或技能表变化时应随之变化
+        
+        Returns:
+            缓存键字符串
+        """
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        parts = [path, str(stat.st_size), str(stat.st_mtime_ns), self.fingerprint(path, stat.st_size), version]
+        return hashlib.sha1("\n".join(parts).encode('utf-8')).hexdigest()
+    
+    def sidecar_dir(self, file_path):
+        """返回日志文件对应的事件表附属文件目录"""
+        name = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+        return os.path.join(os.path.dirname(self.path), "events", name)
+    
+    def put(self, key, file_path, value, sidecar_bytes=0):
+        """
+        写入缓存，必要时淘汰最久未使用的条目
+        
+        Args:
+            key: make_key() 生成的缓存键
+            file_path: 对应的日志文件路径（便于查看和清理）
+            value: 可以序列化为 JSON 的值
+            sidecar_bytes: 该日志文件的事件表附属文件大小，0 表示没有附属文件
+        """
+        path = os.path.abspath(file_path)
+        sidecar = self.sidecar_dir(path)
+        with self.connect() as conn:
+            # 同一文件的旧版本缓存已经不会再命中（附属文件由新的解析结果覆盖，不在这里删除）
+            conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+            stored = self.store(conn, key, value, {"path": path}, sidecar_bytes)
+        if not stored or not sidecar_bytes:
+            # 附属文件没有对应的条目时无法被淘汰，直接删除
+            shutil.rmtree(sidecar, ignore_errors=True)
+    
+    def remove(self, conn, key):
+        """删除条目及其事件表附属文件"""
+        row = conn.execute("SELECT path FROM entries WHERE key = ?", (key,)).fetchone()
+        super().remove(conn, key)
+        if row is not None:
+            shutil.rmtree(self.sidecar_dir(row[0]), ignore_errors=True)
+    
+    def clear(self):
+        """清空缓存"""
+        super().clear()
+        shutil.rmtree(os.path.join(os.path.dirname(self.path), "events"), ignore_errors=True)
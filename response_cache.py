@@ -0,0 +1,86 @@
+import os
+import time
+
+from sqlite_cache import SQLiteCache
+
+class ResponseCache(SQLiteCache):
+    """
+    WarcraftLogs API 响应缓存
+    按 报告ID / 战斗ID / 分页游标 保存 API 响应，重复查看同一份报告时不再消耗 API 请求次数。
+    已结束的报告内容不会再变化，永不过期；仍在实时记录的报告只缓存较短时间。
+    缓存总大小超过上限时按最近最少使用（LRU）的顺序淘汰。
+    """
+    
+    TABLE = "responses"
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            report TEXT NOT NULL,
+            fight INTEGER,
+            cursor REAL,
+            value BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            expires REAL,
+            last_access REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)",
+        "CREATE INDEX IF NOT EXISTS responses_report ON responses (report)",
+        "CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires)"
+    )
+    
+    # 默认缓存位置
+    DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".retribution_analyzer", "wcl_cache.sqlite3")
+    
+    def __init__(self, path=DEFAULT_PATH, max_bytes=None):
+        """
+        Args:
+            path: SQLite 数据库文件路径
+            max_bytes: 缓存内容的总大小上限（字节），None 表示 DEFAULT_MAX_BYTES
+        """
+        super().__init__(path, max_bytes)
+    
+    def make_key(self, report, fight=None, cursor=None, extra=""):
+        """
+        生成缓存键
+        
+        Args:
+            report: 报告ID
+            fight: 战斗ID，报告级别的查询为 None
+            cursor: 分页游标（事件页的开始时间），None 表示第一页或非分页查询
+            extra: 其他影响结果的查询参数（如时间段结束时间、玩家ID）
+        """
+        parts = [report, "" if fight is None else str(fight), "" if cursor is None else repr(cursor), extra]
+        return "/".join(parts)
+    
+    def expire(self, conn, now):
+        """删除已过期的条目，过期的条目读取时视为未命中"""
+        conn.execute("DELETE FROM responses WHERE expires IS NOT NULL AND expires < ?", (now,))
+    
+    def put(self, key, value, report, fight=None, cursor=None, ttl=None):
+        """
+        写入缓存，必要时淘汰最久未使用的条目
+        
+        Args:
+            key: make_key() 生成的缓存键
+            value: 可以序列化为 JSON 的值
+            report / fight / cursor: 与缓存键对应的报告ID、战斗ID和分页游标（便于查看和清理）
+            ttl: 有效期（秒），None 表示永不过期
+        """
+        expires = time.time() + ttl if ttl is not None else None
+        columns = {"report": report, "fight": fight, "cursor": cursor, "expires": expires}
+        with self.connect() as conn:
+            self.store(conn, key, value, columns)
+    
+    def stats_message(self):
+        """返回用于显示的命中统计"""
+        return f"响应缓存：命中 {self.hits} 次，未命中 {self.misses} 次，占用 {self.total_bytes() / 1048576:.1f} MB"
+    
+    def clear(self, report=None):
+        """清空缓存；指定 report 时只删除该报告的条目"""
+        if report is None:
+            super().clear()
+            return
+        with self.connect() as conn:
+            conn.execute("DELETE FROM responses WHERE report = ?", (report,))
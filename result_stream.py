@@ -0,0 +1,289 @@
+"""
+分析结果的流式存储（JSON Lines）
+"保存分析结果"的 JSON 文件需要一次性序列化和反序列化整个结果，战斗和玩家较多时写入和打开都很慢。
+结果流每行一个 JSON 对象，每场战斗的每个玩家一条记录，逐条写入；
+文件末尾的索引记录了每条记录的偏移，读取时只加载索引，单场战斗的结果按偏移直接读取。
+
+文件格式（UTF-8，每行一个 JSON 对象）:
+    {"format":"retribution-analyzer-results","version":1,"created":"..."}     头部
+    {"encounter":1,"player":"光明使者","result":{...}}                         每场战斗每个玩家一条
+    {"index":[[战斗序号,玩家,Boss,时长,DPS,偏移,长度],...],"fields":[...]}     索引，写入完成时追加
+
+每场战斗的第一条记录为该战斗的默认结果。写入中断（没有索引）的文件读取时逐行扫描重建索引。
+写入时先写到同一目录下的临时文件，完成后再替换目标文件，因此可以覆盖正在读取的结果流；
+写入失败或被取消时目标文件保持不变。
+"""
+import io
+import os
+import json
+import secrets
+import datetime
+
+FORMAT_NAME = "retribution-analyzer-results"
+FORMAT_VERSION = 1
+# 头部行的开头，用于不解析整行即可识别文件格式
+HEADER_PREFIX = ('{"format":"' + FORMAT_NAME + '"').encode('utf-8')
+# 索引中每条记录的字段
+INDEX_FIELDS = ["encounter", "player", "boss", "duration", "dps", "offset", "length"]
+# 分析结果中只对本次运行有意义的字段，保存时去掉（诊断信息只保留在 LogParser.diagnostics 中）
+TRANSIENT_KEYS = ("diagnostics",)
+
+def is_result_stream(file_path):
+    """根据头部判断文件是否为结果流"""
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(len(HEADER_PREFIX)) == HEADER_PREFIX
+    except OSError:
+        return False
+
+def export_result(result):
+    """返回用于保存的结果：去掉 TRANSIENT_KEYS 中的字段，不修改原结果"""
+    if not any(key in result for key in TRANSIENT_KEYS):
+        return result
+    return {key: value for key, value in result.items() if key not in TRANSIENT_KEYS}
+
+def encode_line(record):
+    """将记录编码为一行紧凑的 JSON"""
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode('utf-8')
+
+class ResultStreamWriter:
+    """
+    结果流的增量写入（with 语句结束时写入索引）
+    每条结果写入后即可释放，内存中只保留索引。
+    内容写入同一目录下的临时文件，close() 时替换目标文件；with 语句中出现异常时调用 discard() 删除临时文件。
+    """
+    
+    def __init__(self, file_path, meta=None):
+        """
+        Args:
+            file_path: 输出文件路径
+            meta: 写入头部的附加信息（如来源日志），可选
+        """
+        self.file_path = file_path
+        self.index = []
+        self.offset = 0
+        # 临时文件与目标文件在同一目录（同一文件系统），os.replace() 才是原子操作；
+        # 以 'x' 模式创建，权限与直接写入目标文件时相同
+        directory, name = os.path.split(os.path.abspath(file_path))
+        self.temp_path = os.path.join(directory, f".{name}.{secrets.token_hex(4)}.tmp")
+        self.file = open(self.temp_path, 'xb')
+        
+        header = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "created": datetime.datetime.now().isoformat(timespec="seconds")
+        }
+        header.update(meta or {})
+        try:
+            self.write_line(header)
+        except BaseException:
+            self.discard()
+            raise
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+    
+    def write_line(self, record):
+        """写入一行，返回 (偏移, 长度)"""
+        data = encode_line(record)
+        offset = self.offset
+        self.file.write(data)
+        self.offset += len(data)
+        return offset, len(data)
+    
+    def write(self, encounter, result):
+        """
+        写入一条分析结果
+        
+        Args:
+            encounter: 战斗序号（从1开始）；同一场战斗先写入的结果为该战斗的默认结果
+            result: 分析结果字典
+        """
+        result = export_result(result)
+        player = result.get("player", "")
+        offset, length = self.write_line({"encounter": encounter, "player": player, "result": result})
+        self.index.append([
+            encounter, player, result.get("boss", ""), result.get("duration", 0), result.get("dps", 0),
+            offset, length
+        ])
+    
+    def close(self):
+        """写入索引，关闭临时文件并替换目标文件"""
+        if self.file.closed:
+            return
+        try:
+            self.write_line({"index": self.index, "fields": INDEX_FIELDS})
+            self.file.close()
+            os.replace(self.temp_path, self.file_path)
+        except BaseException:
+            self.discard()
+            raise
+    
+    def discard(self):
+        """放弃写入：关闭并删除临时文件，目标文件保持不变"""
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+class ResultStreamReader:
+    """
+    结果流的读取
+    打开时只加载索引，结果在需要时按偏移读取，每次读取单独打开文件，不持有文件句柄。
+    战斗位置与 LogParser 一致从0开始，按战斗在文件中首次出现的顺序排列。
+    """
+    
+    # 从文件末尾向前查找索引行时每次读取的字节数
+    TAIL_BLOCK_SIZE = 64 * 1024
+    
+    def __init__(self, file_path):
+        """
+        Raises:
+            ValueError: 不是结果流文件或版本不受支持
+        """
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            if f.read(len(HEADER_PREFIX)) != HEADER_PREFIX:
+                raise ValueError("不是分析结果流文件")
+            f.seek(0)
+            self.header = json.loads(f.readline())
+            if self.header.get("version", 0) > FORMAT_VERSION:
+                raise ValueError(f"不支持的结果流版本: {self.header.get('version')}")
+            
+            index = self.read_index(f)
+            if index is None:
+                index = self.scan(f)
+        
+        self.index = index
+        # 战斗序号 -> 该战斗的索引条目（按写入顺序）
+        self.encounters = {}
+        for entry in index:
+            self.encounters.setdefault(entry[0], []).append(entry)
+        self.order = list(self.encounters)
+    
+    def read_index(self, f):
+        """读取文件末尾的索引行，没有索引（写入中断）时返回 None"""
+        end = f.seek(0, io.SEEK_END)
+        position = end
+        tail = b""
+        # 向前读取直到找到倒数第二个换行符，即最后一行的开头
+        while position > 0 and tail.count(b"\n") < 2:
+            size = min(self.TAIL_BLOCK_SIZE, position)
+            position -= size
+            f.seek(position)
+            tail = f.read(size) + tail
+        
+        line = tail.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(record, dict) or "index" not in record:
+            return None
+        return record["index"]
+    
+    def scan(self, f):
+        """逐行扫描记录重建索引，末尾不完整的行被忽略"""
+        f.seek(0)
+        offset = len(f.readline())
+        index = []
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if "encounter" in record:
+                result = record["result"]
+                index.append([
+                    record["encounter"], record["player"], result.get("boss", ""),
+                    result.get("duration", 0), result.get("dps", 0), offset, len(line)
+                ])
+            offset += len(line)
+        return index
+    
+    def __len__(self):
+        """结果的条数（所有战斗的所有玩家）"""
+        return len(self.index)
+    
+    def encounter_count(self):
+        return len(self.order)
+    
+    def summaries(self):
+        """
+        返回每场战斗默认结果的摘要，不读取结果本身
+        
+        Returns:
+            {"encounter", "player", "boss", "duration", "dps"} 的列表
+        """
+        return [dict(zip(INDEX_FIELDS[:5], self.encounters[encounter][0][:5])) for encounter in self.order]
+    
+    def players(self, position):
+        """返回第 position 场战斗（从0开始）中有结果的玩家"""
+        return [entry[1] for entry in self.encounters[self.order[position]]]
+    
+    def load(self, entry):
+        """按索引条目读取一条结果"""
+        offset, length = entry[5], entry[6]
+        with open(self.file_path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.read(length))["result"]
+    
+    def get(self, position, player=None):
+        """
+        读取第 position 场战斗（从0开始）的结果
+        
+        Args:
+            player: 玩家名称，None 表示该战斗的默认结果
+        
+        Raises:
+            KeyError: 该战斗中没有指定玩家的结果
+        """
+        entries = self.encounters[self.order[position]]
+        if player is None:
+            return self.load(entries[0])
+        for entry in entries:
+            if entry[1] == player:
+                return self.load(entry)
+        raise KeyError(player)
+    
+    def __iter__(self):
+        """按文件顺序逐条读取，生成 (战斗序号, 结果)，只打开一次文件"""
+        with open(self.file_path, 'rb') as f:
+            for entry in self.index:
+                f.seek(entry[5])
+                yield entry[0], json.loads(f.read(entry[6]))["result"]
+    
+    def default_results(self):
+        """返回各场战斗默认结果的惰性列表"""
+        return LazyResults(self)
+
+class LazyResults:
+    """
+    各场战斗默认结果的惰性列表，可以代替 LogParser.results
+    取出某一场战斗时才从文件中读取。
+    """
+    
+    def __init__(self, reader):
+        self.reader = reader
+    
+    def __len__(self):
+        return self.reader.encounter_count()
+    
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return self.reader.get(position)
+    
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.reader.get(position)
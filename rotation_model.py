@@ -0,0 +1,305 @@
+"""
+输出循环模型
+按技能优先级、公共冷却（GCD）和各技能冷却时间模拟一场战斗的理想施法顺序，
+用蒙特卡洛方法加入反应延迟、暴击和伤害浮动，得到各技能的期望施放次数和 DPS 分布，
+代替检查列表中按固定间隔估计的施放次数。
+
+每次命中的伤害和暴击率取自玩家在该战斗中的实际数据，自动攻击次数也与实际相同，
+因此模型 DPS 与玩家 DPS 的差距只来自技能的施放时机。
+
+安装了 NumPy 时数千次模拟以数组同时推进（每一步对所有模拟做一次向量化运算），
+施法时间线由所有战斗共用，整晚的战斗只需模拟一次；
+未安装时只按平均反应延迟确定性地模拟一次，只提供期望施放次数。
+"""
+import zlib
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖
+    np = None
+
+# 是否可以使用向量化的蒙特卡洛模拟
+HAS_NUMPY = np is not None
+
+# 循环中的技能，按优先级排列：(技能, 冷却时间(秒), 暴击伤害倍数)
+ROTATION = [
+    ("审判", 10.0, 1.5),
+    ("神圣风暴", 10.0, 2.0),
+    ("十字军打击", 6.0, 2.0),
+    ("奉献", 8.0, 1.5)
+]
+# 自动攻击不占用公共冷却，次数取实际数据，没有数据时按武器速度估计
+WHITE_ATTACK = "白色攻击"
+WHITE_CRIT_MULTIPLIER = 2.0
+WEAPON_SPEED = 3.5
+# 公共冷却（秒）
+GCD = 1.5
+# 每次施放的平均反应延迟（秒），服从指数分布
+REACTION_DELAY = 0.2
+# 每次命中伤害的浮动比例（均匀分布 ±10%）
+DAMAGE_SPREAD = 0.1
+# 实际数据中没有命中时使用的每次命中伤害（未暴击）
+DEFAULT_DAMAGE = {
+    "审判": 1500,
+    "神圣风暴": 2000,
+    "十字军打击": 1800,
+    "奉献": 2500,
+    WHITE_ATTACK: 500
+}
+DEFAULT_CRIT_CHANCE = 0.25
+# 命中次数不少于该值时才使用实际的暴击率
+MIN_CRIT_SAMPLES = 20
+# 未安装 NumPy 时，施放次数不低于期望值的该比例即视为合格
+FALLBACK_TOLERANCE = 0.9
+# DPS 分布中保存的分位数
+QUANTILES = (0.1, 0.5, 0.9)
+
+def make_job(duration, ability_data):
+    """
+    根据战斗时长和玩家的技能数据生成模拟参数
+    
+    Args:
+        duration: 战斗时长（秒）
+        ability_data: 技能名 -> {"casts", "damage", "hits", "crits"}，与 LogParser.ability_data 结构相同
+    
+    Returns:
+        (时长, 暴击率, 各技能每次命中伤害的元组, 自动攻击次数)
+    """
+    hits = 0
+    crits = 0
+    damages = []
+    for ability, _, multiplier in ROTATION + [(WHITE_ATTACK, 0, WHITE_CRIT_MULTIPLIER)]:
+        data = ability_data.get(ability) or {}
+        hits += data.get("hits", 0)
+        crits += data.get("crits", 0)
+        # 实际伤害 = 每次命中伤害 * (命中次数 + 暴击次数 * (倍数 - 1))
+        weight = data.get("hits", 0) + data.get("crits", 0) * (multiplier - 1)
+        damages.append(round(data["damage"] / weight) if weight > 0 else DEFAULT_DAMAGE[ability])
+    
+    crit_chance = crits / hits if hits >= MIN_CRIT_SAMPLES else DEFAULT_CRIT_CHANCE
+    white_hits = (ability_data.get(WHITE_ATTACK) or {}).get("hits", 0) or int(duration / WEAPON_SPEED)
+    return (round(float(duration), 1), round(crit_chance, 3), tuple(damages), white_hits)
+
+def job_seed(job):
+    """由模拟参数得到固定的随机种子，同一场战斗每次分析的结果相同"""
+    return zlib.crc32(repr(job).encode('utf-8'))
+
+class CastTimeline:
+    """
+    共享的施法时间线
+    施放次数只取决于战斗时长，与伤害无关，因此所有战斗共用一组模拟：
+    iterations 次模拟同时推进，记录每个技能第 k 次施放在各模拟中的时间，
+    任意时长的战斗中的施放次数即为小于该时长的施放时间个数。
+    时间线按 CHUNK_SECONDS 分段延长，延长时从上次的状态继续，已有部分的结果不变；
+    超过 MAX_SECONDS 的战斗按施放频率外推，内存占用有上限。
+    """
+    
+    # 每次延长的模拟时长（秒）
+    CHUNK_SECONDS = 600
+    # 模拟的最长时长（秒）
+    MAX_SECONDS = 3600
+    
+    def __init__(self, iterations, reaction_delay, seed=0):
+        self.iterations = iterations
+        self.reaction_delay = reaction_delay
+        self.rng = np.random.default_rng(seed)
+        self.cooldowns = np.array([cooldown for _, cooldown, _ in ROTATION])
+        
+        self.now = self.rng.exponential(reaction_delay, iterations)
+        self.ready = np.zeros((len(ROTATION), iterations))
+        self.counts = np.zeros((len(ROTATION), iterations), dtype=np.int64)
+        self.horizon = 0
+        # 每个技能一个 (施放次序, 模拟次数) 的施放时间数组，未施放的位置为无穷大
+        self.cast_times = [np.empty((0, iterations), dtype=np.float32) for _ in ROTATION]
+    
+    def extend(self, duration):
+        """将时间线延长到至少 duration 秒"""
+        # 每次只延长一段，随机数的抽取顺序与延长的方式无关，同一场战斗的结果始终相同
+        while duration > self.horizon and self.horizon < self.MAX_SECONDS:
+            self.extend_chunk(min(self.horizon + self.CHUNK_SECONDS, self.MAX_SECONDS))
+    
+    def extend_chunk(self, target):
+        """将时间线延长到 target 秒"""
+        # 冷却时间限制了施放次数的上限，预先分配足够的行
+        for index, cooldown in enumerate(self.cooldowns):
+            rows = int(target / cooldown) + 2 - len(self.cast_times[index])
+            padding = np.full((rows, self.iterations), np.inf, dtype=np.float32)
+            self.cast_times[index] = np.vstack([self.cast_times[index], padding])
+        
+        rng = self.rng
+        columns = np.arange(self.iterations)
+        while self.now.min() < target:
+            # 已到达 target 的模拟暂停，下次延长时继续
+            active = self.now < target
+            available = self.ready <= self.now
+            has_ready = available.any(axis=0)
+            
+            # 按优先级施放第一个冷却完毕的技能，之后等待公共冷却
+            cast = columns[has_ready & active]
+            ability = available[:, cast].argmax(axis=0)
+            for index in range(len(ROTATION)):
+                selected = cast[ability == index]
+                self.cast_times[index][self.counts[index, selected], selected] = self.now[selected]
+            self.counts[ability, cast] += 1
+            self.ready[ability, cast] = self.now[cast] + self.cooldowns[ability]
+            self.now[cast] += GCD + rng.exponential(self.reaction_delay, len(cast))
+            
+            # 所有技能都在冷却中时等到最早冷却完毕的技能
+            idle = columns[~has_ready & active]
+            self.now[idle] = self.ready[:, idle].min(axis=0) + rng.exponential(self.reaction_delay, len(idle))
+        
+        self.horizon = target
+    
+    def casts(self, duration):
+        """返回时长为 duration 的战斗中各技能的施放次数 (技能数, 模拟次数)"""
+        self.extend(duration)
+        limit = min(duration, self.horizon)
+        casts = np.stack([
+            (times[:int(limit / cooldown) + 2] < limit).sum(axis=0)
+            for times, cooldown in zip(self.cast_times, self.cooldowns)
+        ])
+        if duration > limit:
+            casts = np.rint(casts * (duration / limit)).astype(np.int64)
+        return casts
+
+def simulate_vectorized(job, timeline):
+    """
+    用共享的施法时间线和 NumPy 向量化运算模拟一场战斗
+    
+    Returns:
+        (各技能施放次数 (技能数, 模拟次数), 每次模拟的 DPS)
+    """
+    duration, crit_chance, damages, white_hits = job
+    rng = np.random.default_rng(job_seed(job))
+    casts = timeline.casts(duration)
+    
+    multipliers = [multiplier for _, _, multiplier in ROTATION] + [WHITE_CRIT_MULTIPLIER]
+    counts = np.vstack([casts, np.full((1, timeline.iterations), white_hits, dtype=np.int64)])
+    crits = rng.binomial(counts, crit_chance)
+    # n 次命中的伤害浮动之和近似为正态分布，标准差为 单次标准差 * sqrt(n)
+    spread = rng.standard_normal(counts.shape) * (DAMAGE_SPREAD / np.sqrt(3)) * np.sqrt(counts)
+    base = np.array(damages, dtype=np.float64)[:, None]
+    damage = base * (counts + crits * (np.array(multipliers)[:, None] - 1) + spread)
+    return casts, damage.sum(axis=0) / duration
+
+def simulate_scalar(job, reaction_delay):
+    """
+    未安装 NumPy 时按平均反应延迟确定性地模拟一次
+    
+    Returns:
+        (各技能施放次数的列表, DPS)
+    """
+    duration, crit_chance, damages, white_hits = job
+    ready = [0.0] * len(ROTATION)
+    casts = [0] * len(ROTATION)
+    now = reaction_delay
+    while now < duration:
+        for index, (_, cooldown, _) in enumerate(ROTATION):
+            if ready[index] <= now:
+                casts[index] += 1
+                ready[index] = now + cooldown
+                now += GCD + reaction_delay
+                break
+        else:
+            now = min(ready) + reaction_delay
+    
+    multipliers = [multiplier for _, _, multiplier in ROTATION] + [WHITE_CRIT_MULTIPLIER]
+    counts = casts + [white_hits]
+    damage = sum(base * count * (1 + crit_chance * (multiplier - 1))
+                 for base, count, multiplier in zip(damages, counts, multipliers))
+    return casts, damage / duration
+
+class RotationModel:
+    """
+    输出循环模型
+    安装了 NumPy 时所有战斗共用一条 CastTimeline，第一次模拟时生成，之后每场战斗只需几毫秒。
+    模拟结果按模拟参数（make_job() 的返回值）缓存，同一结果反复显示时不再模拟；
+    界面线程和工作线程都可能调用 evaluate()，时间线和缓存由 lock 保护。
+    """
+    
+    # 每场战斗的模拟次数
+    DEFAULT_ITERATIONS = 2000
+    # 缓存的模拟结果数上限，超过时清空
+    CACHE_SIZE = 256
+    
+    def __init__(self, iterations=DEFAULT_ITERATIONS, reaction_delay=REACTION_DELAY):
+        """
+        Args:
+            iterations: 蒙特卡洛模拟次数（未安装 NumPy 时不使用）
+            reaction_delay: 每次施放的平均反应延迟（秒）
+        """
+        self.iterations = iterations
+        self.reaction_delay = reaction_delay
+        self.timeline = None
+        # 模拟参数 -> (模型结果（不含 percentile）, 排序后的 DPS 样本；未安装 NumPy 时为 None)
+        self.cache = {}
+        self.lock = threading.Lock()
+    
+    def evaluate(self, duration, ability_data, dps=None):
+        """
+        模拟一场战斗，返回期望施放次数和 DPS 分布
+        
+        Args:
+            duration: 战斗时长（秒）
+            ability_data: 玩家的技能数据（技能名 -> {"casts", "damage", "hits", "crits"}）
+            dps: 玩家的实际 DPS，不为 None 时计算其在模拟分布中的百分位
+        
+        Returns:
+            {"iterations", "expectedCasts", "minCasts", "dps", "percentile"}：
+            expectedCasts 为各技能的平均施放次数，minCasts 为合格的最低施放次数（模拟的第10百分位），
+            dps 为 {"mean", "p10", "p50", "p90"}（未安装 NumPy 时只有 mean），
+            percentile 为实际 DPS 超过的模拟比例（无法计算时为 None）；战斗时长为0时返回 None
+        """
+        if duration <= 0:
+            return None
+        summary, dps_samples = self.simulate(make_job(duration, ability_data))
+        
+        model = {name: dict(value) if isinstance(value, dict) else value for name, value in summary.items()}
+        model["percentile"] = None
+        if dps is not None and dps_samples is not None:
+            model["percentile"] = float(np.searchsorted(dps_samples, dps) / len(dps_samples))
+        return model
+    
+    def simulate(self, job):
+        """
+        模拟参数相同的战斗只模拟一次
+        
+        Returns:
+            (模型结果（不含 percentile）, 排序后的 DPS 样本；未安装 NumPy 时为 None)
+        """
+        with self.lock:
+            simulated = self.cache.get(job)
+            if simulated is None:
+                if len(self.cache) >= self.CACHE_SIZE:
+                    self.cache.clear()
+                simulated = self.cache[job] = self.run(job)
+            return simulated
+    
+    def run(self, job):
+        """执行一次模拟，返回值与 simulate() 相同"""
+        names = [ability for ability, _, _ in ROTATION]
+        
+        if np is None:
+            casts, mean_dps = simulate_scalar(job, self.reaction_delay)
+            return {
+                "iterations": 1,
+                "expectedCasts": dict(zip(names, casts)),
+                "minCasts": {name: int(count * FALLBACK_TOLERANCE) for name, count in zip(names, casts)},
+                "dps": {"mean": mean_dps}
+            }, None
+        
+        if self.timeline is None:
+            self.timeline = CastTimeline(self.iterations, self.reaction_delay)
+        casts, dps_samples = simulate_vectorized(job, self.timeline)
+        dps_samples.sort()
+        
+        summary = {"mean": float(dps_samples.mean())}
+        for quantile in QUANTILES:
+            summary[f"p{int(quantile * 100)}"] = float(np.quantile(dps_samples, quantile))
+        return {
+            "iterations": self.iterations,
+            "expectedCasts": dict(zip(names, casts.mean(axis=1).tolist())),
+            "minCasts": dict(zip(names, np.percentile(casts, 10, axis=1).astype(int).tolist())),
+            "dps": summary
+        }, dps_samples
@@ -0,0 +1,150 @@
+"""
+基于 SQLite 的 LRU 缓存（ParseCache 和 ResponseCache 的公共部分）
+值序列化为 JSON 后压缩保存，每条记录其大小和最近访问时间；
+缓存总大小超过上限时按最近最少使用（LRU）的顺序淘汰。
+"""
+import os
+import json
+import time
+import zlib
+import sqlite3
+from contextlib import contextmanager
+
+def encode_value(value):
+    """将可以序列化为 JSON 的值压缩为保存在数据库中的二进制内容"""
+    return zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+
+def decode_value(blob):
+    """encode_value() 的逆操作"""
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+class SQLiteCache:
+    """
+    SQLite LRU 缓存的基类
+    子类通过 TABLE 和 SCHEMA 指定表名和建表语句，表中必须有 key、value、size、last_access 四列，
+    其他列（如日志路径、报告ID）由子类在 store() 时传入。
+    """
+    
+    # 表名和建表（含索引）语句，由子类指定
+    TABLE = None
+    SCHEMA = ()
+    # 默认的缓存大小上限
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+    
+    def __init__(self, path, max_bytes=None):
+        """
+        Args:
+            path: SQLite 数据库文件路径
+            max_bytes: 缓存内容的总大小上限（字节），None 表示 DEFAULT_MAX_BYTES
+        """
+        self.path = path
+        self.max_bytes = self.DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        
+        # 本次运行的命中和未命中次数
+        self.hits = 0
+        self.misses = 0
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with self.connect() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+    
+    @contextmanager
+    def connect(self):
+        """打开数据库连接并在事务结束后关闭（每次操作单独连接，可以在多个线程中使用）"""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def expire(self, conn, now):
+        """删除已过期的条目；默认条目不会过期"""
+    
+    def remove(self, conn, key):
+        """删除一条条目，子类可以同时删除条目对应的其他文件"""
+        conn.execute(f"DELETE FROM {self.TABLE} WHERE key = ?", (key,))
+    
+    def get(self, key):
+        """
+        读取缓存并更新最近访问时间
+        
+        Returns:
+            缓存的值；未命中（或已过期）时返回 None
+        """
+        now = time.time()
+        with self.connect() as conn:
+            self.expire(conn, now)
+            row = conn.execute(f"SELECT value FROM {self.TABLE} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute(f"UPDATE {self.TABLE} SET last_access = ? WHERE key = ?", (now, key))
+        
+        self.hits += 1
+        return decode_value(row[0])
+    
+    def touch(self, key):
+        """
+        只更新最近访问时间，不读取值
+        
+        Returns:
+            条目是否存在
+        """
+        with self.connect() as conn:
+            cursor = conn.execute(f"UPDATE {self.TABLE} SET last_access = ? WHERE key = ?", (time.time(), key))
+            return cursor.rowcount > 0
+    
+    def store(self, conn, key, value, columns=None, extra_bytes=0):
+        """
+        在 conn 的事务中写入一条条目，必要时淘汰最久未使用的条目
+        
+        Args:
+            key: 缓存键
+            value: 可以序列化为 JSON 的值
+            columns: 子类表中其他列的值（列名 -> 值）
+            extra_bytes: 条目在数据库之外占用的大小（如附属文件），计入总大小
+        
+        Returns:
+            是否写入；单条超过大小上限时不写入
+        """
+        blob = encode_value(value)
+        size = len(blob) + extra_bytes
+        if size > self.max_bytes:
+            return False
+        
+        row = dict(columns or {})
+        row.update(key=key, value=blob, size=size, last_access=time.time())
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.TABLE} ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+            tuple(row.values())
+        )
+        self.evict(conn)
+        return True
+    
+    def evict(self, conn):
+        """删除过期条目，再按最近最少使用的顺序删除，直到总大小不超过上限"""
+        self.expire(conn, time.time())
+        total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.TABLE}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        for key, size in conn.execute(f"SELECT key, size FROM {self.TABLE} ORDER BY last_access").fetchall():
+            self.remove(conn, key)
+            total -= size
+            if total <= self.max_bytes:
+                break
+    
+    def total_bytes(self):
+        """返回缓存内容的总大小（字节）"""
+        with self.connect() as conn:
+            return conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.TABLE}").fetchone()[0]
+    
+    def clear(self):
+        """清空缓存"""
+        with self.connect() as conn:
+            conn.execute(f"DELETE FROM {self.TABLE}")
@@ -0,0 +1,83 @@
+"""
+SQLite LRU 缓存的测试：按最近最少使用淘汰、响应缓存过期，以及解析缓存淘汰时删除事件表附属文件
+"""
+import os
+import shutil
+
+import pytest
+
+from parse_cache import ParseCache, directory_size
+from response_cache import ResponseCache
+from log_parser import LogParser
+from event_store import HAS_NUMPY
+
+EXAMPLE_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example_log.txt")
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / "wcl.sqlite3"))
+    for key in ("a", "b", "c"):
+        cache.put(key, {"key": key, "data": "x" * 100}, "R")
+    size = cache.total_bytes() // 3
+    # 读取 a 后 b 成为最久未使用的条目
+    assert cache.get("a")["key"] == "a"
+    cache.max_bytes = size * 3
+    cache.put("d", {"key": "d", "data": "x" * 100}, "R")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None and cache.get("d") is not None
+    assert cache.total_bytes() <= cache.max_bytes
+
+def test_response_cache_expired_entries_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path / "wcl.sqlite3"))
+    cache.put("live", {"value": 1}, "R", ttl=-1)
+    cache.put("done", {"value": 2}, "R")
+    assert cache.get("live") is None
+    assert cache.get("done") == {"value": 2}
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.clear("R")
+    assert cache.total_bytes() == 0
+
+def test_parse_cache_hit_after_put(tmp_path):
+    log = str(tmp_path / "a.txt")
+    shutil.copy(EXAMPLE_LOG, log)
+    cache = ParseCache(str(tmp_path / "cache" / "parse.sqlite3"))
+    first = LogParser(cache=cache).parse_encounters(log)
+    assert cache.misses == 1
+    second = LogParser(cache=cache).parse_encounters(log)
+    assert cache.hits == 1
+    assert [result["totalDamage"] for result in second] == [result["totalDamage"] for result in first]
+
+@pytest.mark.skipif(not HAS_NUMPY, reason="事件表需要 numpy")
+def test_parse_cache_eviction_removes_sidecar(tmp_path):
+    paths = []
+    for name in ("a.txt", "b.txt"):
+        path = str(tmp_path / name)
+        shutil.copy(EXAMPLE_LOG, path)
+        paths.append(path)
+    cache = ParseCache(str(tmp_path / "cache" / "parse.sqlite3"))
+    
+    LogParser(cache=cache, keep_events=True).parse_encounters(paths[0])
+    sidecar = cache.sidecar_dir(paths[0])
+    assert os.path.isdir(sidecar)
+    # 附属文件的大小计入缓存条目
+    assert cache.total_bytes() > directory_size(sidecar)
+    
+    cache.max_bytes = cache.total_bytes() * 3 // 2
+    LogParser(cache=cache, keep_events=True).parse_encounters(paths[1])
+    assert not os.path.exists(sidecar)
+    assert os.path.isdir(cache.sidecar_dir(paths[1]))
+    assert cache.total_bytes() <= cache.max_bytes
+
+@pytest.mark.skipif(not HAS_NUMPY, reason="事件表需要 numpy")
+def test_untracked_sidecar_registered_on_load(tmp_path):
+    log = str(tmp_path / "a.txt")
+    shutil.copy(EXAMPLE_LOG, log)
+    cache = ParseCache(str(tmp_path / "cache" / "parse.sqlite3"))
+    LogParser(cache=cache, keep_events=True).parse_encounters(log)
+    # 模拟旧版本只保存了附属文件、没有缓存条目
+    with cache.connect() as conn:
+        conn.execute("DELETE FROM entries")
+    
+    parser = LogParser(cache=cache, keep_events=True)
+    parser.parse_encounters(log)
+    assert parser.event_table is not None
+    assert cache.total_bytes() > directory_size(cache.sidecar_dir(log))
@@ -0,0 +1,105 @@
+"""
+客户端战斗日志（WoWCombatLog.txt）的测试：格式识别、按引号切分字段、法术伤害与近战伤害、暴击标记、
+日志版本 20 起的 baseAmount 字段，以及未知事件和非玩家事件
+"""
+import pytest
+
+from combat_log import CombatLogReader, is_combat_log
+from log_parser import LogParser, LOG_FORMAT_COMBAT_LOG
+
+PLAYER = 'Player-4395-0A1B2C3D,"光明使者",0x511,0x0'
+BOSS = 'Creature-0-4395-249-1234-10184-00001A2B3C,"奥妮克希亚",0x10a48,0x0'
+# 20:15:32 的秒数
+SECOND = 20 * 3600 + 15 * 60 + 32
+
+SAMPLE_LOG = [
+    '10/18 20:15:30.000  COMBAT_LOG_VERSION,9,ADVANCED_LOG_ENABLED,0,BUILD_VERSION,3.4.3,PROJECT_ID,11',
+    '10/18 20:15:31.000  ENCOUNTER_START,1084,"奥妮克希亚",9,25,249',
+    f'10/18 20:15:32.000  SPELL_CAST_SUCCESS,{PLAYER},{BOSS},35395,"十字军打击",0x2',
+    f'10/18 20:15:32.250  SPELL_DAMAGE,{PLAYER},{BOSS},35395,"十字军打击",0x2,2200,-1,2,0,0,0,1,nil,nil,nil',
+    f'10/18 20:15:33.000  SWING_DAMAGE,{PLAYER},{BOSS},800,-1,1,0,0,0,nil,nil,nil,nil',
+    f'10/18 20:15:34.000  SWING_MISSED,{PLAYER},{BOSS},DODGE,nil',
+    f'10/18 20:15:35.000  SPELL_AURA_APPLIED,{PLAYER},{PLAYER},20375,"命令圣印",0x2,BUFF',
+    f'10/18 20:15:36.000  SPELL_DAMAGE,{BOSS},{PLAYER},18435,"烈焰吐息",0x4,3000,-1,4,0,0,0,nil,nil,nil,nil',
+    '10/18 20:15:40.000  ENCOUNTER_END,1084,"奥妮克希亚",9,25,1'
+]
+
+def read_events(lines, version=None):
+    parser = LogParser()
+    reader = CombatLogReader(
+        parser.timestamp_decoder, parser.ability_lookup, parser.spell_lookup, parser.paladin_abilities,
+        version=version
+    )
+    return list(reader.iter_events(lines))
+
+def test_detect_combat_log():
+    assert is_combat_log("\ufeff" + "\n".join(SAMPLE_LOG)) == (True, 9)
+    assert is_combat_log("[20:00:00] 战斗开始\n") == (False, None)
+
+def test_events_from_sample_log():
+    assert read_events(SAMPLE_LOG) == [
+        ("start", SECOND - 1),
+        ("boss", "奥妮克希亚", SECOND - 1),
+        ("line", SECOND, "光明使者", "十字军打击", "奥妮克希亚", None, False),
+        # 法术伤害只记命中，critical 字段为 1 时为暴击
+        ("hit", SECOND + 0.25, "光明使者", "十字军打击", "奥妮克希亚", 2200, True),
+        # 近战挥砍同时记为施放和命中，未命中的挥砍没有伤害
+        ("line", SECOND + 1, "光明使者", "白色攻击", "奥妮克希亚", 800, False),
+        ("line", SECOND + 2, "光明使者", "白色攻击", "奥妮克希亚", None, False),
+        # 未知事件和非玩家的事件只用于记录时间
+        ("line", SECOND + 3, None, None, None, None, False),
+        ("line", SECOND + 4, None, None, None, None, False),
+        ("end", SECOND + 8)
+    ]
+
+def test_quoted_names_with_commas():
+    events = read_events([
+        f'10/18 20:15:32.000  SPELL_DAMAGE,Player-4395-0A1B2C3D,"光明使者,奥罗",0x511,0x0,'
+        f'{BOSS},20187,"审判",0x2,1500,-1,2,0,0,0,nil,nil,nil,nil',
+        f'10/18 20:15:33.000  SWING_DAMAGE,{PLAYER},Creature-0-1-1-1-1-1,"奥妮克希亚,龙后",0x10a48,0x0,'
+        '700,-1,1,0,0,0,1,nil,nil,nil'
+    ])
+    assert events == [
+        ("hit", SECOND, "光明使者,奥罗", "审判", "奥妮克希亚", 1500, False),
+        ("line", SECOND + 1, "光明使者", "白色攻击", "奥妮克希亚,龙后", 700, True)
+    ]
+
+def test_unknown_spell_id_matched_by_name():
+    events = read_events([
+        # 没有目标的施放
+        f'10/18 20:15:32.000  SPELL_CAST_SUCCESS,{PLAYER},0000000000000000,nil,0x80000000,0x80000000,'
+        '99999,"奉献",0x2',
+        f'10/18 20:15:33.000  SPELL_CAST_SUCCESS,{PLAYER},{BOSS},99998,"火球术",0x4'
+    ])
+    assert events == [
+        ("line", SECOND, "光明使者", "奉献", None, None, False),
+        ("line", SECOND + 1, None, None, None, None, False)
+    ]
+
+@pytest.mark.parametrize("version, suffix", [
+    (9, "2200,-1,2,0,0,0,1,nil,nil,nil"),
+    # 日志版本 20 起 amount 之后多一个 baseAmount 字段
+    (20, "2200,2000,-1,2,0,0,0,1,nil,nil,nil")
+])
+def test_damage_fields_located_from_line_end(version, suffix):
+    line = f'10/18 20:15:32.000  SPELL_DAMAGE,{PLAYER},{BOSS},35395,"十字军打击",0x2,{suffix}'
+    assert read_events([line], version) == [("hit", SECOND, "光明使者", "十字军打击", "奥妮克希亚", 2200, True)]
+    
+    # 版本也可以由日志中的 COMBAT_LOG_VERSION 行设定
+    header = f'10/18 20:15:30.000  COMBAT_LOG_VERSION,{version},ADVANCED_LOG_ENABLED,0'
+    assert read_events([header, line])[-1][5] == 2200
+
+def test_parse_combat_log_file(tmp_path):
+    log = tmp_path / "WoWCombatLog.txt"
+    log.write_text("\n".join(SAMPLE_LOG) + "\n", encoding="utf-8")
+    
+    parser = LogParser()
+    result = parser.parse_file(str(log))
+    assert parser.log_format == LOG_FORMAT_COMBAT_LOG
+    assert result["player"] == "光明使者"
+    assert result["boss"] == "奥妮克希亚"
+    assert result["duration"] == 9
+    assert result["totalDamage"] == 3000
+    abilities = {ability["name"]: ability for ability in result["abilities"]}
+    assert (abilities["十字军打击"]["casts"], abilities["十字军打击"]["hits"]) == (1, 1)
+    assert (abilities["白色攻击"]["casts"], abilities["白色攻击"]["hits"]) == (2, 1)
@@ -0,0 +1,116 @@
+"""
+压缩日志的测试：按魔数识别压缩格式，gzip、bzip2、xz、zip 和多成员 BGZF 文件经 LogParser.parse_file()
+解析的结果与未压缩的日志相同，BGZF 文件由多个线程分批并行解压
+"""
+import os
+import bz2
+import gzip
+import lzma
+import zlib
+import struct
+import zipfile
+
+import pytest
+
+import compressed_input
+from compressed_input import (
+    detect_compression, bgzf_members, open_decompressed,
+    COMPRESSION_GZIP, COMPRESSION_BZIP2, COMPRESSION_XZ, COMPRESSION_ZIP
+)
+from log_parser import LogParser
+
+EXAMPLE_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example_log.txt")
+
+def bgzf_member(data):
+    """生成一个 BGZF 成员：额外字段中的 "BC" 子字段记录成员总长度减一"""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    # 头部(12) + 额外字段(6) + 压缩数据 + CRC 和长度(8)
+    size = 12 + 6 + len(deflated) + 8
+    extra = b"BC" + struct.pack("<HH", 2, size - 1)
+    header = struct.pack("<2sBBIBBH", b"\x1f\x8b", 8, 4, 0, 0, 255, len(extra))
+    return header + extra + deflated + struct.pack("<II", zlib.crc32(data), len(data))
+
+def write_bgzf(path, data, block_size):
+    """按 block_size 字节切分为多个成员，末尾与 bgzip 一样追加一个空成员"""
+    blocks = [data[i:i + block_size] for i in range(0, len(data), block_size)] + [b""]
+    with open(path, 'wb') as f:
+        for block in blocks:
+            f.write(bgzf_member(block))
+    return len(blocks)
+
+def write_compressed(path, data, compression):
+    if compression == COMPRESSION_ZIP:
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("raid.txt", data)
+        return
+    compress = {COMPRESSION_GZIP: gzip.compress, COMPRESSION_BZIP2: bz2.compress, COMPRESSION_XZ: lzma.compress}
+    with open(path, 'wb') as f:
+        f.write(compress[compression](data))
+
+def parse_snapshot(path, workers=1):
+    """解析日志，返回可以直接比较的各场战斗的聚合数据和所有玩家的结果"""
+    parser = LogParser()
+    parser.parse_file(str(path), workers=workers)
+    return {
+        "encounters": [encounter.to_dict() for encounter in parser.encounters],
+        "players": [
+            [parser.get_player_report(actor, index) for actor in parser.get_actors(index)]
+            for index in range(len(parser.encounters))
+        ]
+    }
+
+@pytest.fixture(scope="module")
+def plain():
+    with open(EXAMPLE_LOG, 'rb') as f:
+        data = f.read()
+    return data, parse_snapshot(EXAMPLE_LOG)
+
+@pytest.mark.parametrize("compression", [COMPRESSION_GZIP, COMPRESSION_BZIP2, COMPRESSION_XZ, COMPRESSION_ZIP])
+def test_compressed_log_matches_plain(tmp_path, plain, compression):
+    data, expected = plain
+    path = tmp_path / "raid.log"
+    write_compressed(str(path), data, compression)
+    
+    assert detect_compression(str(path)) == compression
+    assert parse_snapshot(path) == expected
+
+def test_plain_log_not_detected_as_compressed():
+    assert detect_compression(EXAMPLE_LOG) is None
+
+def test_multi_member_gzip_without_lengths(tmp_path, plain):
+    # 普通的多成员 gzip 文件没有成员长度记录，不能并行解压，按顺序解压所有成员
+    data, expected = plain
+    path = tmp_path / "raid.log.gz"
+    middle = len(data) // 2
+    path.write_bytes(gzip.compress(data[:middle]) + gzip.compress(data[middle:]))
+    
+    with open(path, 'rb') as f:
+        assert bgzf_members(f) is None
+    assert parse_snapshot(path, workers=4) == expected
+
+def test_bgzf_decompressed_in_parallel(tmp_path, plain, monkeypatch):
+    data, expected = plain
+    path = tmp_path / "raid.log.gz"
+    count = write_bgzf(str(path), data, 256)
+    with open(path, 'rb') as f:
+        members = bgzf_members(f)
+    assert len(members) == count
+    assert sum(length for _, length in members) == path.stat().st_size
+    
+    # 每批约 1KB 的压缩数据，分为多个并行解压任务
+    batches = []
+    decompress = compressed_input.decompress_members
+    monkeypatch.setattr(compressed_input, "BGZF_BATCH_BYTES", 1024)
+    monkeypatch.setattr(compressed_input, "decompress_members",
+                        lambda chunk, lengths: batches.append(len(lengths)) or decompress(chunk, lengths))
+    
+    with open_decompressed(str(path), COMPRESSION_GZIP, workers=4) as (stream, _):
+        assert stream.read() == data
+    assert len(batches) > 1 and sum(batches) == count
+    
+    batches.clear()
+    assert parse_snapshot(path, workers=4) == expected
+    assert len(batches) > 1
+    # 单线程时按普通 gzip 顺序解压
+    assert parse_snapshot(path) == expected
@@ -0,0 +1,161 @@
+"""
+事件表和前缀和时间索引的测试：每条事件 24 字节的紧凑列和名称驻留、附属文件的保存与内存映射加载，
+窗口边界上的事件、相邻窗口之和、空窗口，与逐条筛选事件的结果比较，以及 LogParser.get_window_report()
+"""
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from event_store import EventTableBuilder, EventTable, TimeIndex, NO_DAMAGE, MAX_AMOUNT
+from log_parser import LogParser
+
+START = 100.0
+END = 110.0
+EVENTS = [
+    # (时间, 施放者, 技能, 目标, 伤害, 暴击, 是否计为施放)
+    (100.0, "光明使者", "审判", "奥妮克希亚", 1000, True, True),
+    (102.5, "光明使者", "十字军打击", "奥妮克希亚", 2000, False, True),
+    (103.0, "圣光之锤", "十字军打击", "奥妮克希亚", 9000, False, True),
+    (104.0, "光明使者", "圣光术", "光明使者", None, False, True),
+    (105.0, "光明使者", "十字军打击", "奥妮克希亚", 3000, True, True),
+    # 只计命中不计施放
+    (107.0, "光明使者", "奉献", "奥妮克希亚", 500, False, False),
+    # 战斗结束时刻的事件
+    (110.0, "光明使者", "奉献", "奥妮克希亚", 400, True, True)
+]
+
+@pytest.fixture
+def time_index():
+    builder = EventTableBuilder()
+    for event in EVENTS:
+        builder.append(*event)
+    table = builder.build([len(EVENTS)])
+    return TimeIndex(table, table.encounter_rows(0), START, END)
+
+def brute_force(start, end, actor=None, until_end=False):
+    """逐条筛选 [start, end) 内的事件（相对战斗开始的秒数）"""
+    stats = {"casts": 0, "damage": 0, "hits": 0, "crits": 0}
+    for time, event_actor, _, _, damage, crit, cast in EVENTS:
+        offset = time - START
+        if not (start <= offset < end or (until_end and offset == end)):
+            continue
+        if actor is not None and event_actor != actor:
+            continue
+        stats["casts"] += cast
+        if damage is not None:
+            stats["damage"] += damage
+            stats["hits"] += 1
+            stats["crits"] += crit
+    return stats
+
+def test_window_boundaries(time_index):
+    # 开始边界上的事件计入窗口，结束边界上的不计入
+    first = time_index.window(0, 5, "光明使者")
+    assert (first["damage"], first["casts"], first["hits"], first["crits"]) == (3000, 3, 2, 1)
+    assert (first["start"], first["end"], first["duration"]) == (0, 5, 5)
+    assert first["dps"] == 600
+    assert first["critRate"] == 0.5
+    
+    # 结束时间达到战斗时长时包括战斗结束时刻的事件
+    second = time_index.window(5, 10, "光明使者")
+    assert (second["damage"], second["casts"], second["hits"], second["crits"]) == (3900, 2, 3, 2)
+    
+    whole = time_index.window(0, 10, "光明使者")
+    for field in TimeIndex.FIELDS:
+        assert whole[field] == first[field] + second[field]
+    assert time_index.window(0, 10)["damage"] == whole["damage"] + 9000
+
+def test_window_bounds_rounded_to_buckets(time_index):
+    # 边界按最近的桶边界取整：2.4 -> 2，4.6 -> 5
+    stats = time_index.window(2.4, 4.6, "光明使者")
+    assert (stats["start"], stats["end"]) == (2, 5)
+    assert stats["damage"] == 2000
+
+@pytest.mark.parametrize("start, end", [(3, 3), (6, 4), (20, 30), (-5, 0)])
+def test_empty_window(time_index, start, end):
+    stats = time_index.window(start, end, "光明使者")
+    assert (stats["damage"], stats["casts"], stats["hits"], stats["crits"]) == (0, 0, 0, 0)
+    assert stats["duration"] == 0
+    assert stats["dps"] == 0 and stats["critRate"] == 0
+    assert time_index.ability_stats(start, end, "光明使者") == {}
+
+def test_window_filters(time_index):
+    assert time_index.window(0, 10, ability="十字军打击")["damage"] == 14000
+    assert time_index.window(0, 10, "圣光之锤", "审判")["damage"] == 0
+    
+    stats = time_index.ability_stats(0, 10, "光明使者")
+    assert stats["奉献"] == {"name": "奉献", "casts": 1, "damage": 900, "crits": 1, "hits": 2}
+    # 非伤害技能只计施放次数
+    assert stats["圣光术"] == {"name": "圣光术", "casts": 1, "damage": 0, "crits": 0, "hits": 0}
+
+def test_windows_match_brute_force(time_index):
+    rng = random.Random(3)
+    for _ in range(50):
+        start = rng.randint(0, 10)
+        end = rng.randint(start, 10)
+        for actor in (None, "光明使者", "圣光之锤"):
+            stats = time_index.window(start, end, actor)
+            expected = brute_force(start, end, actor, until_end=end == 10)
+            assert {field: stats[field] for field in TimeIndex.FIELDS} == expected
+
+def test_no_damage_column_value():
+    builder = EventTableBuilder()
+    builder.append(1.0, "光明使者", "圣光术", "光明使者", None, True)
+    table = builder.build([1])
+    assert table.amount[0] == NO_DAMAGE
+    assert not table.crit[0]
+
+def test_compact_columns_and_interned_names(tmp_path):
+    builder = EventTableBuilder()
+    for event in EVENTS:
+        builder.append(*event)
+    # 超出 32 位范围的伤害（只可能来自损坏的日志）按上限记录
+    builder.append(111.0, "光明使者", "审判", "奥妮克希亚", 2 ** 40, False)
+    assert builder.nbytes() == 24 * len(builder)
+    
+    table = builder.build([len(builder)])
+    assert table.nbytes() == 24 * len(table)
+    assert table.amount[-1] == MAX_AMOUNT
+    # 相同的名称只保存一次，各行只记录符号 ID
+    assert len(table.actors) == 2 and len(table.targets) == 2
+    assert table.actor.tolist().count(table.actors.get("光明使者")) == 7
+    
+    table.save(str(tmp_path / "events"), {"version": 1})
+    loaded, meta = EventTable.load(str(tmp_path / "events"))
+    assert meta == {"version": 1}
+    assert loaded.nbytes() == table.nbytes()
+    assert loaded.actors.names == table.actors.names
+    for column in EventTable.COLUMNS:
+        assert getattr(loaded, column).tolist() == getattr(table, column).tolist()
+
+def test_window_report(tmp_path):
+    log = tmp_path / "raid.txt"
+    log.write_text("\n".join([
+        "[20:00:00] 战斗开始",
+        "[20:00:00] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1000 点伤害",
+        "[20:00:03] 光明使者 使用了 十字军打击 对 奥妮克希亚 造成了 2000 点伤害 (暴击)",
+        "[20:00:05] 光明使者 使用了 十字军打击 对 奥妮克希亚 造成了 3000 点伤害",
+        "[20:00:10] 战斗结束"
+    ]), encoding="utf-8")
+    
+    parser = LogParser(keep_events=True)
+    parser.parse_file(str(log))
+    report = parser.get_window_report("光明使者", 0, 5)
+    assert report["duration"] == 5
+    assert report["totalDamage"] == 3000
+    assert report["critRate"] == 0.5
+    assert report["checklist"]
+    
+    late = parser.get_window_report("光明使者", 5, 10)
+    assert late["totalDamage"] == 3000
+    
+    empty = parser.get_window_report("光明使者", 6, 9)
+    assert empty["totalDamage"] == 0 and empty["abilities"] == []
+    assert parser.get_window_stats(6, 9)["damage"] == 0
+    
+    # 没有事件表时不能按时间窗口统计
+    plain = LogParser()
+    plain.parse_file(str(log))
+    assert plain.get_window_report("光明使者", 0, 5) is None
@@ -0,0 +1,466 @@
+"""
+log_parser 的回归测试：时间戳解码、文本日志分词、战斗分段、按 (施放者, 技能) 聚合，以及并行解析与单进程解析的结果一致
+"""
+import os
+import random
+import threading
+
+import pytest
+
+import log_parser
+from log_parser import LogParser, EncounterSegmenter, TimestampDecoder, SECONDS_PER_DAY
+from result_stream import ResultStreamReader, ResultStreamWriter
+
+def segment(lines, idle_gap=30):
+    """对文本日志行做单遍分段，返回 Encounter 列表"""
+    parser = LogParser(idle_gap)
+    segmenter = EncounterSegmenter(idle_gap)
+    segmenter.feed(parser.iter_events(lines))
+    return segmenter.finish()
+
+def test_decode_whole_and_fractional_seconds():
+    decoder = TimestampDecoder()
+    assert decoder.decode("12:30:15") == 12 * 3600 + 30 * 60 + 15
+    assert decoder.decode("12:30:15.250") == 12 * 3600 + 30 * 60 + 15.25
+    assert decoder.first_seconds == 12 * 3600 + 30 * 60 + 15
+
+def test_decode_midnight_rollover():
+    decoder = TimestampDecoder()
+    assert decoder.decode("23:59:59") == 86399
+    assert decoder.decode("00:00:01") == SECONDS_PER_DAY + 1
+    # 跨日后的时间继续累加，再次跨越午夜时再加一天
+    assert decoder.decode("12:00:00") == SECONDS_PER_DAY + 43200
+    assert decoder.decode("23:59:00") == SECONDS_PER_DAY + 86340
+    assert decoder.decode("00:00:00") == 2 * SECONDS_PER_DAY
+    assert decoder.day_offset == 2 * SECONDS_PER_DAY
+
+def test_decode_small_step_back_is_not_rollover():
+    # 同一秒内乱序或时钟微调造成的小幅倒退不视为跨越午夜
+    decoder = TimestampDecoder()
+    decoder.decode("12:00:05")
+    assert decoder.decode("12:00:04") == 43204
+    assert decoder.day_offset == 0
+
+def test_decode_cache_is_bounded_and_reset():
+    decoder = TimestampDecoder()
+    for second in range(TimestampDecoder.CACHE_SIZE + 10):
+        decoder.seconds_of_day(f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}")
+    assert len(decoder.cache) <= TimestampDecoder.CACHE_SIZE
+    
+    decoder.decode("23:00:00")
+    decoder.decode("01:00:00")
+    decoder.reset()
+    assert decoder.day_offset == 0
+    assert decoder.cache == {}
+    assert decoder.decode("01:00:00") == 3600
+
+def test_segment_by_start_and_end_markers():
+    encounters = segment([
+        "[20:00:00] 战斗开始",
+        "[20:00:00] 玩家：光明使者 进入战斗",
+        "[20:00:00] 目标：奥妮克希亚 进入战斗",
+        "[20:00:05] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1500 点伤害",
+        "[20:01:00] 战斗结束",
+        "[20:01:10] 战斗开始",
+        "[20:01:10] 目标：拉格纳罗斯 进入战斗",
+        "[20:01:12] 光明使者 使用了 十字军打击 对 拉格纳罗斯 造成了 2000 点伤害",
+        "[20:02:10] 战斗结束"
+    ])
+    assert [(e.boss, e.start_time, e.end_time, e.closed_by) for e in encounters] == [
+        ("奥妮克希亚", 72000, 72060, "end"),
+        ("拉格纳罗斯", 72070, 72130, "end")
+    ]
+    # 第二场战斗没有玩家信息，沿用上一场
+    assert [e.player for e in encounters] == ["光明使者", "光明使者"]
+
+def test_segment_by_idle_gap():
+    encounters = segment([
+        "[20:00:00] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1500 点伤害",
+        "[20:00:20] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1500 点伤害",
+        # 空闲 31 秒，超过 idle_gap
+        "[20:00:51] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1500 点伤害"
+    ])
+    assert [(e.start_time, e.end_time, e.casts) for e in encounters] == [(72000, 72020, 2), (72051, 72051, 1)]
+    assert encounters[0].closed_by == "gap"
+
+def test_segment_drops_idle_fragments_between_encounters():
+    encounters = segment([
+        "[20:00:00] 战斗开始",
+        "[20:00:01] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1500 点伤害",
+        "[20:00:10] 战斗结束",
+        "[20:00:30] 光明使者 使用了 圣光术",
+        "[20:05:00] 其他信息",
+        "[20:05:00] 战斗开始",
+        "[20:05:01] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1500 点伤害",
+        "[20:05:10] 战斗结束"
+    ])
+    # 战斗之间零散的施法单独成为一场，没有技能事件的间隙被丢弃
+    assert [e.casts for e in encounters] == [1, 1, 1]
+    assert encounters[2].start_time == 72300
+
+def test_segment_without_events_returns_one_empty_encounter():
+    encounters = segment(["没有时间戳的说明文字", "[20:00:00] 战斗开始", "[20:01:00] 战斗结束"])
+    assert len(encounters) == 1
+    assert encounters[0].casts == 0
+    assert encounters[0].actor_data == {}
+
+def test_segment_across_midnight_keeps_duration():
+    encounters = segment([
+        "[23:59:50] 战斗开始",
+        "[23:59:55] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1500 点伤害",
+        "[00:00:05] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1500 点伤害",
+        "[00:00:10] 战斗结束"
+    ])
+    assert len(encounters) == 1
+    assert encounters[0].end_time - encounters[0].start_time == 20
+
+def test_aggregate_every_actor_in_one_pass(tmp_path):
+    log = tmp_path / "raid.txt"
+    log.write_text("\n".join([
+        "[20:00:00] 战斗开始",
+        "[20:00:00] 玩家：光明使者 进入战斗",
+        "[20:00:00] 目标：奥妮克希亚 进入战斗",
+        "[20:00:02] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1500 点伤害",
+        "[20:00:04] 圣光之锤 使用了 十字军打击 对 奥妮克希亚 造成了 4000 点伤害 (暴击)",
+        "[20:00:06] 光明使者 使用了 十字军打击 对 奥妮克希亚 造成了 2000 点伤害",
+        "[20:00:08] 圣光之锤 使用了 十字军打击 对 奥妮克希亚 造成了 2000 点伤害",
+        "[20:00:09] 光明使者 使用了 圣光术 对 光明使者",
+        "[20:00:10] 战斗结束"
+    ]), encoding="utf-8")
+    
+    parser = LogParser()
+    result = parser.parse_file(str(log))
+    # 伤害最高的施放者排在前面，默认分析日志头中的玩家
+    assert parser.get_actors(0) == ["圣光之锤", "光明使者"]
+    assert result["player"] == "光明使者"
+    assert result["totalDamage"] == 3500
+    
+    encounter = parser.encounters[0]
+    assert encounter.get_ability_data("圣光之锤")["十字军打击"] == {
+        "name": "十字军打击", "casts": 2, "damage": 6000, "crits": 1, "hits": 2
+    }
+    # 非伤害技能只计施放次数
+    assert encounter.get_ability_data("光明使者")["圣光术"]["hits"] == 0
+    
+    # 其他玩家的结果直接由已聚合的数据生成，与单独统计一致
+    other = parser.get_player_report("圣光之锤", 0)
+    assert other["totalDamage"] == 6000
+    assert other["dps"] == 600
+    assert other["critRate"] == 0.5
+    assert [ability["name"] for ability in other["abilities"]] == ["十字军打击"]
+
+def test_aggregate_hits_without_casts():
+    # 客户端战斗日志中法术的每次伤害是不计施放次数的 "hit" 事件
+    segmenter = EncounterSegmenter(30)
+    segmenter.feed([
+        ("line", 10.0, "光明使者", "奉献", "奥妮克希亚", None, False),
+        ("hit", 11.0, "光明使者", "奉献", "奥妮克希亚", 300, False),
+        ("hit", 12.0, "光明使者", "奉献", "奥妮克希亚", 600, True)
+    ])
+    encounter = segmenter.finish()[0]
+    assert encounter.actor_data[("光明使者", "奉献")] == {
+        "name": "奉献", "casts": 1, "damage": 900, "crits": 1, "hits": 2
+    }
+    assert encounter.casts == 3
+
+def tokenize(lines):
+    """对文本日志行分词，返回事件列表"""
+    return list(LogParser().iter_text_events(lines))
+
+@pytest.mark.parametrize("line, expected", [
+    # 全角和半角括号的暴击标记
+    ("[20:00:01] 光明使者 使用了 十字军打击 对 奥妮克希亚 造成了 2200 点伤害（暴击）",
+     ("line", 72001, "光明使者", "十字军打击", "奥妮克希亚", 2200, True)),
+    ("[20:00:01] 光明使者 使用了 十字军打击 对 奥妮克希亚 造成了 2200 点伤害 (暴击)",
+     ("line", 72001, "光明使者", "十字军打击", "奥妮克希亚", 2200, True)),
+    # 技能别名和带小数的时间戳
+    ("[20:00:02.250] 光明使者 使用了 攻击 对 奥妮克希亚 造成了 300 点伤害",
+     ("line", 72002.25, "光明使者", "白色攻击", "奥妮克希亚", 300, False)),
+    # 非伤害技能不计伤害，没有目标的施放
+    ("[20:00:03] 光明使者 使用了 圣光术 对 光明使者", ("line", 72003, "光明使者", "圣光术", "光明使者", None, False)),
+    ("[20:00:03] 光明使者 使用了 奉献", ("line", 72003, "光明使者", "奉献", None, None, False)),
+    # 未知技能只保留施放者和目标
+    ("[20:00:04] 光明使者 使用了 火球术 对 奥妮克希亚 造成了 900 点伤害",
+     ("line", 72004, "光明使者", None, "奥妮克希亚", None, False)),
+    # 没有技能事件的时间戳行
+    ("[20:00:05] 其他信息", ("line", 72005, None, None, None, None, False))
+])
+def test_tokenize_event_line(line, expected):
+    assert tokenize([line]) == [expected]
+
+def test_tokenize_markers_and_unmatched_lines():
+    # 没有时间戳的行和空行不产生事件
+    assert tokenize([
+        "光明使者 使用了 审判 对 奥妮克希亚 造成了 1000 点伤害",
+        "",
+        "[20:00:06] 玩家：光明使者 进入战斗",
+        "[20:00:06] 目标: 奥妮克希亚",
+        "[20:00:09] 战斗结束"
+    ]) == [
+        ("start", 72006),
+        ("player", "光明使者", 72006),
+        ("boss", "奥妮克希亚", 72006),
+        ("line", 72006, None, None, None, None, False),
+        ("end", 72009)
+    ]
+
+ACTORS = ["光明使者", "圣光之锤", "银色黎明"]
+ABILITIES = [("审判", True), ("十字军打击", True), ("奉献", True), ("神圣风暴", True), ("白色攻击", True),
+             ("圣光术", False), ("致死打击", True)]
+
+def write_raid_log(path, seed=7):
+    """
+    生成多场战斗的文本日志：有开始/结束标记的战斗、只靠空闲时间切分的战斗、战斗之间的零散记录，
+    带小数部分的时间戳，并有一场战斗跨越午夜
+    
+    Returns:
+        每行的 (字节偏移, 行内容) 列表
+    """
+    rng = random.Random(seed)
+    clock = 23 * 3600 + 40 * 60
+    lines = []
+    
+    def stamp(fraction=None):
+        seconds = int(clock) % SECONDS_PER_DAY
+        text = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+        return f"[{text}]" if fraction is None else f"[{text}.{fraction:03d}]"
+    
+    for index in range(8):
+        with_markers = index % 4 < 2
+        boss = f"首领{index}"
+        if with_markers:
+            lines.append(f"{stamp()} 战斗开始")
+            lines.append(f"{stamp()} 玩家：{ACTORS[index % 2]} 进入战斗")
+            lines.append(f"{stamp()} 目标：{boss} 进入战斗")
+        for _ in range(rng.randint(90, 240)):
+            fractions = sorted(rng.randint(0, 999) for _ in range(rng.randint(1, 3)))
+            for fraction in fractions:
+                actor = rng.choice(ACTORS)
+                ability, is_damage = rng.choice(ABILITIES)
+                if is_damage:
+                    crit = " (暴击)" if rng.random() < 0.25 else ""
+                    lines.append(f"{stamp(fraction)} {actor} 使用了 {ability} 对 {boss} 造成了 {rng.randint(100, 5000)} 点伤害{crit}")
+                else:
+                    lines.append(f"{stamp(fraction)} {actor} 使用了 {ability} 对 {actor}")
+            clock += 1
+        if with_markers:
+            lines.append(f"{stamp()} 战斗结束")
+        # 战斗间隙：零散的记录和超过空闲时间的间隔
+        clock += rng.randint(5, 20)
+        lines.append(f"{stamp()} 其他信息")
+        clock += rng.randint(40, 90)
+    
+    data = "".join(line + "\n" for line in lines).encode("utf-8")
+    path.write_bytes(data)
+    
+    offsets = []
+    offset = 0
+    for line in lines:
+        offsets.append((offset, line))
+        offset += len(line.encode("utf-8")) + 1
+    return offsets
+
+def parse_snapshot(path, workers=1, keep_events=False):
+    """解析日志，返回可以直接比较的结果：每场战斗的聚合数据、默认结果和所有玩家的结果"""
+    parser = LogParser(keep_events=keep_events)
+    # 测试日志较小，强制按分块并行解析
+    parser.PARALLEL_MIN_BYTES = 0
+    parser.parse_file(str(path), workers=workers)
+    if workers > 1:
+        assert parser.can_parse_parallel(str(path), workers)
+    return {
+        "encounters": [encounter.to_dict() for encounter in parser.encounters],
+        "results": parser.results,
+        "players": [
+            [parser.get_player_report(actor, index) for actor in parser.get_actors(index)]
+            for index in range(len(parser.encounters))
+        ]
+    }
+
+@pytest.fixture(scope="module")
+def raid_log(tmp_path_factory):
+    path = tmp_path_factory.mktemp("logs") / "raid.txt"
+    offsets = write_raid_log(path)
+    return path, offsets
+
+@pytest.fixture(scope="module")
+def sequential(raid_log):
+    return parse_snapshot(raid_log[0])
+
+def test_generated_log_covers_midnight_and_many_encounters(sequential):
+    encounters = sequential["encounters"]
+    assert len(encounters) >= 8
+    assert any(e["start_time"] < SECONDS_PER_DAY < e["end_time"] for e in encounters)
+    assert {e["closed_by"] for e in encounters} >= {"end", "gap"}
+
+@pytest.mark.parametrize("workers, keep_events", [(4, False), (1, True), (4, True)])
+def test_parallel_and_event_table_match_sequential(raid_log, sequential, workers, keep_events):
+    if keep_events:
+        pytest.importorskip("numpy")
+    assert parse_snapshot(raid_log[0], workers, keep_events) == sequential
+
+@pytest.fixture(scope="module")
+def corrupt_log(raid_log, tmp_path_factory):
+    """在日志中间一行的施放者名称前插入一个不是 UTF-8 的字节"""
+    path, offsets = raid_log
+    offset, line = next((offset, line) for offset, line in offsets[len(offsets) // 2:] if "使用了" in line)
+    position = offset + line.index("]") + 2
+    data = path.read_bytes()
+    corrupt = tmp_path_factory.mktemp("corrupt") / "raid.txt"
+    corrupt.write_bytes(data[:position] + b"\xff" + data[position:])
+    return corrupt
+
+@pytest.mark.parametrize("workers, keep_events", [(4, False), (1, True), (4, True)])
+def test_invalid_utf8_parallel_matches_sequential(corrupt_log, workers, keep_events):
+    if keep_events:
+        pytest.importorskip("numpy")
+    expected = parse_snapshot(corrupt_log)
+    # 无效字节替换为 U+FFFD，该行仍计入统计
+    assert "\ufffd" in str(expected["players"])
+    assert parse_snapshot(corrupt_log, workers, keep_events) == expected
+
+@pytest.mark.parametrize("keep_events", [False, True])
+def test_chunk_boundaries_inside_encounter_and_at_midnight(raid_log, sequential, monkeypatch, keep_events):
+    if keep_events:
+        pytest.importorskip("numpy")
+    path, offsets = raid_log
+    
+    # 分块边界：战斗中间、午夜后的第一行、结束标记之后、开始标记之后、战斗间隙的零散记录之前
+    midnight = next(i for i in range(1, len(offsets)) if offsets[i][1][1:9] < offsets[i - 1][1][1:9])
+    after_end = next(i for i, (_, line) in enumerate(offsets) if line.endswith("战斗结束")) + 1
+    after_start = next(i for i, (_, line) in enumerate(offsets) if i > after_end and line.endswith("战斗开始")) + 1
+    before_gap = next(i for i, (_, line) in enumerate(offsets) if i > after_start and line.endswith("其他信息"))
+    middle = (after_start + before_gap) // 2
+    lines = sorted({middle, midnight, after_end, after_start, before_gap, midnight + 1})
+    boundaries = [0] + [offsets[i][0] for i in lines] + [path.stat().st_size]
+    ranges = list(zip(boundaries[:-1], boundaries[1:]))
+    monkeypatch.setattr(log_parser, "split_file_ranges", lambda file_path, parts: ranges)
+    
+    assert parse_snapshot(path, len(ranges), keep_events) == sequential
+
+def test_diagnostics_kept_out_of_saved_results(tmp_path):
+    log = tmp_path / "raid.txt"
+    log.write_text("\n".join([
+        "[20:00:00] 战斗开始",
+        "[20:00:02] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1500 点伤害",
+        "[20:00:10] 战斗结束"
+    ]), encoding="utf-8")
+    
+    parser = LogParser(diagnostics=True)
+    results = parser.parse_encounters(str(log))
+    assert "diagnostics" not in results[0]
+    assert parser.diagnostics.to_dict()["counters"]["encounters"] == 1
+    
+    # 旧版本保存的结果中带有诊断信息，再次保存时去掉
+    results[0]["diagnostics"] = parser.diagnostics.to_dict()
+    stream = str(tmp_path / "results.jsonl")
+    parser.save_result_stream(stream)
+    assert "diagnostics" not in ResultStreamReader(stream).get(0)
+    assert "diagnostics" in results[0]
+
+def test_checklist_evaluated_lazily_and_memoized(tmp_path, monkeypatch):
+    log = tmp_path / "raid.txt"
+    log.write_text("\n".join([
+        "[20:00:00] 战斗开始",
+        "[20:00:00] 玩家：光明使者 进入战斗",
+        "[20:00:02] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1500 点伤害",
+        "[20:00:03] 战士甲 使用了 攻击 对 奥妮克希亚 造成了 500 点伤害",
+        "[20:00:06] 光明使者 使用了 十字军打击 对 奥妮克希亚 造成了 2000 点伤害",
+        "[20:00:10] 战斗结束"
+    ]), encoding="utf-8")
+    
+    parser = LogParser()
+    runs = []
+    run = parser.rotation_model.run
+    monkeypatch.setattr(parser.rotation_model, "run", lambda job: runs.append(job) or run(job))
+    
+    results = parser.parse_encounters(str(log))
+    # 解析时不为每场战斗的每个玩家运行输出循环模型
+    assert results[0]["checklist"] == [] and runs == []
+    
+    # 返回单个玩家结果的接口与原来一样带有检查列表
+    report = parser.get_player_report("光明使者", 0)
+    assert len(runs) == 1
+    assert report["rotationModel"] is not None
+    assert all(item["status"] is not None for item in report["checklist"])
+    assert "超过 0%" not in "".join(item["description"] for item in report["checklist"])
+    
+    # 相同的战斗时长和技能组合直接使用缓存的模拟结果
+    assert parser.evaluate_checklist(results[0])["checklist"] == report["checklist"]
+    assert parser.parse_file(str(log))["checklist"] == report["checklist"]
+    assert len(runs) == 1
+    
+    # 没有施放输出循环技能的玩家不评估
+    warrior = parser.get_player_report("战士甲", 0)
+    assert [item["status"] for item in warrior["checklist"]] == [None]
+    assert warrior["rotationModel"] is None
+    assert len(runs) == 1
+    
+    # 保存的结果流中每条结果都带有检查列表
+    parser.parse_encounters(str(log))
+    stream = str(tmp_path / "results.jsonl")
+    parser.save_result_stream(stream)
+    reader = ResultStreamReader(stream)
+    assert all(reader.get(0, player)["checklist"] for player in reader.players(0))
+
+def test_save_result_stream_over_source(tmp_path):
+    log = tmp_path / "raid.txt"
+    log.write_text("\n".join([
+        "[20:00:00] 战斗开始",
+        "[20:00:02] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1500 点伤害",
+        "[20:00:10] 战斗结束",
+        "[20:01:00] 战斗开始",
+        "[20:01:02] 光明使者 使用了 十字军打击 对 奥妮克希亚 造成了 2000 点伤害",
+        "[20:01:10] 战斗结束"
+    ]), encoding="utf-8")
+    stream = str(tmp_path / "results.jsonl")
+    parser = LogParser()
+    parser.parse_encounters(str(log))
+    # 头部较长，重新保存后各条记录的偏移不同
+    with ResultStreamWriter(stream, {"source": str(log) * 10}) as writer:
+        for index, result in enumerate(parser.results):
+            writer.write(index + 1, result)
+    expected = [result["totalDamage"] for result in parser.results]
+    
+    # 结果从正在覆盖的文件中惰性读取
+    reopened = LogParser()
+    reopened.parse_file(stream)
+    assert reopened.save_result_stream(stream) == 2
+    assert [result["totalDamage"] for result in ResultStreamReader(stream).default_results()] == expected
+    # 覆盖后仍可继续读取当前打开的结果流
+    assert [result["totalDamage"] for result in reopened.results] == expected
+    assert reopened.get_actors(1) == ["光明使者"]
+    
+    # 取消时原文件不变，也不留下临时文件
+    before = open(stream, 'rb').read()
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with pytest.raises(log_parser.ParseCancelled):
+        reopened.save_result_stream(stream, cancel_event=cancel_event)
+    assert open(stream, 'rb').read() == before
+    assert sorted(os.listdir(tmp_path)) == ["raid.txt", "results.jsonl"]
+
+def test_parser_reused_for_another_file(tmp_path):
+    pytest.importorskip("numpy")
+    first = tmp_path / "a.txt"
+    first.write_text("\n".join([
+        "[20:00:00] 战斗开始",
+        "[20:00:02] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1000 点伤害",
+        "[20:00:10] 战斗结束"
+    ]), encoding="utf-8")
+    second = tmp_path / "b.txt"
+    second.write_text("\n".join([
+        "[10:00:00] 战斗开始",
+        "[10:00:02] 光明使者 使用了 审判 对 奥妮克希亚 造成了 2000 点伤害",
+        "[10:00:10] 战斗结束"
+    ]), encoding="utf-8")
+    
+    parser = LogParser(keep_events=True)
+    parser.parse_encounters(str(first))
+    assert parser.get_window_report("光明使者", 0, 5)["totalDamage"] == 1000
+    
+    # 第二个文件的时间戳早于第一个文件，不应被当作跨越午夜；时间索引按新的事件表重建
+    parser.parse_encounters(str(second))
+    assert parser.encounters[0].start_time == 10 * 3600
+    assert parser.get_window_report("光明使者", 0, 5)["totalDamage"] == 2000
+    assert parser.result_stream is None
@@ -0,0 +1,82 @@
+"""
+虚拟表格的测试：可见范围的滚动和选中行的位置计算（不需要显示界面），
+以及 EventListModel 按行范围取出排序、筛选后的行
+"""
+import pytest
+
+from virtual_table import clamp_top, scroll_for_row, visible_position, wheel_steps
+
+@pytest.mark.parametrize("top, total, visible, expected", [
+    (5, 100, 10, 5),
+    (-3, 100, 10, 0),
+    # 最后一屏不留空行
+    (95, 100, 10, 90),
+    # 行数少于一屏时始终从第一行开始
+    (4, 6, 10, 0),
+    (0, 0, 10, 0)
+])
+def test_clamp_top(top, total, visible, expected):
+    assert clamp_top(top, total, visible) == expected
+
+@pytest.mark.parametrize("index, top, expected", [
+    # 已可见时不滚动
+    (25, 20, 20),
+    (29, 20, 20),
+    # 在可见范围上方时滚动到顶部，下方时滚动到底部
+    (12, 20, 12),
+    (30, 20, 21),
+    (75, 20, 66)
+])
+def test_scroll_for_row(index, top, expected):
+    assert scroll_for_row(index, top, 10) == expected
+
+def test_visible_position():
+    assert visible_position(None, 0, 10) is None
+    assert visible_position(23, 20, 10) == 3
+    # 滚出可见范围后不显示选中
+    assert visible_position(19, 20, 10) is None
+    assert visible_position(30, 20, 10) is None
+    # 最后一屏的条目少于可见行数
+    assert visible_position(24, 20, 5) == 4
+    assert visible_position(25, 20, 5) is None
+
+@pytest.mark.parametrize("delta, steps", [(120, -1), (-240, 2), (3, -3), (-1, 1)])
+def test_wheel_steps(delta, steps):
+    assert wheel_steps(delta) == steps
+
+def test_keyboard_walk_keeps_selection_visible():
+    # 与 VirtualTable.select_row() 相同：先限制行号，再滚动到该行可见
+    total, visible = 100, 10
+    top, selected = 0, 0
+    for rows in [1] * 15 + [visible] * 20 + [-1] * 3 + [-visible] * 20:
+        selected = max(0, min(selected + rows, total - 1))
+        top = clamp_top(scroll_for_row(selected, top, visible), total, visible)
+        assert visible_position(selected, top, visible) is not None
+    assert (selected, top) == (0, 0)
+
+def test_event_list_model_row_window():
+    pytest.importorskip("numpy")
+    from event_store import EventTableBuilder, EventListModel
+    
+    builder = EventTableBuilder()
+    for second in range(50):
+        actor = "光明使者" if second % 2 == 0 else "圣光之锤"
+        builder.append(100.0 + second, actor, "十字军打击", "奥妮克希亚", 1000 + second, second % 5 == 0)
+    table = builder.build([50])
+    model = EventListModel(table, table.encounter_rows(0), start_time=100.0)
+    
+    assert len(model) == 50
+    assert [row[0] for row in model.rows(10, 13)] == [10, 11, 12]
+    # 超出范围的窗口被截断
+    assert len(model.rows(45, 60)) == 5
+    assert model.rows(60, 70) == []
+    
+    model.set_filter(actor="圣光之锤")
+    assert len(model) == 25
+    assert [row[0] for row in model.rows(0, 3)] == [1, 3, 5]
+    
+    # 排序后保持筛选，按伤害降序
+    model.sort("amount", descending=True)
+    assert [row[4] for row in model.rows(0, 3)] == [1049, 1047, 1045]
+    model.set_filter(crit=True)
+    assert [row[0] for row in model.rows(0, len(model))] == [45, 40, 35, 30, 25, 20, 15, 10, 5, 0]
@@ -0,0 +1,267 @@
+"""
+warcraftlogs 客户端的测试：使用本地模拟的 WarcraftLogs 服务器（OAuth 令牌 + GraphQL），
+覆盖令牌获取与 401 后刷新、429 的 Retry-After、长连接复用、跨时间段边界的分页不重复计算，以及中途取消
+"""
+import json
+import base64
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import warcraftlogs
+from warcraftlogs import WarcraftLogsClient, WarcraftLogsError, retry_delay
+from log_parser import LogParser, ParseCancelled
+
+FIGHT_START = 1000
+FIGHT_END = 301000
+PLAYER_ID = 1
+OTHER_ID = 2
+BOSS_ID = 9
+CREDENTIALS = "Basic " + base64.b64encode(b"id:secret").decode('ascii')
+# 客户端按连接池大小切分时间段，以下为 4 段时的段边界
+SLICE_BOUNDS = [FIGHT_START + (FIGHT_END - FIGHT_START) * i // 4 for i in range(5)]
+
+def make_events(seed=5):
+    """生成一场战斗的事件（按时间排序），段边界和战斗结束时刻上各有一次伤害"""
+    rng = random.Random(seed)
+    events = []
+    timestamp = FIGHT_START
+    while timestamp < FIGHT_END - 40:
+        timestamp += rng.randint(1, 40)
+        source = rng.choice([PLAYER_ID, PLAYER_ID, PLAYER_ID, OTHER_ID])
+        roll = rng.random()
+        if roll < 0.3:
+            events.append({"timestamp": timestamp, "type": "damage", "sourceID": source, "targetID": BOSS_ID,
+                           "abilityGameID": 1, "hitType": rng.choice([1, 1, 2]), "amount": rng.randint(100, 900)})
+        elif roll < 0.5:
+            events.append({"timestamp": timestamp, "type": "cast", "sourceID": source, "targetID": BOSS_ID,
+                           "abilityGameID": 35395})
+        elif roll < 0.7:
+            events.append({"timestamp": timestamp, "type": "damage", "sourceID": source, "targetID": BOSS_ID,
+                           "abilityGameID": rng.choice([35395, 53385, 20187]), "hitType": rng.choice([1, 2]),
+                           "amount": rng.randint(500, 3000)})
+        else:
+            events.append({"timestamp": timestamp, "type": "applybuff", "sourceID": source, "targetID": source,
+                           "abilityGameID": 20375})
+    
+    for bound in SLICE_BOUNDS[1:]:
+        events.append({"timestamp": bound, "type": "damage", "sourceID": PLAYER_ID, "targetID": BOSS_ID,
+                       "abilityGameID": 35395, "hitType": 1, "amount": 10000})
+    events.sort(key=lambda event: event["timestamp"])
+    return events
+
+EVENTS = make_events()
+
+class StubState:
+    """模拟服务器的状态：计数器和注入的错误"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.token_requests = 0
+        self.api_requests = 0
+        self.connections = 0
+        self.issued = 0
+        self.valid_tokens = set()
+        # 接下来的 API 请求中返回 429 的次数及其 Retry-After
+        self.throttle = 0
+        self.retry_after = None
+        # 每页最多的事件数，较小的值使每个时间段分为多页
+        self.page_size = 500
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+    
+    def log_message(self, *args):
+        pass
+    
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_POST(self):
+        state = self.server.state
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        authorization = self.headers.get("Authorization", "")
+        
+        if self.path == WarcraftLogsClient.TOKEN_PATH:
+            if authorization != CREDENTIALS:
+                return self.send_json(401, {"error": "invalid_client"})
+            with state.lock:
+                state.token_requests += 1
+                state.issued += 1
+                token = f"token-{state.issued}"
+                state.valid_tokens.add(token)
+            return self.send_json(200, {"access_token": token, "expires_in": 3600, "token_type": "Bearer"})
+        
+        with state.lock:
+            state.api_requests += 1
+            if authorization[len("Bearer "):] not in state.valid_tokens:
+                return self.send_json(401, {"error": "unauthorized"})
+            if state.throttle:
+                state.throttle -= 1
+                headers = {"Retry-After": state.retry_after} if state.retry_after is not None else {}
+                return self.send_json(429, {"error": "too many requests"}, headers)
+        
+        request = json.loads(body)
+        variables = request["variables"]
+        if "events(" in request["query"]:
+            return self.send_json(200, {"data": {"reportData": {"report": {"events": self.events_page(variables)}}}})
+        return self.send_json(200, {"data": {"reportData": {"report": self.report()}}})
+    
+    def events_page(self, variables):
+        """与 WarcraftLogs 相同：包含 endTime 上的事件，下一页从第一条未返回的事件开始"""
+        start, end = variables["startTime"], variables["endTime"]
+        source = variables.get("sourceID")
+        selected = [event for event in EVENTS if start <= event["timestamp"] <= end
+                    and (source is None or event["sourceID"] == source)]
+        limit = min(variables["limit"], self.server.state.page_size)
+        next_page = selected[limit]["timestamp"] if len(selected) > limit else None
+        data = [event for event in selected if next_page is None or event["timestamp"] < next_page]
+        return {"data": data, "nextPageTimestamp": next_page}
+    
+    def report(self):
+        return {
+            "title": "测试报告",
+            "startTime": 0,
+            "endTime": FIGHT_END + 1000,
+            "fights": [{"id": 7, "encounterID": 1084, "name": "奥妮克希亚",
+                        "startTime": FIGHT_START, "endTime": FIGHT_END, "kill": True}],
+            "masterData": {
+                "actors": [
+                    {"id": PLAYER_ID, "name": "光明使者", "type": "Player", "subType": "Paladin", "server": "测试"},
+                    {"id": OTHER_ID, "name": "白银之手", "type": "Player", "subType": "Paladin", "server": "测试"},
+                    {"id": BOSS_ID, "name": "奥妮克希亚", "type": "NPC", "subType": "Boss", "server": None}
+                ],
+                "abilities": [{"gameID": 35395, "name": "十字军打击"}]
+            }
+        }
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    httpd.daemon_threads = True
+    httpd.state = StubState()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def make_client(server):
+    clients = []
+    
+    def make(pool_size=4):
+        client = WarcraftLogsClient("id", "secret", f"http://127.0.0.1:{server.server_port}", pool_size=pool_size)
+        clients.append(client)
+        return client
+    
+    yield make
+    for client in clients:
+        client.close()
+
+def expected_damage():
+    return sum(event["amount"] for event in EVENTS if event["type"] == "damage" and event["sourceID"] == PLAYER_ID)
+
+def analyze(client, **kwargs):
+    report = client.fetch_report("ABC")
+    return client.analyze_fight(LogParser(), report, report["fights"][0], report["players"][0], **kwargs)
+
+def test_token_fetched_once_and_reused(server, make_client):
+    client = make_client()
+    client.fetch_report("ABC")
+    client.fetch_report("ABC")
+    assert server.state.token_requests == 1
+    assert client.requests_sent == 2
+
+def test_token_refreshed_after_401(server, make_client):
+    client = make_client()
+    client.fetch_report("ABC")
+    # 服务器吊销当前令牌，下一次请求返回 401，客户端重新获取令牌后重试
+    server.state.valid_tokens.clear()
+    report = client.fetch_report("ABC")
+    assert report["title"] == "测试报告"
+    assert server.state.token_requests == 2
+    assert client.requests_sent == 3
+
+def test_rejected_credentials_raise(server, make_client):
+    client = make_client()
+    client.client_secret = "wrong"
+    with pytest.raises(WarcraftLogsError):
+        client.fetch_report("ABC")
+    assert server.state.api_requests == 0
+
+@pytest.mark.parametrize("retry_after, delay", [
+    ("3", 3.0),
+    (None, 1),
+    # HTTP 日期（已过去）不需要等待；无法解析的值按指数退避
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),
+    ("soon", 1)
+])
+def test_throttled_request_waits_and_retries(server, make_client, monkeypatch, retry_after, delay):
+    sleeps = []
+    monkeypatch.setattr(warcraftlogs.time, "sleep", sleeps.append)
+    server.state.throttle = 1
+    server.state.retry_after = retry_after
+    client = make_client()
+    assert client.fetch_report("ABC")["title"] == "测试报告"
+    assert sleeps == [delay]
+    assert client.requests_sent == 2
+
+def test_throttled_beyond_max_retries_raises(server, make_client, monkeypatch):
+    monkeypatch.setattr(warcraftlogs.time, "sleep", lambda seconds: None)
+    server.state.throttle = WarcraftLogsClient.MAX_RETRIES + 1
+    client = make_client()
+    with pytest.raises(WarcraftLogsError):
+        client.fetch_report("ABC")
+    assert client.requests_sent == WarcraftLogsClient.MAX_RETRIES + 1
+
+def test_retry_delay_http_date_in_future(monkeypatch):
+    monkeypatch.setattr(warcraftlogs.time, "time", lambda: 1445412470.0)
+    assert retry_delay("Wed, 21 Oct 2015 07:28:00 GMT", 0) == pytest.approx(10.0)
+    assert retry_delay("", 3) == 8
+
+def test_connections_reused(server, make_client):
+    client = make_client(pool_size=4)
+    analyze(client)
+    # 每个时间段分为多页，请求数远多于连接数
+    assert client.requests_sent > 4 * 4
+    assert client.pool.connections_opened <= 4
+    assert server.state.connections == client.pool.connections_opened
+
+def test_pages_across_slice_boundaries_counted_once(server, make_client):
+    result = analyze(make_client(pool_size=4))
+    assert result["totalDamage"] == expected_damage()
+    
+    # 切分为一段时的结果相同
+    single = analyze(make_client(pool_size=1))
+    assert single["totalDamage"] == result["totalDamage"]
+    assert single["abilities"] == result["abilities"]
+
+def test_cancel_mid_stream(server, make_client):
+    client = make_client()
+    cancel_event = threading.Event()
+    pages = []
+    
+    def progress(page_count, event_count):
+        pages.append(page_count)
+        cancel_event.set()
+    
+    with pytest.raises(ParseCancelled):
+        analyze(client, cancel_event=cancel_event, progress=progress)
+    # 取消前已预取的页仍会交给消费者，之后不再请求新的页
+    assert pages[0] == 1
+    assert len(pages) <= 1 + WarcraftLogsClient.PREFETCH_PAGES
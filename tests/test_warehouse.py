@@ -0,0 +1,117 @@
+"""
+历史战斗数据仓库的测试：解析日志后写入、按周/首领/玩家的趋势查询、玩家的历史记录，
+以及再次写入同一场战斗时替换旧的记录
+"""
+import os
+from datetime import datetime
+
+import pytest
+
+from log_parser import LogParser
+from warehouse import FightWarehouse, file_fight_records, percentile, week_of
+
+def make_record(key, boss, started, duration, abilities):
+    return {"key": key, "source": "test", "boss": boss, "started": started, "duration": duration,
+            "abilities": abilities}
+
+# 2024-02-12 和 2024-02-19 为相邻两周的周一
+WEEK_1 = datetime(2024, 2, 12, 20).timestamp()
+WEEK_2 = datetime(2024, 2, 19, 20).timestamp()
+
+RECORDS = [
+    make_record("a", "奥妮克希亚", WEEK_1, 100.0, [
+        ["光明使者", "十字军打击", 10, 50000, 10, 5, True],
+        ["光明使者", "圣光术", 2, 0, 0, 0, False],
+        ["圣光之锤", "十字军打击", 10, 30000, 10, 2, True]
+    ]),
+    make_record("b", "奥妮克希亚", WEEK_2, 200.0, [
+        ["光明使者", "十字军打击", 20, 160000, 20, 8, True]
+    ]),
+    make_record("c", "拉格纳罗斯", WEEK_2, 50.0, [
+        ["光明使者", "审判", 5, 10000, 5, 1, True]
+    ])
+]
+
+@pytest.fixture
+def warehouse(tmp_path):
+    warehouse = FightWarehouse(str(tmp_path / "warehouse.sqlite3"))
+    warehouse.store(RECORDS)
+    return warehouse
+
+def test_percentile_interpolates():
+    assert percentile([], 0.5) is None
+    assert percentile([1, 2, 3, 4], 0.5) == 2.5
+    assert percentile([10, 20, 30], 0.9) == pytest.approx(28)
+
+def test_trend_by_week(warehouse):
+    trend = warehouse.trend("week", "dps", player="光明使者")
+    assert [row["key"] for row in trend] == [week_of(WEEK_1), week_of(WEEK_2)]
+    assert [row["samples"] for row in trend] == [1, 2]
+    # 非伤害技能不计入总伤害：第一周 50000 / 100
+    assert trend[0]["median"] == 500
+    assert trend[1]["best"] == 800
+    assert trend[1]["mean"] == 500
+
+def test_trend_by_boss_and_player(warehouse):
+    by_boss = warehouse.trend("boss", "damage")
+    assert {row["key"]: row["samples"] for row in by_boss} == {"奥妮克希亚": 3, "拉格纳罗斯": 1}
+    
+    by_player = warehouse.trend("player", "crit_rate", boss="奥妮克希亚")
+    assert {row["key"]: row["best"] for row in by_player} == {"光明使者": 0.5, "圣光之锤": 0.2}
+    
+    assert warehouse.trend("week", since=WEEK_2) == warehouse.trend("week", since=WEEK_2, until=WEEK_2 + 1)
+    with pytest.raises(ValueError):
+        warehouse.trend("day")
+
+def test_history_and_listings(warehouse):
+    history = warehouse.history("光明使者", boss="奥妮克希亚")
+    assert [(row["started"], row["dps"]) for row in history] == [(WEEK_1, 500), (WEEK_2, 800)]
+    assert warehouse.bosses() == ["奥妮克希亚", "拉格纳罗斯"]
+    assert warehouse.players() == ["光明使者", "圣光之锤"]
+    assert warehouse.fight_count() == 3
+
+def test_store_replaces_same_key(warehouse):
+    warehouse.store([make_record("a", "奥妮克希亚", WEEK_1, 100.0, [
+        ["光明使者", "十字军打击", 10, 70000, 10, 5, True]
+    ])])
+    assert warehouse.fight_count() == 3
+    assert warehouse.history("光明使者", boss="奥妮克希亚")[0]["dps"] == 700
+    # 旧记录中的其他玩家一并删除
+    assert warehouse.history("圣光之锤") == []
+    
+    warehouse.clear()
+    assert warehouse.fight_count() == 0 and warehouse.trend() == []
+
+def test_parsed_log_round_trip(tmp_path):
+    log = tmp_path / "raid.txt"
+    log.write_text("\n".join([
+        "[20:00:00] 战斗开始",
+        "[20:00:00] 目标：奥妮克希亚 进入战斗",
+        "[20:00:02] 光明使者 使用了 十字军打击 对 奥妮克希亚 造成了 2000 点伤害 (暴击)",
+        "[20:00:04] 光明使者 使用了 审判 对 奥妮克希亚 造成了 1000 点伤害",
+        "[20:00:06] 光明使者 使用了 圣光术 对 光明使者",
+        "[20:00:10] 战斗结束"
+    ]), encoding="utf-8")
+    modified = datetime(2024, 2, 12, 21).timestamp()
+    os.utime(log, (modified, modified))
+    
+    parser = LogParser()
+    parser.parse_file(str(log))
+    records = file_fight_records(parser, str(log))
+    assert len(records) == 1
+    # 最后一场战斗的结束时间为文件的修改时间
+    assert records[0]["started"] == modified - 10
+    
+    warehouse = FightWarehouse(str(tmp_path / "warehouse.sqlite3"))
+    warehouse.store(records)
+    result = parser.results[0]
+    history = warehouse.history("光明使者")
+    assert len(history) == 1
+    assert history[0]["boss"] == "奥妮克希亚"
+    assert history[0]["damage"] == result["totalDamage"]
+    assert history[0]["dps"] == pytest.approx(result["dps"])
+    assert history[0]["crit_rate"] == pytest.approx(result["critRate"])
+    
+    # 再次分析同一个日志不会重复记录
+    warehouse.store(file_fight_records(parser, str(log)))
+    assert warehouse.fight_count() == 1
@@ -0,0 +1,226 @@
+"""
+虚拟表格控件
+ttk.Treeview 中每插入一行都要创建一个 Tk 条目，几十万行时插入和删除都会卡住界面。
+VirtualTable 只创建与可见行数相同的条目，滚动时改写这些条目的内容，
+数据按需从模型中取出，因此行数对滚动和刷新的速度没有影响。
+
+模型需要提供 len(model)、model.rows(first, last) 和 model.sort(column, descending)，
+例如 event_store.EventListModel。
+
+选中行记录为模型中的行号而不是条目：方向键在可见范围内移动选中行，移到边缘时才滚动；
+选中行被滚出可见范围后不显示选中，滚动回来时恢复。
+"""
+import tkinter as tk
+from tkinter import ttk
+
+def clamp_top(top, total, visible):
+    """可见范围第一行的有效行号：不小于0，最后一屏不留空行"""
+    return max(0, min(int(top), total - visible))
+
+def scroll_for_row(index, top, visible):
+    """
+    返回使第 index 行可见时的第一行行号
+    该行已可见时不滚动，否则只滚动到该行恰好位于可见范围的顶部或底部
+    """
+    if index < top:
+        return index
+    if index >= top + visible:
+        return index - visible + 1
+    return top
+
+def visible_position(selected, top, item_count):
+    """选中行在可见条目中的位置，没有选中或不在可见范围内时返回 None"""
+    if selected is None:
+        return None
+    position = selected - top
+    return position if 0 <= position < item_count else None
+
+def wheel_steps(delta):
+    """鼠标滚轮事件的滚动格数（向下为正）：Windows 每格为 120，macOS 为较小的整数"""
+    return -int(delta / 120) if abs(delta) >= 120 else -delta
+
+class VirtualTable(ttk.Frame):
+    """只渲染可见行的表格（带滚动条，点击列标题排序）"""
+    
+    # 无法从样式中取得行高时使用的默认行高（像素）
+    DEFAULT_ROW_HEIGHT = 20
+    # 鼠标滚轮每格滚动的行数
+    WHEEL_ROWS = 3
+    
+    def __init__(self, master, columns, formatter, height=20):
+        """
+        Args:
+            master: 父控件
+            columns: (列名, 标题, 宽度, 对齐方式) 的列表，列名与模型的排序列对应
+            formatter: 将 model.rows() 返回的一行转换为显示值元组的函数
+            height: 初始的可见行数
+        """
+        super().__init__(master)
+        self.columns = columns
+        self.formatter = formatter
+        self.model = None
+        self.top = 0
+        self.visible = height
+        # 选中行在模型中的行号，None 表示没有选中
+        self.selected = None
+        self.sort_column = None
+        self.descending = False
+        
+        keys = [column[0] for column in columns]
+        self.tree = ttk.Treeview(self, columns=keys, show="headings", height=height, selectmode="browse")
+        for key, heading, width, anchor in columns:
+            self.tree.heading(key, text=heading, command=lambda key=key: self.toggle_sort(key))
+            self.tree.column(key, width=width, anchor=anchor)
+        
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        # 滚动由本控件处理，Treeview 自身不滚动；滚轮和滚动条只滚动，键盘移动选中行
+        self.tree.bind("<Configure>", self.on_configure)
+        self.tree.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_rows(-self.WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_rows(self.WHEEL_ROWS))
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<Prior>", lambda event: self.move_selection(-self.visible))
+        self.tree.bind("<Next>", lambda event: self.move_selection(self.visible))
+        self.tree.bind("<Up>", lambda event: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self.move_selection(1))
+        self.tree.bind("<Home>", lambda event: self.select_row(0))
+        self.tree.bind("<End>", lambda event: self.select_row(len(self.model) - 1 if self.model is not None else 0))
+    
+    def set_model(self, model):
+        """更换数据模型（None 表示清空），滚动到开头"""
+        self.model = model
+        self.top = 0
+        self.selected = None
+        if model is not None and self.sort_column is not None:
+            model.sort(self.sort_column, self.descending)
+        self.render()
+    
+    def refresh(self):
+        """模型内容变化（如重新筛选）后重新显示，滚动到开头"""
+        self.top = 0
+        self.selected = None
+        self.render()
+    
+    def row_height(self):
+        """从样式中取得 Treeview 的行高"""
+        try:
+            height = int(ttk.Style().lookup("Treeview", "rowheight") or 0)
+        except (tk.TclError, ValueError):
+            height = 0
+        return height or self.DEFAULT_ROW_HEIGHT
+    
+    def on_configure(self, event):
+        """控件大小变化时重新计算可见行数（减去标题行）"""
+        visible = max(1, event.height // self.row_height() - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+    
+    def on_mouse_wheel(self, event):
+        self.scroll_rows(wheel_steps(event.delta) * self.WHEEL_ROWS)
+        return "break"
+    
+    def scroll_rows(self, rows):
+        self.scroll_to(self.top + rows)
+        return "break"
+    
+    def scroll_to(self, top):
+        """使第 top 行显示在最上方"""
+        total = len(self.model) if self.model is not None else 0
+        top = clamp_top(top, total, self.visible)
+        if top != self.top:
+            self.top = top
+            self.render()
+        return "break"
+    
+    def on_select(self, event):
+        """鼠标点击选中条目时记录其在模型中的行号"""
+        selection = self.tree.selection()
+        if not selection:
+            # 选中行滚出可见范围时由 show_selection() 取消选中，行号保留
+            return
+        items = self.tree.get_children()
+        if selection[0] in items:
+            self.selected = self.top + items.index(selection[0])
+    
+    def move_selection(self, rows):
+        """键盘移动选中行；没有选中行时从可见范围的第一行开始"""
+        if self.selected is None:
+            return self.select_row(self.top)
+        return self.select_row(self.selected + rows)
+    
+    def select_row(self, index):
+        """选中模型中的第 index 行，该行不在可见范围内时滚动到恰好可见的位置"""
+        total = len(self.model) if self.model is not None else 0
+        if not total:
+            return "break"
+        index = max(0, min(int(index), total - 1))
+        self.selected = index
+        self.scroll_to(scroll_for_row(index, self.top, self.visible))
+        self.show_selection()
+        return "break"
+    
+    def show_selection(self):
+        """在可见条目中显示选中行，选中行不在可见范围内时取消显示"""
+        items = self.tree.get_children()
+        position = visible_position(self.selected, self.top, len(items))
+        if position is not None:
+            item = items[position]
+            if self.tree.selection() != (item,):
+                self.tree.selection_set(item)
+            self.tree.focus(item)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+    
+    def yview(self, *args):
+        """滚动条的回调：("moveto", 比例) 或 ("scroll", 数量, "units"/"pages")"""
+        if self.model is None or not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * len(self.model))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            self.scroll_rows(amount * self.visible if args[2] == "pages" else amount)
+    
+    def toggle_sort(self, key):
+        """点击列标题：按该列升序排序，再次点击改为降序"""
+        if self.model is None:
+            return
+        if key == self.sort_column:
+            self.descending = not self.descending
+        else:
+            self.sort_column = key
+            self.descending = False
+        
+        for column_key, heading, _, _ in self.columns:
+            mark = ""
+            if column_key == self.sort_column:
+                mark = " ▼" if self.descending else " ▲"
+            self.tree.heading(column_key, text=heading + mark)
+        
+        self.model.sort(self.sort_column, self.descending)
+        self.refresh()
+    
+    def render(self):
+        """改写可见条目的内容，条目数量不超过可见行数"""
+        total = len(self.model) if self.model is not None else 0
+        rows = self.model.rows(self.top, self.top + self.visible) if total else []
+        
+        items = self.tree.get_children()
+        for index, row in enumerate(rows):
+            values = self.formatter(row)
+            if index < len(items):
+                self.tree.item(items[index], values=values)
+            else:
+                self.tree.insert("", "end", values=values)
+        if len(items) > len(rows):
+            self.tree.delete(*items[len(rows):])
+        
+        if total:
+            self.scrollbar.set(self.top / total, (self.top + len(rows)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        self.show_selection()
@@ -0,0 +1,555 @@
+"""
+WarcraftLogs v2 GraphQL API 客户端
+使用客户端凭据（OAuth client credentials）获取访问令牌，请求通过 HTTP 长连接池发送。
+一场战斗的事件按时间切分为多段，在 asyncio 中并发分页获取，
+按时间顺序逐页交给 EncounterSegmenter 聚合，不会把全部事件缓存在内存中。
+
+凭据从环境变量 WCL_CLIENT_ID / WCL_CLIENT_SECRET 读取，WCL_BASE_URL 可以指定其他服务器
+（如本地测试用的模拟服务器）。
+传入 ResponseCache 后，报告和事件页的响应保存在本地磁盘，重复查看同一份报告时不再请求 API。
+"""
+import os
+import json
+import time
+import queue
+import base64
+import asyncio
+import threading
+import http.client
+import email.utils
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from log_parser import EncounterSegmenter, ParseCancelled
+
+DEFAULT_BASE_URL = "https://classic.warcraftlogs.com"
+
+# WarcraftLogs 中近战攻击的技能 ID
+MELEE_ABILITY_ID = 1
+# 暴击的 hitType
+CRITICAL_HIT_TYPE = 2
+
+REPORT_QUERY = """
+query ($code: String!) {
+  reportData {
+    report(code: $code) {
+      title
+      startTime
+      endTime
+      fights { id encounterID name startTime endTime kill }
+      masterData {
+        actors { id name type subType server }
+        abilities { gameID name }
+      }
+    }
+  }
+}
+"""
+
+EVENTS_QUERY = """
+query ($code: String!, $fightIDs: [Int], $startTime: Float, $endTime: Float, $sourceID: Int, $limit: Int) {
+  reportData {
+    report(code: $code) {
+      events(fightIDs: $fightIDs, startTime: $startTime, endTime: $endTime, sourceID: $sourceID, limit: $limit) {
+        data
+        nextPageTimestamp
+      }
+    }
+  }
+}
+"""
+
+class WarcraftLogsError(Exception):
+    """WarcraftLogs API 请求失败"""
+
+def retry_delay(retry_after, attempt):
+    """
+    计算重试前的等待时间（秒）
+    
+    Args:
+        retry_after: 响应头 Retry-After 的值，可以是秒数或 HTTP 日期，可能为 None
+        attempt: 已重试的次数，没有可用的 Retry-After 时按 2 ** attempt 指数退避
+    """
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            when = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            when = None
+        if when is not None and when.tzinfo is not None:
+            return max(0.0, when.timestamp() - time.time())
+    return 2 ** attempt
+
+class ConnectionPool:
+    """
+    HTTP 长连接池
+    连接在请求之间保持打开（keep-alive），复用 TCP/TLS 握手；
+    多个线程可以同时各取一个连接发送请求，空闲连接最多保留 size 个。
+    """
+    
+    def __init__(self, base_url, size=4, timeout=30):
+        """
+        Args:
+            base_url: 服务器地址，如 https://classic.warcraftlogs.com 或 http://127.0.0.1:8000
+            size: 最多保留的空闲连接数
+            timeout: 单次请求的超时时间（秒）
+        """
+        parts = urllib.parse.urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        self.size = size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        # 新建的连接数（用于确认连接被复用），多个线程同时新建连接，由 lock 保护
+        self.connections_opened = 0
+        self.lock = threading.Lock()
+    
+    def new_connection(self):
+        """创建新的连接"""
+        with self.lock:
+            self.connections_opened += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+    
+    def request(self, method, path, body=None, headers=None):
+        """
+        发送请求并读取完整的响应
+        
+        Returns:
+            (状态码, 响应头, 响应内容)
+        
+        Raises:
+            WarcraftLogsError: 连接失败
+        """
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            conn = self.new_connection()
+        
+        for attempt in range(2):
+            try:
+                conn.request(method, self.prefix + path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if attempt:
+                    raise WarcraftLogsError(f"连接 {self.host} 失败: {str(e)}")
+                # 服务器可能已经关闭了空闲的长连接，换一个新连接重试一次
+                conn = self.new_connection()
+                continue
+            
+            if response.will_close:
+                conn.close()
+            else:
+                self.release(conn)
+            return response.status, response.headers, data
+    
+    def release(self, conn):
+        """归还连接，空闲连接已满时直接关闭"""
+        if self.idle.qsize() < self.size:
+            self.idle.put(conn)
+        else:
+            conn.close()
+    
+    def close(self):
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+class WarcraftLogsClient:
+    """
+    WarcraftLogs v2 API 客户端
+    同步方法（query、fetch_report、analyze_fight）可以在后台线程中直接调用，
+    内部的并发请求由 asyncio 调度，实际的阻塞 I/O 在线程池中通过连接池完成。
+    """
+    
+    TOKEN_PATH = "/oauth/token"
+    API_PATH = "/api/v2/client"
+    # 每页最多的事件数（API 上限为 10000）
+    PAGE_LIMIT = 10000
+    # 每个时间段预取的页数，消费者跟不上时生产者暂停
+    PREFETCH_PAGES = 2
+    # 限流（429）或服务器错误时的最大重试次数
+    MAX_RETRIES = 3
+    # 报告最后一条记录距今不足该时间（毫秒）时视为仍在实时记录
+    LIVE_REPORT_WINDOW = 30 * 60 * 1000
+    # 实时报告的响应缓存有效期（秒）
+    LIVE_CACHE_TTL = 60
+    
+    def __init__(self, client_id, client_secret, base_url=DEFAULT_BASE_URL, pool_size=4, timeout=30, cache=None):
+        """
+        Args:
+            client_id: WarcraftLogs 客户端 ID
+            client_secret: WarcraftLogs 客户端密钥
+            base_url: API 服务器地址
+            pool_size: 连接池大小，也是并发请求数
+            timeout: 单次请求的超时时间（秒）
+            cache: ResponseCache，None 表示不缓存响应
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.base_url = base_url
+        self.pool = ConnectionPool(base_url, pool_size, timeout)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+        self.cache = cache
+        
+        self.token = None
+        self.token_expires = 0
+        self.token_lock = threading.Lock()
+        
+        # 已发送的 API 请求数，请求在线程池中并发发送，由 requests_lock 保护
+        self.requests_sent = 0
+        self.requests_lock = threading.Lock()
+    
+    @classmethod
+    def from_environment(cls, base_url=DEFAULT_BASE_URL, cache=None):
+        """
+        根据环境变量创建客户端
+        
+        Args:
+            base_url: 未设置 WCL_BASE_URL 时使用的 API 服务器地址
+            cache: ResponseCache，None 表示不缓存响应
+        
+        Returns:
+            WarcraftLogsClient；没有配置 WCL_CLIENT_ID / WCL_CLIENT_SECRET 时返回 None
+        """
+        client_id = os.environ.get("WCL_CLIENT_ID")
+        client_secret = os.environ.get("WCL_CLIENT_SECRET")
+        if not client_id or not client_secret:
+            return None
+        return cls(client_id, client_secret, os.environ.get("WCL_BASE_URL") or base_url, cache=cache)
+    
+    def close(self):
+        """关闭线程池和连接池"""
+        self.executor.shutdown(wait=False)
+        self.pool.close()
+    
+    def access_token(self, refresh=False):
+        """
+        返回访问令牌，过期前自动重新获取
+        
+        Args:
+            refresh: 是否强制重新获取（如令牌被服务器拒绝）
+        """
+        with self.token_lock:
+            if self.token is not None and not refresh and time.time() < self.token_expires:
+                return self.token
+            
+            credentials = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode('utf-8')).decode('ascii')
+            status, headers, data = self.pool.request(
+                "POST", self.TOKEN_PATH,
+                body=urllib.parse.urlencode({"grant_type": "client_credentials"}),
+                headers={
+                    "Authorization": "Basic " + credentials,
+                    "Content-Type": "application/x-www-form-urlencoded"
+                }
+            )
+            if status != 200:
+                raise WarcraftLogsError(f"获取访问令牌失败（HTTP {status}），请检查客户端 ID 和密钥")
+            
+            payload = json.loads(data)
+            self.token = payload["access_token"]
+            # 提前一分钟刷新，避免请求途中过期
+            self.token_expires = time.time() + payload.get("expires_in", 3600) - 60
+            return self.token
+    
+    def query(self, graphql, variables=None):
+        """
+        发送 GraphQL 查询
+        
+        Returns:
+            响应中的 data 字段
+        
+        Raises:
+            WarcraftLogsError: 请求失败或查询返回错误
+        """
+        body = json.dumps({"query": graphql, "variables": variables or {}}).encode('utf-8')
+        refresh = False
+        
+        for attempt in range(self.MAX_RETRIES + 1):
+            headers = {
+                "Authorization": "Bearer " + self.access_token(refresh),
+                "Content-Type": "application/json"
+            }
+            status, response_headers, data = self.pool.request("POST", self.API_PATH, body, headers)
+            with self.requests_lock:
+                self.requests_sent += 1
+            
+            if status == 401 and not refresh:
+                # 令牌失效，重新获取后重试
+                refresh = True
+                continue
+            refresh = False
+            
+            if status == 429 or status >= 500:
+                time.sleep(retry_delay(response_headers.get("Retry-After"), attempt))
+                continue
+            if status != 200:
+                raise WarcraftLogsError(f"API 请求失败（HTTP {status}）")
+            
+            payload = json.loads(data)
+            if payload.get("errors"):
+                raise WarcraftLogsError(payload["errors"][0].get("message", "未知错误"))
+            return payload["data"]
+        
+        raise WarcraftLogsError(f"API 请求失败（HTTP {status}），已重试 {self.MAX_RETRIES} 次")
+    
+    async def aquery(self, graphql, variables=None):
+        """query() 的异步版本：在线程池中发送请求"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.query, graphql, variables)
+    
+    def cached_query(self, graphql, variables, key, report, fight=None, cursor=None, ttl=None):
+        """
+        先查响应缓存，未命中时发送查询并写入缓存
+        
+        Args:
+            key: ResponseCache.make_key() 生成的缓存键
+            report / fight / cursor: 报告ID、战斗ID和分页游标
+            ttl: 缓存有效期（秒），None 表示永不过期；也可以是根据响应计算有效期的函数
+        """
+        if self.cache is None:
+            return self.query(graphql, variables)
+        
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        
+        data = self.query(graphql, variables)
+        if callable(ttl):
+            ttl = ttl(data)
+        self.cache.put(key, data, report, fight, cursor, ttl)
+        return data
+    
+    async def acached_query(self, graphql, variables, key, report, fight=None, cursor=None, ttl=None):
+        """cached_query() 的异步版本：缓存读写和请求都在线程池中执行"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self.cached_query, graphql, variables, key, report, fight, cursor, ttl
+        )
+    
+    def cache_ttl(self, end_time):
+        """
+        根据报告的结束时间（毫秒时间戳）确定缓存有效期
+        
+        Returns:
+            已结束的报告返回 None（永不过期），仍在实时记录的报告返回 LIVE_CACHE_TTL
+        """
+        if end_time is None or time.time() * 1000 - end_time < self.LIVE_REPORT_WINDOW:
+            return self.LIVE_CACHE_TTL
+        return None
+    
+    async def afetch_report(self, code):
+        """
+        获取报告的战斗列表、参与者和技能名称
+        
+        Returns:
+            {"code", "title", "startTime", "endTime", "fights", "players", "actors", "abilities"}
+            actors 为 ID -> 名称，abilities 为技能 ID -> 技能名称，players 只包含玩家
+        """
+        def report_ttl(data):
+            report = (data.get("reportData") or {}).get("report") or {}
+            return self.cache_ttl(report.get("endTime"))
+        
+        key = self.cache.make_key(code) if self.cache is not None else None
+        data = await self.acached_query(REPORT_QUERY, {"code": code}, key, code, ttl=report_ttl)
+        report = (data.get("reportData") or {}).get("report")
+        if report is None:
+            raise WarcraftLogsError(f"找不到报告 {code}")
+        
+        master = report.get("masterData") or {}
+        actors = master.get("actors") or []
+        return {
+            "code": code,
+            "title": report.get("title"),
+            "startTime": report.get("startTime"),
+            "endTime": report.get("endTime"),
+            "fights": report.get("fights") or [],
+            "players": [actor for actor in actors if actor.get("type") == "Player"],
+            "actors": {actor["id"]: actor["name"] for actor in actors},
+            "abilities": {ability["gameID"]: ability["name"] for ability in master.get("abilities") or []}
+        }
+    
+    async def afetch_reports(self, codes):
+        """并发获取多个报告"""
+        return await asyncio.gather(*(self.afetch_report(code) for code in codes))
+    
+    def fetch_report(self, code):
+        """afetch_report() 的同步版本"""
+        return asyncio.run(self.afetch_report(code))
+    
+    async def afetch_events_page(self, code, fight_id, start_time, end_time, source_id=None, ttl=None):
+        """
+        获取一页事件，以 报告ID / 战斗ID / 开始时间（分页游标） 为键缓存
+        
+        Args:
+            ttl: 缓存有效期（秒），None 表示永不过期
+        
+        Returns:
+            {"data": 事件列表, "nextPageTimestamp": 下一页的开始时间或 None}
+        """
+        variables = {
+            "code": code,
+            "fightIDs": [fight_id],
+            "startTime": start_time,
+            "endTime": end_time,
+            "sourceID": source_id,
+            "limit": self.PAGE_LIMIT
+        }
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(code, fight_id, start_time, f"{end_time}:{source_id}:{self.PAGE_LIMIT}")
+        data = await self.acached_query(EVENTS_QUERY, variables, key, code, fight_id, start_time, ttl)
+        return data["reportData"]["report"]["events"]
+    
+    async def aiter_event_pages(self, code, fight, source_id=None, slices=None, cancel_event=None, ttl=None):
+        """
+        按时间顺序异步产生一场战斗的事件页（异步生成器）
+        
+        战斗时间切分为 slices 段，各段同时分页获取；每段最多预取 PREFETCH_PAGES 页，
+        按段的顺序依次产出，因此事件保持时间顺序且内存占用有上限。
+        
+        Args:
+            code: 报告 ID
+            fight: afetch_report() 返回的战斗字典
+            source_id: 只获取该参与者的事件，None 表示全部
+            slices: 并发的时间段数，默认为连接池大小
+            cancel_event: threading.Event，被设置后抛出 ParseCancelled
+            ttl: 事件页的缓存有效期（秒），None 表示永不过期
+        """
+        slices = slices or self.pool.size
+        start, end = fight["startTime"], fight["endTime"]
+        bounds = [start + (end - start) * i // slices for i in range(slices + 1)]
+        queues = [asyncio.Queue(maxsize=self.PREFETCH_PAGES) for _ in range(slices)]
+        
+        async def produce(index):
+            cursor = bounds[index]
+            slice_end = bounds[index + 1]
+            error = None
+            try:
+                while cursor is not None and cursor < slice_end:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ParseCancelled()
+                    page = await self.afetch_events_page(code, fight["id"], cursor, slice_end, source_id, ttl)
+                    # 边界上的事件只属于后一段，避免重复计算
+                    last = index == slices - 1
+                    events = [event for event in page["data"]
+                              if cursor <= event["timestamp"] and (event["timestamp"] < slice_end or last)]
+                    await queues[index].put(events)
+                    cursor = page.get("nextPageTimestamp")
+            except Exception as e:
+                error = e
+            # None 表示该段结束，异常对象交给消费者抛出
+            await queues[index].put(error)
+        
+        tasks = [asyncio.create_task(produce(index)) for index in range(slices)]
+        try:
+            for index in range(slices):
+                while True:
+                    item = await queues[index].get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def convert_events(self, events, report, parser):
+        """
+        将 WarcraftLogs 事件转换为 LogParser 的事件（生成器）
+        
+        施法（cast）记为一次施放；法术伤害只计命中；近战伤害同时计为施放和命中，
+        与客户端战斗日志的处理方式相同。
+        """
+        actors = report["actors"]
+        ability_names = report["abilities"]
+        spell_lookup = parser.spell_lookup
+        ability_lookup = parser.ability_lookup
+        abilities = parser.paladin_abilities
+        
+        for event in events:
+            current_time = event["timestamp"] / 1000
+            kind = event.get("type")
+            if kind != "cast" and kind != "damage":
+                yield ("line", current_time, None, None, None, None, False)
+                continue
+            
+            ability_id = event.get("abilityGameID")
+            if ability_id == MELEE_ABILITY_ID:
+                ability = "白色攻击"
+            else:
+                ability = spell_lookup.get(str(ability_id))
+                if ability is None:
+                    ability = ability_lookup.get(ability_names.get(ability_id))
+            if ability is None:
+                yield ("line", current_time, None, None, None, None, False)
+                continue
+            
+            actor = actors.get(event.get("sourceID"))
+            target = actors.get(event.get("targetID"))
+            if kind == "cast":
+                yield ("line", current_time, actor, ability, target, None, False)
+                continue
+            
+            damage = event.get("amount") or None
+            if not abilities[ability]["is_damage"]:
+                damage = None
+            is_crit = event.get("hitType") == CRITICAL_HIT_TYPE
+            yield ("line" if ability_id == MELEE_ABILITY_ID else "hit",
+                   current_time, actor, ability, target, damage, is_crit)
+    
+    async def aanalyze_fight(self, parser, report, fight, player, cancel_event=None, progress=None):
+        """
+        获取一名玩家在一场战斗中的事件并生成分析结果
+        
+        Args:
+            parser: LogParser，分析结果保存在其 encounters / results 中
+            report: afetch_report() 返回的报告
+            fight: report["fights"] 中的战斗
+            player: report["players"] 中的玩家
+            cancel_event: threading.Event，被设置后抛出 ParseCancelled
+            progress: 每处理一页调用 progress(已处理页数, 已处理事件数)
+        
+        Returns:
+            分析结果字典，结构与 LogParser.build_result() 相同
+        """
+        parser.reset_data()
+        segmenter = EncounterSegmenter(float("inf"))
+        segmenter.feed([
+            ("start", fight["startTime"] / 1000),
+            ("boss", fight["name"], fight["startTime"] / 1000),
+            ("player", player["name"], fight["startTime"] / 1000)
+        ])
+        
+        pages = 0
+        events = 0
+        ttl = self.cache_ttl(report.get("endTime"))
+        async for page in self.aiter_event_pages(report["code"], fight, player["id"],
+                                                 cancel_event=cancel_event, ttl=ttl):
+            segmenter.feed(self.convert_events(page, report, parser))
+            pages += 1
+            events += len(page)
+            if progress is not None:
+                progress(pages, events)
+        
+        segmenter.feed([("end", fight["endTime"] / 1000)])
+        parser.encounters = segmenter.finish()[:1]
+        parser.results = [parser.build_result(parser.encounters[0], player["name"])]
+        return parser.results[0]
+    
+    def analyze_fight(self, parser, report, fight, player, cancel_event=None, progress=None):
+        """aanalyze_fight() 的同步版本"""
+        return asyncio.run(self.aanalyze_fight(parser, report, fight, player, cancel_event, progress))
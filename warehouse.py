@@ -0,0 +1,402 @@
+"""
+历史战斗数据仓库
+每次分析后把各场战斗中每名玩家、每个技能的聚合数据写入本地 SQLite 数据库，
+之后无需重新解析日志即可查询整个赛季的趋势，例如某名玩家每周在某个首领上的 DPS，
+或全团暴击率的分位数。
+
+示例:
+    python warehouse.py --group week --boss 克洛玛古斯 --player 光明使者
+    python warehouse.py --group player --metric crit_rate --since 2024-01-01
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from datetime import date, datetime
+from contextlib import contextmanager
+
+# 可以查询的指标（actor_stats 中的列）和分组方式（SQL 表达式）
+METRICS = {
+    "dps": "DPS",
+    "crit_rate": "暴击率",
+    "damage": "总伤害"
+}
+GROUPS = {
+    "week": "week",
+    "boss": "boss",
+    "player": "actor"
+}
+
+def week_of(timestamp):
+    """返回时间戳所在的 ISO 周，如 "2024-W07"（按本地时间）"""
+    year, week, _ = date.fromtimestamp(timestamp).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def percentile(values, fraction):
+    """已排序数值的分位数（线性插值，与 numpy.percentile 的默认方法相同）"""
+    if not values:
+        return None
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def encounter_record(parser, encounter, key, source, started):
+    """
+    把一场战斗转换为可以写入数据仓库的记录（普通字典，可以在进程间传递）
+    
+    Args:
+        parser: 解析该战斗的 LogParser（用于判断技能是否造成伤害）
+        encounter: Encounter 对象
+        key: 唯一标识该战斗的键，再次写入相同的键时替换旧的记录
+        source: 数据来源的说明（日志文件路径或报告链接）
+        started: 战斗开始时间（Unix 时间戳）
+    
+    Returns:
+        {"key", "source", "boss", "started", "duration", "abilities"}；没有首领或时长为0时返回 None
+    """
+    if not encounter.boss or encounter.start_time is None or encounter.end_time is None:
+        return None
+    duration = float(encounter.end_time - encounter.start_time)
+    if duration <= 0:
+        return None
+    
+    abilities = []
+    for (actor, ability), data in encounter.actor_data.items():
+        if not actor or (data["casts"] == 0 and data["hits"] == 0):
+            continue
+        info = parser.paladin_abilities.get(ability, {})
+        abilities.append([
+            actor, ability, data["casts"], data["damage"], data["hits"], data["crits"],
+            bool(info.get("is_damage"))
+        ])
+    return {
+        "key": key,
+        "source": source,
+        "boss": encounter.boss,
+        "started": started,
+        "duration": duration,
+        "abilities": abilities
+    }
+
+def file_fight_records(parser, file_path):
+    """
+    生成本地日志中各场战斗的记录
+    
+    日志中只有时刻没有日期，以文件的最后修改时间作为最后一场战斗的结束时间，
+    按日志中的时间差推算各场战斗的开始时间。
+    """
+    encounters = [encounter for encounter in parser.encounters if encounter.end_time is not None]
+    if not encounters:
+        return []
+    modified = os.path.getmtime(file_path)
+    last_end = max(encounter.end_time for encounter in encounters)
+    path = os.path.abspath(file_path)
+    
+    records = []
+    for encounter in encounters:
+        if encounter.start_time is None:
+            continue
+        record = encounter_record(
+            parser, encounter, f"file:{path}#{encounter.start_time}", path,
+            modified - (last_end - encounter.start_time)
+        )
+        if record is not None:
+            records.append(record)
+    return records
+
+def report_fight_records(parser, report, fight, player):
+    """
+    生成 WarcraftLogsClient.analyze_fight() 分析的战斗记录
+    
+    只获取了一名玩家的事件，因此每名玩家单独一条记录。
+    """
+    if not parser.encounters or report.get("startTime") is None:
+        return []
+    started = (report["startTime"] + fight["startTime"]) / 1000
+    record = encounter_record(
+        parser, parser.encounters[0], f"wcl:{report['code']}:{fight['id']}:{player['name']}",
+        f"warcraftlogs:{report['code']}", started
+    )
+    return [record] if record is not None else []
+
+class FightWarehouse:
+    """
+    历史战斗数据仓库
+    fights 表每场战斗一行，actor_stats 表每场战斗中每名玩家一行（总伤害、DPS、暴击率），
+    ability_stats 表每名玩家每个技能一行。
+    actor_stats 中冗余保存首领、周和开始时间，趋势查询不需要连接 fights 表，
+    按首领和按玩家的两个覆盖索引包含全部指标，查询只读取索引。
+    """
+    
+    # 默认数据库位置
+    DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".retribution_analyzer", "warehouse.sqlite3")
+    
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Args:
+            path: SQLite 数据库文件路径
+        """
+        self.path = path
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fights (
+                    id INTEGER PRIMARY KEY,
+                    key TEXT NOT NULL UNIQUE,
+                    source TEXT NOT NULL,
+                    boss TEXT NOT NULL,
+                    started REAL NOT NULL,
+                    week TEXT NOT NULL,
+                    duration REAL NOT NULL,
+                    recorded REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS actor_stats (
+                    fight INTEGER NOT NULL,
+                    actor TEXT NOT NULL,
+                    boss TEXT NOT NULL,
+                    week TEXT NOT NULL,
+                    started REAL NOT NULL,
+                    damage INTEGER NOT NULL,
+                    hits INTEGER NOT NULL,
+                    crits INTEGER NOT NULL,
+                    casts INTEGER NOT NULL,
+                    dps REAL NOT NULL,
+                    crit_rate REAL NOT NULL,
+                    PRIMARY KEY (fight, actor)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ability_stats (
+                    fight INTEGER NOT NULL,
+                    actor TEXT NOT NULL,
+                    ability TEXT NOT NULL,
+                    casts INTEGER NOT NULL,
+                    damage INTEGER NOT NULL,
+                    hits INTEGER NOT NULL,
+                    crits INTEGER NOT NULL,
+                    PRIMARY KEY (fight, actor, ability)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS fights_boss ON fights (boss)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS actor_stats_boss "
+                "ON actor_stats (boss, week, actor, started, dps, crit_rate, damage)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS actor_stats_actor "
+                "ON actor_stats (actor, boss, week, started, dps, crit_rate, damage)"
+            )
+    
+    @contextmanager
+    def connect(self):
+        """打开数据库连接并在事务结束后关闭（每次操作单独连接，可以在后台线程中使用）"""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def store(self, records):
+        """
+        在一个事务中批量写入战斗记录，键相同的旧记录被替换
+        
+        Args:
+            records: encounter_record() 生成的记录列表
+        
+        Returns:
+            写入的战斗数
+        """
+        now = time.time()
+        with self.connect() as conn:
+            for record in records:
+                old = conn.execute("SELECT id FROM fights WHERE key = ?", (record["key"],)).fetchone()
+                if old is not None:
+                    self.delete_fight(conn, old[0])
+                
+                week = week_of(record["started"])
+                fight_id = conn.execute(
+                    "INSERT INTO fights (key, source, boss, started, week, duration, recorded) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (record["key"], record["source"], record["boss"], record["started"],
+                     week, record["duration"], now)
+                ).lastrowid
+                
+                # 与 LogParser.build_result() 相同，只有造成伤害的技能计入总伤害和暴击率
+                totals = {}
+                for actor, ability, casts, damage, hits, crits, is_damage in record["abilities"]:
+                    total = totals.setdefault(actor, [0, 0, 0, 0])
+                    total[3] += casts
+                    if is_damage:
+                        total[0] += damage
+                        total[1] += hits
+                        total[2] += crits
+                
+                conn.executemany(
+                    "INSERT INTO ability_stats (fight, actor, ability, casts, damage, hits, crits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(fight_id, actor, ability, casts, damage, hits, crits)
+                     for actor, ability, casts, damage, hits, crits, _ in record["abilities"]]
+                )
+                conn.executemany(
+                    "INSERT INTO actor_stats (fight, actor, boss, week, started, damage, hits, crits, casts, dps, crit_rate) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(fight_id, actor, record["boss"], week, record["started"], damage, hits, crits, casts,
+                      damage / record["duration"], crits / hits if hits > 0 else 0)
+                     for actor, (damage, hits, crits, casts) in totals.items()]
+                )
+        return len(records)
+    
+    def delete_fight(self, conn, fight_id):
+        conn.execute("DELETE FROM ability_stats WHERE fight = ?", (fight_id,))
+        conn.execute("DELETE FROM actor_stats WHERE fight = ?", (fight_id,))
+        conn.execute("DELETE FROM fights WHERE id = ?", (fight_id,))
+    
+    def filters(self, boss=None, player=None, since=None, until=None, prefix=""):
+        """生成 actor_stats 的 WHERE 子句和参数（prefix 为表别名加点，如 "a."）"""
+        clauses = []
+        params = []
+        if boss is not None:
+            clauses.append(f"{prefix}boss = ?")
+            params.append(boss)
+        if player is not None:
+            clauses.append(f"{prefix}actor = ?")
+            params.append(player)
+        if since is not None:
+            clauses.append(f"{prefix}started >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append(f"{prefix}started < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+    
+    def trend(self, group="week", metric="dps", boss=None, player=None, since=None, until=None):
+        """
+        按周、首领或玩家分组统计指标的分布
+        
+        Args:
+            group: "week"、"boss" 或 "player"
+            metric: "dps"、"crit_rate" 或 "damage"
+            boss / player: 只统计指定的首领 / 玩家，None 表示全部
+            since / until: 只统计在 [since, until) 内开始的战斗（Unix 时间戳）
+        
+        Returns:
+            [{"key", "samples", "median", "p90", "mean", "best"}]，按分组键排序；
+            每名玩家在每场战斗中的数据为一个样本
+        """
+        if group not in GROUPS:
+            raise ValueError(f"不支持的分组方式: {group}")
+        if metric not in METRICS:
+            raise ValueError(f"不支持的指标: {metric}")
+        
+        where, params = self.filters(boss, player, since, until)
+        column = GROUPS[group]
+        with self.connect() as conn:
+            rows = conn.execute(
+                f"SELECT {column}, {metric} FROM actor_stats{where} ORDER BY {column}, {metric}",
+                params
+            ).fetchall()
+        
+        # 已按分组键和指标排序，逐组计算分位数
+        trend = []
+        start = 0
+        for index in range(1, len(rows) + 1):
+            if index < len(rows) and rows[index][0] == rows[start][0]:
+                continue
+            values = [row[1] for row in rows[start:index]]
+            trend.append({
+                "key": rows[start][0],
+                "samples": len(values),
+                "median": percentile(values, 0.5),
+                "p90": percentile(values, 0.9),
+                "mean": sum(values) / len(values),
+                "best": values[-1]
+            })
+            start = index
+        return trend
+    
+    def history(self, player, boss=None, since=None, until=None):
+        """
+        返回玩家的每场战斗记录，按时间排序
+        
+        Returns:
+            [{"started", "boss", "duration", "dps", "crit_rate", "damage", "source"}]
+        """
+        where, params = self.filters(boss, player, since, until, prefix="a.")
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT a.started, a.boss, f.duration, a.dps, a.crit_rate, a.damage, f.source "
+                f"FROM actor_stats a JOIN fights f ON f.id = a.fight{where} ORDER BY a.started",
+                params
+            ).fetchall()
+        keys = ("started", "boss", "duration", "dps", "crit_rate", "damage", "source")
+        return [dict(zip(keys, row)) for row in rows]
+    
+    def bosses(self):
+        """返回所有首领名称"""
+        with self.connect() as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT boss FROM fights ORDER BY boss")]
+    
+    def players(self):
+        """返回所有玩家名称"""
+        with self.connect() as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT actor FROM actor_stats ORDER BY actor")]
+    
+    def fight_count(self):
+        """返回已记录的战斗数"""
+        with self.connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM fights").fetchone()[0]
+    
+    def clear(self):
+        """删除所有记录"""
+        with self.connect() as conn:
+            conn.execute("DELETE FROM ability_stats")
+            conn.execute("DELETE FROM actor_stats")
+            conn.execute("DELETE FROM fights")
+
+def parse_date(text):
+    """将 YYYY-MM-DD 转换为当天零点的时间戳（本地时间）"""
+    return datetime.strptime(text, "%Y-%m-%d").timestamp()
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="怀旧服惩戒骑士分析工具 - 历史趋势查询")
+    parser.add_argument("--db", default=FightWarehouse.DEFAULT_PATH, help="数据仓库路径")
+    parser.add_argument("--group", choices=list(GROUPS), default="week", help="分组方式（默认 week）")
+    parser.add_argument("--metric", choices=list(METRICS), default="dps", help="统计的指标（默认 dps）")
+    parser.add_argument("--boss", help="只统计指定的首领")
+    parser.add_argument("--player", help="只统计指定的玩家")
+    parser.add_argument("--since", type=parse_date, help="开始日期（YYYY-MM-DD）")
+    parser.add_argument("--until", type=parse_date, help="结束日期（YYYY-MM-DD，不含）")
+    return parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    warehouse = FightWarehouse(args.db)
+    
+    started = time.perf_counter()
+    trend = warehouse.trend(args.group, args.metric, args.boss, args.player, args.since, args.until)
+    seconds = time.perf_counter() - started
+    
+    percent = args.metric == "crit_rate"
+    def fmt(value):
+        return f"{value * 100:.2f}%" if percent else f"{value:.1f}"
+    
+    sys.stdout.write(f"{'分组':<16}  {'样本':>6}  {'中位数':>10}  {'P90':>10}  {'平均':>10}  {'最高':>10}\n")
+    for row in trend:
+        sys.stdout.write(
+            f"{row['key']:<16}  {row['samples']:>6}  {fmt(row['median']):>10}  {fmt(row['p90']):>10}  "
+            f"{fmt(row['mean']):>10}  {fmt(row['best']):>10}\n"
+        )
+    sys.stdout.write(f"共 {warehouse.fight_count()} 场战斗，查询用时 {seconds * 1000:.1f} ms\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())